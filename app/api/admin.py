@@ -0,0 +1,72 @@
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import asyncio
+import logging
+
+from app.core.profiling import Profiler, collapsed_stacks
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["admin"], include_in_schema=False)
+
+# Request profiles and worker sampling (unavailable unless PROFILING_ENABLED
+# and PROFILING_TOKEN are set)
+profiler = Profiler.from_env()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admit only requests with the admin token, and only when profiling is enabled."""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiler.authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/profile", dependencies=[Depends(require_admin)])
+async def sample_worker(seconds: float = 10.0, interval_ms: float = 5.0, format: str = "collapsed"):
+    """
+    Sample the stacks of every thread of this worker for a number of seconds.
+
+    With format=collapsed (the default) the response is collapsed stacks, one
+    "frame;frame;frame count" line per stack, ready for flamegraph.pl, inferno
+    or speedscope. With format=json it also breaks the samples down by
+    analyzer and optimizer function and reports the time spent per dimension
+    and rule while sampling.
+    """
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be collapsed or json")
+    if not 0 < seconds or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds must be positive and interval_ms between 1 and 1000")
+
+    logger.warning(f"Sampling worker for {min(seconds, profiler.max_seconds):.1f}s")
+    try:
+        # Sampled from a pool thread, so the event loop keeps serving
+        # (and is itself sampled)
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, profiler.sample, seconds, interval_ms / 1000
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(result["stacks"]))
+    result["stacks"] = dict(result["stacks"].most_common(200))
+    return result
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_request_profile(profile_id: str, format: str = "json"):
+    """
+    Return a request profile taken with X-Profile: 1.
+
+    format=json returns the breakdown by analyzer and optimizer function, the
+    time per dimension and rule, and the top functions by cumulative time;
+    format=text returns the pstats report.
+    """
+    if format not in ("json", "text"):
+        raise HTTPException(status_code=400, detail="format must be json or text")
+    profile = profiler.request_profile(profile_id, format)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    if format == "text":
+        return PlainTextResponse(profile)
+    return profile
@@ -0,0 +1,30 @@
+"""
+Admin token checks for API endpoints.
+
+Endpoints that expose other callers' data take a token sent in X-Admin-Token.
+Each feature has its own token setting, so enabling one (for example the
+history queries) does not require enabling another (profiling).
+"""
+
+import hmac
+from typing import Callable, Optional
+
+from fastapi import Header, HTTPException
+
+def require_token(token: Optional[str]) -> Callable:
+    """
+    Create a dependency that admits only requests sending token in X-Admin-Token.
+
+    Args:
+        token: The expected token; without one every request gets 404, so the
+            endpoint stays unavailable until a token is configured
+
+    Returns:
+        Dependency function for FastAPI
+    """
+    def check_token(x_admin_token: Optional[str] = Header(None)):
+        if not token:
+            raise HTTPException(status_code=404, detail="Not Found")
+        if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), token.encode()):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    return check_token
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from app.core.analyzer import analyze_prompt_rules
+from app.core.analyzer import analyze_prompt_rules, calculate_overall_score, calculate_weighted_overall_score, select_dimensions
 from app.core.optimizer import generate_optimization_suggestions
-from app.core.llm_analyzer import analyze_prompt_with_llm
 from app.core.rate_limiter import RateLimiter
+from app.core.history import HistoryStore
+from app.api.auth import require_token
+from app.core.near_duplicate import NearDuplicateIndex, key_scope
+from app.core.assets import StaticAsset
+from app.core.execution import AnalysisExecutor, AnalysisPoolSaturated
+from app.core.compare import compare_prompts
+from app.core.admission import LoadMonitor
+from app.core.logs import log_event, log_exception
+from app.core.tracing import span
+import os
+import json
+import math
 import logging
+import time
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -13,122 +26,445 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=["prompt"])
 
 # Initialize rate limiter
-rate_limiter = RateLimiter(max_requests=10, time_window=60)  # 10 requests per minute
+rate_limiter = RateLimiter(
+    max_requests=int(os.getenv("MAX_REQUESTS_PER_MINUTE", 10)),
+    time_window=60,
+    max_queue_size=int(os.getenv("MAX_QUEUE_SIZE", 100))
+)
+
+# Batches have their own limiter, charged per prompt: a batch takes one token
+# per started BATCH_UNIT_CHARS characters of each prompt
+batch_rate_limiter = RateLimiter(
+    max_requests=int(os.getenv("BATCH_PROMPTS_PER_MINUTE", 2000)),
+    time_window=60,
+    max_queue_size=int(os.getenv("MAX_QUEUE_SIZE", 100))
+)
+BATCH_UNIT_CHARS = 4096
+
+# Initialize analysis history store (None when disabled)
+history_store = HistoryStore.from_env()
+
+# Stored analyses hold every caller's prompt text, so querying them takes
+# HISTORY_TOKEN in X-Admin-Token (the endpoint answers 404 without one set)
+require_history_token = require_token(os.getenv("HISTORY_TOKEN") or None)
+
+# Runs large prompts' rule analysis off the event loop
+analysis_executor = AnalysisExecutor.from_env()
+
+# Tracks event-loop lag and in-flight requests for admission control
+load_monitor = LoadMonitor.from_env()
+
+# Initialize near-duplicate index for reusing LLM analyses (None when disabled)
+near_duplicate_index = NearDuplicateIndex.from_env()
+
+# Maximum number of prompts in one batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 1000))
+
+# Maximum prompt length in characters
+MAX_PROMPT_CHARS = int(os.getenv("MAX_PROMPT_CHARS", 500000))
+
+# Response sections a request can ask for with include (scores and
+# overall_score are always returned)
+RESPONSE_SECTIONS = ("suggestions", "strengths", "weaknesses", "optimized_prompt")
+
+# Cache lifetime of static metadata responses such as /dimensions
+METADATA_CACHE_CONTROL = "public, max-age=3600"
 
 class PromptRequest(BaseModel):
     prompt_text: str
     target_model: Optional[str] = "general"
     detailed_analysis: bool = False
     api_key: Optional[str] = None  # Field for API key
+    dimensions: Optional[List[str]] = None  # Only analyze these dimensions (default: all)
+    include: Optional[List[str]] = None  # Response sections to build (default: all)
 
 class AnalysisResponse(BaseModel):
     scores: Dict[str, float]
     overall_score: float
-    suggestions: List[Dict[str, Any]]
-    strengths: List[str]
-    weaknesses: List[str]
-    optimized_prompt: str
+    suggestions: Optional[List[Dict[str, Any]]] = None  # None when not included
+    strengths: Optional[List[str]] = None
+    weaknesses: Optional[List[str]] = None
+    optimized_prompt: Optional[str] = None
+    near_duplicate: Optional[Dict[str, Any]] = None  # Set when a prior LLM analysis was reused
+
+class BatchPromptItem(BaseModel):
+    prompt_text: str
+    target_model: Optional[str] = None  # Defaults to the batch's target_model
+    id: Optional[Any] = None  # Echoed back to match results to prompts
+
+class BatchRequest(BaseModel):
+    prompts: List[BatchPromptItem]
+    target_model: Optional[str] = "general"
+    dimensions: Optional[List[str]] = None
+    include: Optional[List[str]] = None
+
+class CompareRequest(BaseModel):
+    before: str
+    after: str
+    dimensions: Optional[List[str]] = None  # Only compare these dimensions (default: all)
+
+def resolve_selection(dimensions: Optional[List[str]], include: Optional[List[str]]):
+    """
+    Validate a request's dimensions and include lists.
+
+    Returns:
+        The selected dimensions in rule pack order (None for all) and the
+        set of response sections to build
+
+    Raises:
+        HTTPException: 400 for an unknown dimension or section
+    """
+    try:
+        selected = select_dimensions(dimensions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if include is None:
+        return selected, set(RESPONSE_SECTIONS)
+    unknown = [section for section in include if section not in RESPONSE_SECTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown response sections: {', '.join(unknown)}. Choose from: {', '.join(RESPONSE_SECTIONS)}"
+        )
+    return selected, set(include)
+
+def overall_score_of(scores: Dict[str, float], dimensions: Optional[List[str]]) -> float:
+    """
+    Overall score of a full analysis, or the DIMENSIONS-weighted score of a
+    selected subset (select_dimensions turns a selection of every dimension
+    into None, so only a real subset is weighted).
+    """
+    if dimensions:
+        return calculate_weighted_overall_score(scores)
+    return calculate_overall_score(scores)
+
+def build_rule_response(
+    prompt_text: str,
+    rule_analysis: Dict[str, Any],
+    suggestions: List[Dict[str, Any]],
+    dimensions: Optional[List[str]],
+    include: set
+) -> Dict[str, Any]:
+    """Build an analysis response, leaving out the sections that were not included."""
+    return {
+        "scores": rule_analysis["dimension_scores"],
+        "overall_score": overall_score_of(rule_analysis["dimension_scores"], dimensions),
+        "suggestions": suggestions if "suggestions" in include else None,
+        "strengths": rule_analysis["strengths"] if "strengths" in include else None,
+        "weaknesses": rule_analysis["weaknesses"] if "weaknesses" in include else None,
+        "optimized_prompt": prompt_text if "optimized_prompt" in include else None
+    }
+
+def check_prompt_size(prompt_text: str):
+    """Reject prompts longer than MAX_PROMPT_CHARS with 413."""
+    if len(prompt_text) > MAX_PROMPT_CHARS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Prompt too large: {len(prompt_text)} characters (maximum {MAX_PROMPT_CHARS})"
+        )
+
+def analyze_prompt_rules_only(
+    prompt_text: str,
+    target_model: str,
+    dimensions: Optional[List[str]] = None,
+    include: Optional[set] = None
+) -> Dict[str, Any]:
+    """Build the analysis response of a prompt from rule-based analysis alone."""
+    include = set(RESPONSE_SECTIONS) if include is None else include
+    rule_analysis = analyze_prompt_rules(prompt_text, target_model, dimensions)
+    suggestions = []
+    if "suggestions" in include:
+        suggestions = generate_optimization_suggestions(prompt_text, rule_analysis, target_model, dimensions)
+    return build_rule_response(prompt_text, rule_analysis, suggestions, dimensions, include)
 
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_prompt(
     prompt_request: PromptRequest, 
     background_tasks: BackgroundTasks,
+    http_response: Response,
     _: None = Depends(rate_limiter.limit)
 ):
     """
     Analyze a prompt and provide optimization suggestions.
     
     This endpoint performs both rule-based and LLM-based analysis
-    to evaluate prompt quality and suggest improvements.
+    to evaluate prompt quality and suggest improvements. Rule analysis of
+    large prompts runs in the analysis pool; the time spent waiting for a
+    pool worker is returned in X-Analysis-Queue-Ms. While the server is
+    degraded, detailed analysis is skipped and X-Degraded is set. Detailed
+    requests get X-LLM-Used: true only when the LLM analyzed this prompt.
+    
+    With dimensions, only those analyzers run, strengths, weaknesses and
+    suggestions cover only them, and overall_score is their DIMENSIONS-weighted
+    mean. Naming every dimension is the same as omitting dimensions. Sections left out of include are not built and are returned as null.
     """
+    check_prompt_size(prompt_request.prompt_text)
+    dimensions, include = resolve_selection(prompt_request.dimensions, prompt_request.include)
     try:
-        logger.info(f"Analyzing prompt for target model: {prompt_request.target_model}")
-        logger.info(f"Detailed analysis requested: {prompt_request.detailed_analysis}")
+        log_event(logger, logging.DEBUG, "analysis.started",
+                  target_model=prompt_request.target_model,
+                  detailed=prompt_request.detailed_analysis,
+                  chars=len(prompt_request.prompt_text))
+        request_start = time.perf_counter()
         
-        # Perform rule-based analysis first (synchronous)
-        rule_analysis = analyze_prompt_rules(prompt_request.prompt_text, prompt_request.target_model)
-        logger.info("Rule-based analysis completed")
+        # Perform rule-based analysis and generate suggestions first
+        # (inline for small prompts, in the analysis pool for large ones)
+        with span("rules", chars=len(prompt_request.prompt_text)) as rules_span:
+            rule_analysis, suggestions, rules_version, queue_ms = await analysis_executor.run(
+                prompt_request.prompt_text,
+                prompt_request.target_model,
+                dimensions,
+                "suggestions" in include
+            )
+            rules_span.set(queue_ms=queue_ms)
+        rule_ms = (time.perf_counter() - request_start) * 1000
+        if queue_ms:
+            http_response.headers["X-Analysis-Queue-Ms"] = f"{queue_ms:.1f}"
+        log_event(logger, logging.DEBUG, "analysis.rules_completed", suggestions=len(suggestions), rule_ms=rule_ms)
         
         # Initialize variables for LLM analysis results
         llm_analysis = None
+        llm_ms = None
+        near_duplicate = None
+        
+        # Under load, serve rule-based analysis alone instead of holding a
+        # request open for an LLM call
+        detailed = bool(prompt_request.detailed_analysis and prompt_request.api_key)
+        if detailed and load_monitor.degraded():
+            load_monitor.degraded_count += 1
+            http_response.headers["X-Degraded"] = "rule-only"
+            log_event(logger, logging.WARNING, "analysis.degraded")
+            detailed = False
+        
+        # Reuse the LLM analysis of a near-duplicate prompt made with the same
+        # API key instead of calling the LLM again
+        scope = key_scope(prompt_request.api_key) if detailed else None
+        if detailed and near_duplicate_index is not None:
+            with span("near_duplicate"):
+                match = near_duplicate_index.lookup(prompt_request.prompt_text, prompt_request.target_model, scope)
+            if match is not None:
+                similarity, llm_analysis = match
+                near_duplicate = {"similarity": round(similarity, 4)}
+                log_event(logger, logging.DEBUG, "analysis.near_duplicate", similarity=similarity)
         
         # If detailed analysis is requested and API key is provided, perform LLM analysis
-        if prompt_request.detailed_analysis and prompt_request.api_key:
-            logger.info("Starting LLM analysis with provided API key")
+        if detailed and near_duplicate is None:
             try:
+                # Imported on first use so aiohttp is not loaded at startup
+                from app.core.llm_analyzer import analyze_prompt_with_llm
+                
                 # For immediate response, we'll use the rule-based analysis
                 # but also perform the LLM analysis synchronously for this prototype
                 # In a production app, you would use background tasks or WebSockets
-                llm_analysis = await analyze_prompt_with_llm(
-                    prompt_request.prompt_text,
-                    prompt_request.target_model,
-                    prompt_request.api_key  # Pass the API key from the request
-                )
-                logger.info("LLM analysis completed successfully")
+                llm_start = time.perf_counter()
+                with span("llm", target_model=prompt_request.target_model):
+                    llm_analysis = await analyze_prompt_with_llm(
+                        prompt_request.prompt_text,
+                        prompt_request.target_model,
+                        prompt_request.api_key  # Pass the API key from the request
+                    )
+                llm_ms = (time.perf_counter() - llm_start) * 1000
+                log_event(logger, logging.DEBUG, "analysis.llm_completed", llm_ms=llm_ms)
+                if near_duplicate_index is not None and llm_analysis and "error" not in llm_analysis:
+                    near_duplicate_index.add(
+                        prompt_request.prompt_text,
+                        prompt_request.target_model,
+                        llm_analysis,
+                        scope=scope
+                    )
             except Exception as e:
                 # If LLM analysis fails, log the error but continue with rule-based analysis
-                logger.error(f"LLM analysis failed: {str(e)}", exc_info=True)
+                log_exception(logger, "analysis.llm_failed")
                 llm_analysis = None
         
-        # Generate optimization suggestions
-        suggestions = generate_optimization_suggestions(
-            prompt_request.prompt_text,
-            rule_analysis,
-            prompt_request.target_model
-        )
-        logger.info(f"Generated {len(suggestions)} optimization suggestions")
-        
-        # Calculate overall score (0-1 scale)
-        raw_overall_score = sum(rule_analysis["dimension_scores"].values()) / len(rule_analysis["dimension_scores"])
-        # Scale to 0-5 range for display
-        overall_score = raw_overall_score * 5
-        logger.info(f"Overall score: {overall_score:.2f}/5 (raw: {raw_overall_score:.2f})")
+        # Calculate overall score (scaled to 0-5 range for display)
+        overall_score = overall_score_of(rule_analysis["dimension_scores"], dimensions)
         
         # Create optimized prompt (placeholder - will be implemented in optimizer)
         optimized_prompt = prompt_request.prompt_text
         
         # If we have LLM analysis results, use them to enhance our response
-        if llm_analysis and "error" not in llm_analysis:
-            logger.info("Merging LLM analysis results with rule-based analysis")
+        llm_used = bool(llm_analysis and "error" not in llm_analysis)
+        if prompt_request.detailed_analysis:
+            # Tells clients whether this detailed analysis came from the LLM,
+            # so they do not cache a rule-only fallback as a detailed result
+            http_response.headers["X-LLM-Used"] = "true" if llm_used and near_duplicate is None else "false"
+        if llm_used:
             # Merge LLM analysis with rule-based analysis
             # This is a simplified example - in a real app, you would do more sophisticated merging
             if "dimension_scores" in llm_analysis:
-                rule_analysis["dimension_scores"].update(llm_analysis["dimension_scores"])
-                logger.info("Updated dimension scores with LLM analysis")
-            
-            if "strengths" in llm_analysis and llm_analysis["strengths"]:
-                rule_analysis["strengths"].extend(llm_analysis["strengths"])
-                logger.info(f"Added {len(llm_analysis['strengths'])} strengths from LLM analysis")
+                llm_scores = llm_analysis["dimension_scores"]
+                if dimensions:
+                    llm_scores = {name: score for name, score in llm_scores.items() if name in dimensions}
+                rule_analysis["dimension_scores"].update(llm_scores)
             
-            if "weaknesses" in llm_analysis and llm_analysis["weaknesses"]:
-                rule_analysis["weaknesses"].extend(llm_analysis["weaknesses"])
-                logger.info(f"Added {len(llm_analysis['weaknesses'])} weaknesses from LLM analysis")
+            # The LLM's strengths, weaknesses and suggestions are not tied
+            # to dimensions, so they are only merged into full analyses
+            if not dimensions:
+                if "strengths" in llm_analysis and llm_analysis["strengths"]:
+                    rule_analysis["strengths"].extend(llm_analysis["strengths"])
+                
+                if "weaknesses" in llm_analysis and llm_analysis["weaknesses"]:
+                    rule_analysis["weaknesses"].extend(llm_analysis["weaknesses"])
+                
+                if "suggestions" in llm_analysis and llm_analysis["suggestions"]:
+                    suggestions.extend(llm_analysis["suggestions"])
             
-            if "suggestions" in llm_analysis and llm_analysis["suggestions"]:
-                suggestions.extend(llm_analysis["suggestions"])
-                logger.info(f"Added {len(llm_analysis['suggestions'])} suggestions from LLM analysis")
-            
-            if "improved_prompt" in llm_analysis and llm_analysis["improved_prompt"]:
+            # A reused rewrite is of the near-duplicate, not of this prompt,
+            # and would undo the edits that set them apart
+            if near_duplicate is None and llm_analysis.get("improved_prompt"):
                 optimized_prompt = llm_analysis["improved_prompt"]
-                logger.info("Using improved prompt from LLM analysis")
         
-        logger.info("Preparing final response")
-        return {
-            "scores": rule_analysis["dimension_scores"],
-            "overall_score": overall_score,
-            "suggestions": suggestions,
-            "strengths": rule_analysis["strengths"],
-            "weaknesses": rule_analysis["weaknesses"],
-            "optimized_prompt": optimized_prompt
-        }
+        response = build_rule_response(optimized_prompt, rule_analysis, suggestions, dimensions, include)
+        response["overall_score"] = overall_score
+        if near_duplicate is not None:
+            response["near_duplicate"] = near_duplicate
+        
+        # Queue the analysis for the history store (written off the request path);
+        # partial analyses are not comparable with stored ones and are skipped
+        if history_store is not None and dimensions is None and len(include) == len(RESPONSE_SECTIONS):
+            history_store.record(
+                prompt_request.prompt_text,
+                prompt_request.target_model,
+                response,
+                rule_ms=rule_ms,
+                llm_ms=llm_ms,
+                total_ms=(time.perf_counter() - request_start) * 1000,
+                llm_used=llm_used,
+                # Reused analyses are already stored under the original prompt
+                llm_analysis=llm_analysis if llm_used and near_duplicate is None else None,
+                rules_version=rules_version,
+                key_scope=scope if llm_used and near_duplicate is None else None
+            )
         
+        # One record per request, with what the step-by-step records used to say
+        log_event(logger, logging.INFO, "analysis.completed",
+                  target_model=prompt_request.target_model,
+                  chars=len(prompt_request.prompt_text),
+                  dimensions=len(dimensions) if dimensions else None,
+                  overall_score=overall_score,
+                  suggestions=len(suggestions),
+                  llm_used=llm_used,
+                  near_duplicate=near_duplicate is not None,
+                  queue_ms=queue_ms or None,
+                  rule_ms=rule_ms,
+                  llm_ms=llm_ms,
+                  total_ms=(time.perf_counter() - request_start) * 1000)
+        return response
+        
+    except AnalysisPoolSaturated as e:
+        log_event(logger, logging.WARNING, "analysis.pool_saturated", reason=str(e))
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy analyzing large prompts. Please try again later.",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
-        logger.error(f"Analysis failed: {str(e)}", exc_info=True)
+        log_exception(logger, "analysis.failed")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@router.post("/analyze/batch")
+async def analyze_batch(batch_request: BatchRequest):
+    """
+    Analyze a batch of prompts with rule-based analysis and stream the results.
+    
+    The response is NDJSON: one line per prompt, in request order, with the
+    prompt's index and id plus the same fields as /analyze. Lines are sent as
+    soon as each prompt is analyzed. Batch results are not recorded in the
+    analysis history.
+    
+    Batches are rate limited per prompt, not per request: each prompt takes
+    one token of the batch limiter (BATCH_PROMPTS_PER_MINUTE) per started
+    BATCH_UNIT_CHARS characters.
+    """
+    if len(batch_request.prompts) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch_request.prompts)} prompts (maximum {MAX_BATCH_SIZE})"
+        )
+    for item in batch_request.prompts:
+        check_prompt_size(item.prompt_text)
+    dimensions, include = resolve_selection(batch_request.dimensions, batch_request.include)
+    
+    cost = sum(max(1, math.ceil(len(item.prompt_text) / BATCH_UNIT_CHARS)) for item in batch_request.prompts)
+    if cost > batch_rate_limiter.max_requests:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: costs {cost} of the {batch_rate_limiter.max_requests} prompts allowed "
+                   f"per minute (one per {BATCH_UNIT_CHARS} characters of each prompt)"
+        )
+    
+    def results():
+        # A sync generator, so Starlette runs the analysis in its thread pool
+        for index, item in enumerate(batch_request.prompts):
+            line = {"index": index, "id": item.id}
+            try:
+                line.update(analyze_prompt_rules_only(
+                    item.prompt_text,
+                    item.target_model or batch_request.target_model,
+                    dimensions,
+                    include
+                ))
+            except Exception as e:
+                log_exception(logger, "batch.item_failed", index=index)
+                line["error"] = f"Analysis failed: {str(e)}"
+            yield json.dumps(line) + "\n"
+    
+    response = StreamingResponse(results(), media_type="application/x-ndjson")
+    await batch_rate_limiter.acquire(cost, response)
+    return response
+
+@router.post("/compare")
+async def compare(
+    compare_request: CompareRequest,
+    http_response: Response,
+    _: None = Depends(rate_limiter.limit)
+):
+    """
+    Compare two versions of a prompt.
+    
+    Returns the scores of both versions, per-dimension deltas (after minus
+    before), strengths and weaknesses added or removed, and a line diff with
+    word-level changes inside replaced lines. Lines shared by both versions
+    are analyzed once. Comparisons are not recorded in the analysis history.
+    """
+    check_prompt_size(compare_request.before)
+    check_prompt_size(compare_request.after)
+    dimensions, _include = resolve_selection(compare_request.dimensions, None)
+    try:
+        size = len(compare_request.before) + len(compare_request.after)
+        with span("compare", chars=size) as compare_span:
+            result, queue_ms = await analysis_executor.call(
+                size, compare_prompts, compare_request.before, compare_request.after, dimensions
+            )
+            compare_span.set(queue_ms=queue_ms)
+    except AnalysisPoolSaturated as e:
+        log_event(logger, logging.WARNING, "compare.pool_saturated", reason=str(e))
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy analyzing large prompts. Please try again later.",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        log_exception(logger, "compare.failed")
+        raise HTTPException(status_code=500, detail=f"Comparison failed: {str(e)}")
+    if queue_ms:
+        http_response.headers["X-Analysis-Queue-Ms"] = f"{queue_ms:.1f}"
+    return result
+
+_dimensions_asset: Optional[StaticAsset] = None
+
 @router.get("/dimensions")
-async def get_dimensions():
+async def get_dimensions(request: Request):
     """Get the list of dimensions used for prompt evaluation."""
+    global _dimensions_asset
+    if _dimensions_asset is not None:
+        return _dimensions_asset.response(
+            request.headers.get("accept-encoding"),
+            request.headers.get("if-none-match"),
+            METADATA_CACHE_CONTROL
+        )
+    
     # This will be implemented to return the evaluation dimensions
     dimensions = [
         {"id": "clarity", "name": "Clarity & Specificity", "description": "How clear and unambiguous the instructions are"},
@@ -138,4 +474,53 @@ async def get_dimensions():
         {"id": "examples", "name": "Examples", "description": "Quality and relevance of examples provided"},
         # More dimensions will be added
     ]
-    return {"dimensions": dimensions}
+    
+    # The list is static: serialize and compress it once, then serve it with an ETag
+    _dimensions_asset = StaticAsset("dimensions.json", "", json.dumps({"dimensions": dimensions}).encode("utf-8"))
+    return _dimensions_asset.response(
+        request.headers.get("accept-encoding"),
+        request.headers.get("if-none-match"),
+        METADATA_CACHE_CONTROL
+    )
+
+@router.get("/providers")
+async def get_providers():
+    """
+    Get the LLM providers' load and token usage since startup.
+    
+    Reports each provider's in-flight and queued calls, rejected calls and
+    token totals, including input tokens served from the provider's cache.
+    """
+    # Imported on first use so aiohttp is not loaded at startup
+    from app.core.llm_analyzer import provider_registry
+    return {"providers": provider_registry.stats()}
+
+@router.get("/history", dependencies=[Depends(require_history_token)])
+async def get_history(
+    prompt_hash: Optional[str] = None,
+    target_model: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 50,
+    cursor: Optional[int] = None,
+    include_result: bool = False
+):
+    """
+    Query stored analyses, newest first.
+    
+    Filter by prompt hash, target model and creation time (Unix seconds),
+    and page through results by passing next_cursor back as cursor. Stored
+    rows hold every caller's prompt text, so only admins may query them.
+    """
+    if history_store is None:
+        raise HTTPException(status_code=404, detail="Analysis history is disabled")
+    
+    return await history_store.aquery(
+        prompt_hash=prompt_hash,
+        target_model=target_model,
+        since=since,
+        until=until,
+        limit=limit,
+        cursor=cursor,
+        include_result=include_result
+    )
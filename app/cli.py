@@ -0,0 +1,334 @@
+"""
+Command-line interface for bulk prompt analysis.
+
+Streams prompts from a JSONL file, a CSV file or a directory of text files,
+runs the rule-based analyzer and optimizer over a multiprocessing pool and
+writes one JSON result per line, without starting the web server. Memory
+stays constant regardless of corpus size: at most a bounded number of
+prompts are in flight at any time.
+
+Usage:
+    python -m app.cli prompts.jsonl --workers 8 --output results.jsonl
+    python -m app.cli prompts/ --dimensions task_definition,constraints --fail-under 2.5
+    python -m app.cli prompts.jsonl --detailed --pack-size 10 -o results.jsonl
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import deque
+from multiprocessing import Pool
+from typing import Dict, List, Any, Iterator, Optional
+
+from app.core.analyzer import (
+    analyze_prompt_rules, calculate_overall_score, calculate_weighted_overall_score, select_dimensions
+)
+from app.core.optimizer import generate_optimization_suggestions
+
+# Fields checked, in order, for the prompt text of JSONL records and CSV rows
+PROMPT_FIELDS = ("prompt_text", "prompt", "text")
+
+# Records buffered for each round of detailed (LLM) analyses
+DETAILED_BATCH_SIZE = 200
+
+def _prompt_from_record(record: Dict[str, Any], field: Optional[str]) -> Optional[str]:
+    """Return the prompt text of a JSONL record or CSV row."""
+    if field:
+        return record.get(field)
+    for name in PROMPT_FIELDS:
+        if record.get(name):
+            return record[name]
+    return None
+
+def iter_prompts(source: str, field: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream prompts from a JSONL file, CSV file or directory of text files.
+
+    Args:
+        source: Path to a .jsonl/.csv file, a directory, or "-" for JSONL on stdin
+        field: Name of the prompt field in JSONL records or CSV rows
+
+    Yields:
+        Dictionaries with id, prompt_text and an optional target_model
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if name.endswith((".txt", ".md", ".prompt")) and os.path.isfile(path):
+                with open(path, encoding="utf-8") as handle:
+                    yield {"id": name, "prompt_text": handle.read()}
+        return
+
+    if source.endswith(".csv"):
+        with open(source, newline="", encoding="utf-8") as handle:
+            for line_number, row in enumerate(csv.DictReader(handle), start=1):
+                prompt_text = _prompt_from_record(row, field)
+                if prompt_text:
+                    yield {
+                        "id": row.get("id") or line_number,
+                        "prompt_text": prompt_text,
+                        "target_model": row.get("target_model") or None
+                    }
+        return
+
+    handle = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        for line_number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt_text": record}
+            prompt_text = _prompt_from_record(record, field)
+            if prompt_text:
+                yield {
+                    "id": record.get("id", line_number),
+                    "prompt_text": prompt_text,
+                    "target_model": record.get("target_model")
+                }
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def _build_record(item: Dict[str, Any], model: str, analysis: Dict[str, Any],
+                  dimensions: Optional[List[str]]) -> Dict[str, Any]:
+    """Build the output record of one analyzed prompt."""
+    prompt_text = item["prompt_text"]
+
+    # The analysis only covers the selected dimensions; report them in rule pack order
+    if dimensions:
+        analysis["dimension_scores"] = {
+            dimension: analysis["dimension_scores"][dimension] for dimension in dimensions
+        }
+    scores = analysis["dimension_scores"]
+    suggestions = generate_optimization_suggestions(prompt_text, analysis, model, dimensions)
+
+    return {
+        "id": item["id"],
+        "target_model": model,
+        # Scored like the API: a real subset gets the weighted overall score
+        "overall_score": calculate_weighted_overall_score(scores) if dimensions else calculate_overall_score(scores),
+        "scores": scores,
+        "strengths": analysis["strengths"],
+        "weaknesses": analysis["weaknesses"],
+        "suggestions": [suggestion["title"] for suggestion in suggestions]
+    }
+
+def analyze_item(item: Dict[str, Any], target_model: str, dimensions: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Analyze one prompt and build its output record.
+
+    Runs in the worker processes, so it must stay a module-level function.
+    """
+    model = item.get("target_model") or target_model
+    analysis = analyze_prompt_rules(item["prompt_text"], model, dimensions)
+    return _build_record(item, model, analysis, dimensions)
+
+def analyze_chunk(items: List[Dict[str, Any]], target_model: str,
+                  dimensions: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """
+    Analyze a chunk of prompts with the NumPy batch engine.
+
+    Produces the same records as analyze_item for each prompt.
+    """
+    from app.core.batch import score_batch
+
+    batch = score_batch([item["prompt_text"] for item in items], dimensions)
+    return [
+        _build_record(item, item.get("target_model") or target_model, batch.analysis(index), dimensions)
+        for index, item in enumerate(items)
+    ]
+
+def _analyze_task(task) -> Dict[str, Any]:
+    """Unpack a pool task; Pool.imap passes a single argument."""
+    return analyze_item(*task)
+
+def _analyze_chunk_task(task) -> List[Dict[str, Any]]:
+    """Unpack a chunk task for the batch engine."""
+    return analyze_chunk(*task)
+
+def _chunks(items: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterator into lists of up to size items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _recording_texts(items: Iterator[Dict[str, Any]], texts: deque) -> Iterator[Dict[str, Any]]:
+    """Yield prompts, keeping their texts so results (which arrive in order) can be paired with them."""
+    for item in items:
+        texts.append(item["prompt_text"])
+        yield item
+
+async def _analyze_detailed(records: List[Dict[str, Any]], texts: List[str], pack_size: int) -> None:
+    """Add an llm_analysis to each record, packing prompts of the same target model into shared calls."""
+    # Imported on first use so aiohttp is only loaded for detailed runs
+    from app.core.llm_analyzer import analyze_prompts_with_llm
+
+    groups: Dict[str, List[int]] = {}
+    for index, record in enumerate(records):
+        groups.setdefault(record["target_model"], []).append(index)
+    analyses = await asyncio.gather(*(
+        analyze_prompts_with_llm([texts[index] for index in indices], model, max_items=pack_size)
+        for model, indices in groups.items()
+    ))
+    for indices, results in zip(groups.values(), analyses):
+        for index, analysis in zip(indices, results):
+            records[index]["llm_analysis"] = analysis
+
+def _bounded(items: Iterator[Any], slots: threading.Semaphore) -> Iterator[Any]:
+    """Yield items only while fewer than the semaphore's count are in flight."""
+    for item in items:
+        slots.acquire()
+        yield item
+
+def run(
+    source: str,
+    output,
+    workers: int,
+    chunksize: int,
+    target_model: str,
+    dimensions: Optional[List[str]],
+    field: Optional[str],
+    fail_under: Optional[float],
+    engine: str = "scalar",
+    detailed: bool = False,
+    pack_size: int = 10
+) -> Dict[str, Any]:
+    """
+    Analyze every prompt from source and write JSONL results to output.
+
+    With detailed, each record also gets an llm_analysis. Records are then
+    written in rounds of DETAILED_BATCH_SIZE, whose prompts are sent to the
+    LLM up to pack_size per call.
+
+    Returns:
+        Summary with the prompt count, failures, elapsed time and throughput
+    """
+    prompts = iter_prompts(source, field)
+    texts: deque = deque()
+    pending: List[Dict[str, Any]] = []
+    if detailed:
+        prompts = _recording_texts(prompts, texts)
+    if engine == "numpy":
+        # One task per chunk; each chunk is scored as a single NumPy batch
+        tasks = ((chunk, target_model, dimensions) for chunk in _chunks(prompts, chunksize))
+        analyze, task_chunksize = _analyze_chunk_task, 1
+    else:
+        tasks = ((item, target_model, dimensions) for item in prompts)
+        analyze, task_chunksize = _analyze_task, chunksize
+    count = 0
+    failed = 0
+    start = time.perf_counter()
+
+    def write(result: Dict[str, Any]):
+        nonlocal count, failed
+        count += 1
+        if fail_under is not None and result["overall_score"] < fail_under:
+            failed += 1
+        if detailed:
+            pending.append(result)
+            if len(pending) >= DETAILED_BATCH_SIZE:
+                flush_detailed()
+        else:
+            output.write(json.dumps(result) + "\n")
+
+    def flush_detailed():
+        records = pending[:]
+        pending.clear()
+        asyncio.run(_analyze_detailed(records, [texts.popleft() for _ in records], pack_size))
+        for record in records:
+            output.write(json.dumps(record) + "\n")
+
+    if workers <= 1:
+        for task in tasks:
+            result = analyze(task)
+            for record in (result if engine == "numpy" else [result]):
+                write(record)
+    else:
+        # Pool.imap feeds tasks from a background thread as fast as it can;
+        # the semaphore caps how many are queued or unwritten at once
+        slots = threading.Semaphore(workers * task_chunksize * 4)
+        with Pool(processes=workers) as pool:
+            for result in pool.imap(analyze, _bounded(tasks, slots), chunksize=task_chunksize):
+                for record in (result if engine == "numpy" else [result]):
+                    write(record)
+                slots.release()
+
+    if pending:
+        flush_detailed()
+    output.flush()
+    elapsed = time.perf_counter() - start
+    return {
+        "prompts": count,
+        "failed": failed,
+        "elapsed": elapsed,
+        "throughput": count / elapsed if elapsed > 0 else 0.0
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point for python -m app.cli. Returns the process exit code."""
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description="Analyze a corpus of prompts and write results as JSONL"
+    )
+    parser.add_argument("source", help="JSONL file, CSV file, directory of .txt files, or - for JSONL on stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes; 1 runs inline (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64, help="Prompts sent to a worker at a time (default: 64)")
+    parser.add_argument("--engine", choices=["scalar", "numpy"], default="scalar",
+                        help="Score prompts one at a time or in NumPy batches of --chunksize (default: scalar)")
+    parser.add_argument("--target-model", default="general", help="Target model when records do not set one")
+    parser.add_argument("--dimensions", help="Comma-separated dimensions to report and score (default: all)")
+    parser.add_argument("--field", help="Prompt field name in JSONL records or CSV rows")
+    parser.add_argument("--fail-under", type=float,
+                        help="Exit with status 1 if any prompt's overall score (0-5) is below this value")
+    parser.add_argument("--detailed", action="store_true",
+                        help="Add an LLM analysis to each record (API key from OPENAI_API_KEY, ANTHROPIC_API_KEY "
+                             "or OPENROUTER_API_KEY)")
+    parser.add_argument("--pack-size", type=int, default=10,
+                        help="Maximum prompts per LLM call with --detailed; 1 disables packing (default: 10)")
+    args = parser.parse_args(argv)
+
+    dimensions = None
+    if args.dimensions:
+        try:
+            dimensions = select_dimensions([name.strip() for name in args.dimensions.split(",") if name.strip()])
+        except ValueError as e:
+            parser.error(str(e))
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = run(
+            args.source, output, args.workers, max(1, args.chunksize),
+            args.target_model, dimensions, args.field, args.fail_under, args.engine,
+            args.detailed, max(1, args.pack_size)
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(
+        f"Analyzed {summary['prompts']} prompts in {summary['elapsed']:.2f}s "
+        f"({summary['throughput']:.1f} prompts/sec)",
+        file=sys.stderr
+    )
+    if args.fail_under is not None:
+        print(f"{summary['failed']} prompts scored below {args.fail_under}", file=sys.stderr)
+        if summary["failed"]:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Admission control module.
+
+This module sheds load before it hurts everyone's latency. A monitor task
+measures event-loop lag (how late a periodic timer fires) and the middleware
+counts in-flight API requests. Past the degrade thresholds, detailed analysis
+requests are served from rule-based analysis alone; past the shed
+thresholds, new analysis requests are rejected with 503 and Retry-After.
+
+The middleware also bounds request bodies: a Content-Length over the limit is
+rejected with 413 before any of the body is read, and chunked bodies are cut
+off with 413 as soon as they exceed it, before JSON parsing.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Weight of the newest lag sample in the smoothed lag
+LAG_SMOOTHING = 0.3
+
+class LoadMonitor:
+    """
+    Tracks event-loop lag and in-flight requests and decides whether the
+    worker is degraded or overloaded.
+
+    The lag is sampled by a background task started with start(); while the
+    loop is blocked the overdue sample counts as lag too, so a request that
+    gets in right after a long block sees it.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        degrade_lag_ms: float = 100.0,
+        shed_lag_ms: float = 500.0,
+        degrade_in_flight: int = 64,
+        max_in_flight: int = 256
+    ):
+        """
+        Initialize the monitor.
+
+        Args:
+            interval: Seconds between lag samples
+            degrade_lag_ms: Lag above which detailed analysis is skipped
+            shed_lag_ms: Lag above which new analysis requests are rejected
+            degrade_in_flight: In-flight API requests above which detailed
+                analysis is skipped
+            max_in_flight: In-flight API requests at which new analysis
+                requests are rejected
+        """
+        self.interval = interval
+        self.degrade_lag_ms = degrade_lag_ms
+        self.shed_lag_ms = shed_lag_ms
+        self.degrade_in_flight = degrade_in_flight
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.degraded_count = 0
+        self.shed_count = 0
+        self._next_sample: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "LoadMonitor":
+        """Create a monitor from environment variables."""
+        return cls(
+            interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", 50)) / 1000,
+            degrade_lag_ms=float(os.getenv("DEGRADE_LOOP_LAG_MS", 100)),
+            shed_lag_ms=float(os.getenv("SHED_LOOP_LAG_MS", 500)),
+            degrade_in_flight=int(os.getenv("DEGRADE_IN_FLIGHT", 64)),
+            max_in_flight=int(os.getenv("MAX_IN_FLIGHT", 256))
+        )
+
+    def start(self):
+        """Start sampling event-loop lag (call from the running loop)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._sample())
+
+    async def stop(self):
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self):
+        while True:
+            self._next_sample = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            sample = max(0.0, time.monotonic() - self._next_sample) * 1000
+            self.lag_ms += LAG_SMOOTHING * (sample - self.lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, sample)
+
+    def current_lag_ms(self) -> float:
+        """Smoothed lag, or how overdue the pending sample is if that is larger."""
+        if self._next_sample is None:
+            return self.lag_ms
+        overdue = (time.monotonic() - self._next_sample) * 1000
+        return max(self.lag_ms, overdue)
+
+    def overloaded(self) -> bool:
+        """Whether new analysis requests should be rejected."""
+        return self.in_flight >= self.max_in_flight or self.current_lag_ms() > self.shed_lag_ms
+
+    def degraded(self) -> bool:
+        """Whether requests should be served without detailed analysis."""
+        return self.in_flight > self.degrade_in_flight or self.current_lag_ms() > self.degrade_lag_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """Current load, thresholds and how many requests were degraded or shed."""
+        return {
+            "loop_lag_ms": round(self.current_lag_ms(), 3),
+            "max_loop_lag_ms": round(self.max_lag_ms, 3),
+            "in_flight": self.in_flight,
+            "degrade_lag_ms": self.degrade_lag_ms,
+            "shed_lag_ms": self.shed_lag_ms,
+            "degrade_in_flight": self.degrade_in_flight,
+            "max_in_flight": self.max_in_flight,
+            "degraded": self.degraded_count,
+            "shed": self.shed_count
+        }
+
+class AdmissionMiddleware:
+    """
+    Enforce the request body limit and shed analysis requests under load.
+
+    Only requests under path_prefix are counted and checked; analysis
+    requests (any method but GET and HEAD) are the ones shed, so health
+    checks, static files and metadata stay available.
+    """
+
+    def __init__(self, app: ASGIApp, monitor: LoadMonitor, max_body_bytes: int = 4 * 1024 * 1024, path_prefix: str = "/api/"):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application to wrap
+            monitor: Load monitor deciding when to shed
+            max_body_bytes: Largest accepted request body
+            path_prefix: Paths that are counted, limited and shed
+        """
+        self.app = app
+        self.monitor = monitor
+        self.max_body_bytes = max_body_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await self._reject(scope, receive, send, 413, f"Request body too large (maximum {self.max_body_bytes} bytes)")
+            return
+
+        if scope["method"] not in ("GET", "HEAD") and self.monitor.overloaded():
+            self.monitor.shed_count += 1
+            logger.warning(f"Shedding request: {self.monitor.in_flight} in flight, loop lag {self.monitor.current_lag_ms():.0f} ms")
+            await self._reject(scope, receive, send, 503, "Server is overloaded. Please try again later.", {"Retry-After": "1"})
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Raised inside body reading, so FastAPI answers with it
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Request body too large (maximum {self.max_body_bytes} bytes)"
+                    )
+            return message
+
+        self.monitor.in_flight += 1
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            self.monitor.in_flight -= 1
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None):
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+        await response(scope, receive, send)
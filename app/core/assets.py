@@ -0,0 +1,238 @@
+"""
+Static asset module.
+
+This module fingerprints the files in the static directory by content hash,
+pre-compresses them (gzip, plus brotli when the brotli package is installed)
+and serves them from memory. Fingerprinted URLs are cached by browsers for a
+year as immutable; the page template references them through asset_url(),
+and the rendered page is cached once per asset version.
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+from typing import Dict, List, Optional
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # Optional: serve gzip only
+    brotli = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+STATIC_DIRECTORY = "static"
+TEMPLATE_DIRECTORY = "templates"
+URL_PREFIX = "/static"
+
+# File types worth compressing
+COMPRESSIBLE_TYPES = (".css", ".js", ".html", ".svg", ".json", ".txt", ".map")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+def choose_encoding(accept_encoding: Optional[str], available: List[str]) -> Optional[str]:
+    """
+    Pick the best content encoding the client accepts.
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header
+        available: Encodings on offer, in order of preference
+
+    Returns:
+        The chosen encoding, or None for identity
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+class StaticAsset:
+    """An asset's content in every encoding, with its fingerprint."""
+
+    __slots__ = ("path", "url", "media_type", "digest", "bodies", "cache_control")
+
+    def __init__(self, path: str, url: str, content: bytes, cache_control: str = IMMUTABLE_CACHE_CONTROL):
+        self.path = path
+        self.url = url
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.digest = hashlib.sha256(content).hexdigest()[:12]
+        self.cache_control = cache_control
+        self.bodies: Dict[Optional[str], bytes] = {None: content}
+
+        # Keep compressed forms only when they are actually smaller
+        if path.endswith(COMPRESSIBLE_TYPES):
+            compressed = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed["br"] = brotli.compress(content, quality=11)
+            for encoding, body in compressed.items():
+                if len(body) < len(content):
+                    self.bodies[encoding] = body
+
+    def etag(self, encoding: Optional[str]) -> str:
+        """Strong ETag of one representation."""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def response(self, accept_encoding: Optional[str], if_none_match: Optional[str],
+                 cache_control: Optional[str] = None) -> Response:
+        """
+        Build the response for a request.
+
+        Args:
+            accept_encoding: The request's Accept-Encoding header
+            if_none_match: The request's If-None-Match header
+            cache_control: Cache-Control override (default: the asset's)
+
+        Returns:
+            200 with the best encoding, or 304 if the client's copy is current
+        """
+        encoding = choose_encoding(accept_encoding, [name for name in ("br", "gzip") if name in self.bodies])
+        headers = {
+            "ETag": self.etag(encoding),
+            "Cache-Control": cache_control or self.cache_control,
+            "Vary": "Accept-Encoding"
+        }
+
+        # Check whether the client already has any representation of this content
+        if if_none_match:
+            tags = set()
+            for tag in if_none_match.split(","):
+                tag = tag.strip()
+                tags.add(tag[2:] if tag.startswith("W/") else tag)
+            if "*" in tags or any(self.etag(name) in tags for name in self.bodies):
+                return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], media_type=self.media_type, headers=headers)
+
+class AssetManifest:
+    """
+    Fingerprinted, pre-compressed copies of every file in the static directory.
+
+    A file static/js/main.js is served as /static/js/main.<hash>.js with
+    immutable caching, and still at /static/js/main.js with revalidation for
+    clients holding old URLs.
+    """
+
+    def __init__(self, directory: str = STATIC_DIRECTORY, url_prefix: str = URL_PREFIX):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.assets: Dict[str, StaticAsset] = {}
+        self.fingerprinted: Dict[str, StaticAsset] = {}
+        self.mtimes: Dict[str, float] = {}
+
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                with open(full_path, "rb") as handle:
+                    content = handle.read()
+                self.mtimes[full_path] = os.path.getmtime(full_path)
+
+                asset = StaticAsset(path, "", content)
+                stem, extension = os.path.splitext(path)
+                fingerprinted_path = f"{stem}.{asset.digest}{extension}"
+                asset.url = f"{url_prefix}/{fingerprinted_path}"
+                self.assets[path] = asset
+                self.fingerprinted[fingerprinted_path] = asset
+
+        # The version changes whenever any asset does
+        self.version = hashlib.sha256(
+            "".join(f"{path}:{asset.digest}" for path, asset in sorted(self.assets.items())).encode()
+        ).hexdigest()[:12]
+        logger.info(f"Built asset manifest {self.version} with {len(self.assets)} files")
+
+    def url(self, path: str) -> str:
+        """Return the fingerprinted URL of a static file (or its plain URL if unknown)."""
+        asset = self.assets.get(path)
+        return asset.url if asset else f"{self.url_prefix}/{path}"
+
+    def is_stale(self) -> bool:
+        """Check whether any static file was changed, added or removed."""
+        current = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                current[full_path] = os.path.getmtime(full_path)
+        return current != self.mtimes
+
+    def response(self, path: str, accept_encoding: Optional[str], if_none_match: Optional[str]) -> Optional[Response]:
+        """Serve a static path, or return None if there is no such asset."""
+        asset = self.fingerprinted.get(path)
+        if asset is not None:
+            return asset.response(accept_encoding, if_none_match)
+        asset = self.assets.get(path)
+        if asset is not None:
+            # Unversioned URL: the content can change, so clients must revalidate
+            return asset.response(accept_encoding, if_none_match, REVALIDATE_CACHE_CONTROL)
+        return None
+
+_manifest: Optional[AssetManifest] = None
+_pages: Dict[str, StaticAsset] = {}
+_lock = threading.Lock()
+
+def _watching() -> bool:
+    """Whether static files and templates are checked for changes (ASSETS_WATCH, off by default)."""
+    return os.getenv("ASSETS_WATCH", "False").lower() == "true"
+
+def get_asset_manifest() -> AssetManifest:
+    """
+    Return the asset manifest, building it on first use.
+
+    With ASSETS_WATCH enabled the manifest is rebuilt when a static file
+    changes, so edits show up without a restart. Each check walks the static
+    tree, so watching is meant for development only.
+    """
+    global _manifest
+    manifest = _manifest
+    if manifest is None or (_watching() and manifest.is_stale()):
+        with _lock:
+            if _manifest is manifest:
+                _manifest = AssetManifest()
+                _pages.clear()
+            manifest = _manifest
+    return manifest
+
+def render_page(template_name: str) -> StaticAsset:
+    """
+    Render a template once per asset version (and, with ASSETS_WATCH
+    enabled, template file change) and cache it pre-compressed.
+
+    Templates get asset_url(path) to reference fingerprinted static files.
+    """
+    manifest = get_asset_manifest()
+    mtime = os.path.getmtime(os.path.join(TEMPLATE_DIRECTORY, template_name)) if _watching() else 0
+    key = f"{manifest.version}:{template_name}:{mtime}"
+    page = _pages.get(key)
+    if page is None:
+        # Jinja2 is only imported when a page is first rendered
+        from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+        environment = Environment(loader=FileSystemLoader(TEMPLATE_DIRECTORY), autoescape=select_autoescape())
+        html = environment.get_template(template_name).render(asset_url=manifest.url)
+        page = StaticAsset(template_name, "", html.encode("utf-8"), cache_control=REVALIDATE_CACHE_CONTROL)
+        # Starlette appends "; charset=utf-8" to text/ media types itself
+        page.media_type = "text/html"
+        _pages[key] = page
+    return page
@@ -0,0 +1,186 @@
+"""
+Vectorized batch scoring module.
+
+This module scores many prompts at once. Each prompt is passed once through
+the compiled rule matcher to fill one row of a (prompts x rules) feature
+matrix; bonuses, caps, clipping, strength/weakness thresholds and the
+overall scores are then computed column-wise with NumPy.
+
+Bonuses are added one rule column at a time, in rule pack order, so every
+score is bit-for-bit identical to analyze_prompt_rules.
+"""
+
+import logging
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from app.core.analyzer import DIMENSIONS
+from app.core.rules import CompiledRule, CompiledRuleSet, PromptText, BAND_CONDITIONS, get_rule_set
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BAND_FUNCTIONS = {
+    "gt": np.greater,
+    "gte": np.greater_equal,
+    "lt": np.less,
+    "lte": np.less_equal
+}
+
+def _rule_bonus(rule: CompiledRule, values: np.ndarray) -> np.ndarray:
+    """Compute the bonus column of one rule from its feature column."""
+    spec = rule.spec
+    if rule.type == "count":
+        return np.where(values > 0, np.minimum(spec["cap"], values * spec["per_match"]), 0.0)
+    if rule.type == "feature":
+        # First matching band wins; NaN (undefined feature) matches no band
+        conditions = []
+        bonuses = []
+        for band in spec["bands"]:
+            key = next(key for key in BAND_CONDITIONS if key in band)
+            conditions.append(BAND_FUNCTIONS[key](values, band[key]))
+            bonuses.append(band["bonus"])
+        return np.select(conditions, bonuses, default=0.0)
+    return np.where(values != 0, spec["bonus"], 0.0)
+
+class BatchResult:
+    """
+    Scores of a batch of prompts.
+
+    Attributes:
+        dimensions: Dimension names, in column order
+        scores: (prompts x dimensions) array of clipped dimension scores
+        strengths: (prompts x dimensions) boolean array of strength hits
+        weaknesses: (prompts x dimensions) boolean array of weakness hits
+        overall_scores: Unweighted mean score scaled to 0-5, as the API reports it
+        weighted_scores: DIMENSIONS-weighted mean score scaled to 0-5
+    """
+
+    def __init__(self, rule_set: CompiledRuleSet, dimensions: List[str], scores: np.ndarray,
+                 strengths: np.ndarray, weaknesses: np.ndarray,
+                 overall_scores: np.ndarray, weighted_scores: np.ndarray):
+        self.rule_set = rule_set
+        self.dimensions = dimensions
+        self.scores = scores
+        self.strengths = strengths
+        self.weaknesses = weaknesses
+        self.overall_scores = overall_scores
+        self.weighted_scores = weighted_scores
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def analysis(self, index: int) -> Dict[str, Any]:
+        """Return the analyze_prompt_rules-shaped result of one prompt."""
+        dimension_map = self.rule_set.dimension_map
+        results = {
+            "dimension_scores": {},
+            "strengths": [],
+            "weaknesses": []
+        }
+        for column, name in enumerate(self.dimensions):
+            results["dimension_scores"][name] = float(self.scores[index, column])
+            if self.strengths[index, column]:
+                results["strengths"].append(dimension_map[name].strength["message"])
+            elif self.weaknesses[index, column]:
+                results["weaknesses"].append(dimension_map[name].weakness["message"])
+        return results
+
+    def analyses(self) -> List[Dict[str, Any]]:
+        """Return the analyze_prompt_rules-shaped results of every prompt."""
+        return [self.analysis(index) for index in range(len(self))]
+
+def extract_features(prompts: List[str], rule_set: CompiledRuleSet,
+                     dimensions: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Build the (prompts x rules) feature matrix.
+
+    Boolean rules become 0/1, count rules the number of indicators present
+    and numeric features their value, with NaN where a feature is undefined.
+    """
+    selected = rule_set.dimensions if dimensions is None else [rule_set.dimension_map[name] for name in dimensions]
+    extractors = [rule.extract for dimension in selected for rule in dimension.rules]
+    features = np.empty((len(prompts), len(extractors)), dtype=np.float64)
+    nan = np.nan
+
+    for row, prompt_text in enumerate(prompts):
+        text = PromptText(prompt_text)
+        values = [extract(text) for extract in extractors]
+        features[row] = [nan if value is None else value for value in values]
+    return features
+
+def score_batch(prompts: List[str], dimensions: Optional[List[str]] = None,
+                rule_set: Optional[CompiledRuleSet] = None) -> BatchResult:
+    """
+    Score a batch of prompts with vectorized operations.
+
+    Args:
+        prompts: Prompt texts to score
+        dimensions: Only score these dimensions (default: all, in rule pack order)
+        rule_set: Compiled rule set to use (default: the active one)
+
+    Returns:
+        BatchResult with per-dimension and overall scores
+    """
+    rule_set = rule_set or get_rule_set()
+    selected = rule_set.dimensions if dimensions is None else [rule_set.dimension_map[name] for name in dimensions]
+    names = [dimension.name for dimension in selected]
+    features = extract_features(prompts, rule_set, names)
+
+    count = len(prompts)
+    scores = np.empty((count, len(selected)), dtype=np.float64)
+    strengths = np.zeros((count, len(selected)), dtype=bool)
+    weaknesses = np.zeros((count, len(selected)), dtype=bool)
+    lengths = np.fromiter((len(prompt_text) for prompt_text in prompts), dtype=np.int64, count=count)
+
+    column = 0
+    for index, dimension in enumerate(selected):
+        # Add bonuses in rule order so rounding matches the scalar path
+        score = np.full(count, dimension.base, dtype=np.float64)
+        for rule in dimension.rules:
+            score = score + _rule_bonus(rule, features[:, column])
+            column += 1
+        score = np.maximum(dimension.min, np.minimum(dimension.max, score))
+        scores[:, index] = score
+
+        if dimension.strength is not None:
+            strengths[:, index] = score >= dimension.strength["min_score"]
+        if dimension.weakness is not None:
+            weaknesses[:, index] = (
+                ~strengths[:, index]
+                & (score <= dimension.weakness["max_score"])
+                & (lengths > dimension.weakness.get("min_length", -1))
+            )
+
+    # Sum dimension by dimension, matching the left-to-right scalar sums
+    total = np.zeros(count, dtype=np.float64)
+    weighted_total = np.zeros(count, dtype=np.float64)
+    total_weight = 0.0
+    for index, name in enumerate(names):
+        weight = DIMENSIONS.get(name, {}).get("weight", 1.0)
+        total = total + scores[:, index]
+        weighted_total = weighted_total + weight * scores[:, index]
+        total_weight += weight
+
+    if names:
+        overall_scores = total / len(names) * 5
+        weighted_scores = weighted_total / total_weight * 5 if total_weight else np.zeros(count)
+    else:
+        overall_scores = np.zeros(count)
+        weighted_scores = np.zeros(count)
+
+    return BatchResult(rule_set, names, scores, strengths, weaknesses, overall_scores, weighted_scores)
+
+def analyze_batch(prompts: List[str], dimensions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Analyze a batch of prompts.
+
+    Args:
+        prompts: Prompt texts to analyze
+        dimensions: Only score these dimensions (default: all)
+
+    Returns:
+        One analyze_prompt_rules-shaped dictionary per prompt
+    """
+    return score_batch(prompts, dimensions).analyses()
@@ -0,0 +1,409 @@
+"""
+Compact analysis result module.
+
+This module contains a memory-efficient representation of analysis results
+for storing large numbers of them (history, audit jobs). Scores are kept in a
+fixed-order float array, canned messages and suggestion templates are stored
+as small integer codes, and anything that is not canned (for example LLM
+output) is kept verbatim so the conversion back to the API shape is lossless.
+"""
+
+import json
+import math
+import struct
+import sys
+import hashlib
+from array import array
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.core.analyzer import DIMENSIONS
+from app.core.optimizer import (
+    DIMENSION_SUGGESTIONS,
+    generate_suggestion_for_dimension,
+    generate_model_specific_suggestions,
+    generate_general_suggestions
+)
+
+# Fixed score order used by the score array
+DIMENSION_ORDER: Tuple[str, ...] = tuple(DIMENSIONS)
+
+# Canned message tables. Codes are persisted, so these tables are append-only:
+# never reorder or remove an entry, only add new ones at the end.
+STRENGTH_MESSAGES: Tuple[str, ...] = (
+    "Clear and specific instructions",
+    "Good background context provided",
+    "Well-defined task or request",
+    "Well-structured prompt with good organization",
+    "Effective use of examples",
+    "Concise and efficient language",
+    "Clear output format or style specifications",
+    "Effective use of role prompting",
+    "Good guidance for reasoning process",
+    "Clear constraints and limitations",
+)
+
+WEAKNESS_MESSAGES: Tuple[str, ...] = (
+    "Instructions lack clarity and specificity",
+    "Insufficient context or background information",
+    "Task or request is poorly defined",
+    "Poor structure or organization",
+    "Missing or ineffective examples",
+    "Unnecessarily verbose or repetitive",
+    "Unclear expectations for output format or style",
+)
+
+# Suggestion templates, identified by (kind, key). Append-only as above.
+SUGGESTION_TEMPLATES: Tuple[Tuple[str, str], ...] = tuple(
+    [("dimension", dimension) for dimension in DIMENSION_ORDER] + [
+        ("model", "gpt-4"),
+        ("model", "claude"),
+        ("model", "llama"),
+        ("general", "Expand your prompt"),
+        ("general", "Add a clear request"),
+    ]
+)
+
+# Code value marking "the next item is stored verbatim in extras"
+EXTRA_CODE = 255
+
+# Binary format version for to_bytes/from_bytes. Suggestions stored as
+# template codes are rebuilt when decoding, so the version also pins what the
+# templates generate: bump it whenever a template's output changes, keep a
+# builder of the old output in _LEGACY_BUILDERS and record the new digest in
+# TEMPLATE_DIGESTS, so older records still decode to what was stored.
+FORMAT_VERSION = 2
+
+# Digest of what each format version's templates generate for TEMPLATE_PROBES
+# (benchmarks.compact_memory fails when the current templates no longer match)
+TEMPLATE_DIGESTS = {
+    1: "6598fc04fe24dbaf1826e81b88c72d2cb2097e976f7660c324c972a83169cce8",
+    2: "0b205ee8c40613ae54a6aeaa5716bdecda2661871db3967736d676cb4558ea05"
+}
+
+# Prompts the template digests are computed over (short, long, repeated and
+# filler-word text, so every template and branch is exercised)
+TEMPLATE_PROBES = (
+    "",
+    "Tell me about AI",
+    "You are an expert. Basically, explain the results really clearly.\n"
+    "Answer using only the provided context and cite your sources.\n"
+    "Answer using only the provided context and cite your sources.",
+)
+
+_STRENGTH_CODES = {message: code for code, message in enumerate(STRENGTH_MESSAGES)}
+_WEAKNESS_CODES = {message: code for code, message in enumerate(WEAKNESS_MESSAGES)}
+_HEADER = struct.Struct("<BBd")
+_LENGTH = struct.Struct("<I")
+_MISSING = float("nan")
+
+def _conciseness_v1(prompt_text: str, score: float) -> Dict[str, Any]:
+    """The conciseness suggestion of format version 1 (before repeated passages were reported)."""
+    suggestion = dict(DIMENSION_SUGGESTIONS["conciseness"])
+    result = prompt_text
+    for word in ("basically", "actually", "literally", "very", "really", "just", "so", "quite"):
+        result = result.replace(f" {word} ", " ")
+    suggestion["implementation"] = result
+    return suggestion
+
+# Builders of templates whose output has changed since a format version,
+# keyed by (version, template key)
+_LEGACY_BUILDERS = {
+    (1, "conciseness"): _conciseness_v1
+}
+
+def _build_template(code: int, prompt_text: str, score: float,
+                    version: int = FORMAT_VERSION) -> Optional[Dict[str, Any]]:
+    """Rebuild the suggestion for a template code as format version generated it."""
+    kind, key = SUGGESTION_TEMPLATES[code]
+    if kind == "dimension":
+        legacy = _LEGACY_BUILDERS.get((version, key))
+        if legacy is not None:
+            return legacy(prompt_text, score)
+        return generate_suggestion_for_dimension(key, prompt_text, score)
+    if kind == "model":
+        suggestions = generate_model_specific_suggestions(prompt_text, key)
+    else:
+        suggestions = [s for s in generate_general_suggestions(prompt_text) if s["title"] == key]
+    return suggestions[0] if suggestions else None
+
+def _title_codes() -> Dict[str, int]:
+    """Map suggestion titles to template codes."""
+    codes = {}
+    for code, (kind, key) in enumerate(SUGGESTION_TEMPLATES):
+        if kind == "general":
+            codes[key] = code
+        else:
+            # Build once with an empty prompt just to read the static title
+            suggestion = _build_template(code, "", 0.0)
+            codes[suggestion["title"]] = code
+    return codes
+
+_SUGGESTION_CODES = _title_codes()
+
+def template_digest(version: int = FORMAT_VERSION) -> str:
+    """Digest of what a format version's templates generate for TEMPLATE_PROBES."""
+    built = [
+        _build_template(code, prompt_text, 0.3, version)
+        for prompt_text in TEMPLATE_PROBES
+        for code in range(len(SUGGESTION_TEMPLATES))
+    ]
+    return hashlib.sha256(json.dumps(built, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _encode_messages(messages: List[Any], codes: Dict[str, int], extras: List[Any]) -> bytes:
+    """Encode a list of messages as codes, spilling unknown ones to extras."""
+    encoded = bytearray()
+    for message in messages:
+        code = codes.get(message) if isinstance(message, str) else None
+        if code is None:
+            encoded.append(EXTRA_CODE)
+            extras.append(message)
+        else:
+            encoded.append(code)
+    return bytes(encoded)
+
+def _decode_messages(encoded: bytes, table: Tuple[str, ...], extras: List[Any]) -> List[Any]:
+    """Decode a list of message codes, consuming verbatim items from extras."""
+    messages = []
+    for code in encoded:
+        if code == EXTRA_CODE:
+            messages.append(extras.pop(0))
+        else:
+            messages.append(table[code])
+    return messages
+
+class CompactAnalysis:
+    """
+    Compact, slot-based record for one analysis result.
+
+    The record keeps the prompt text once and regenerates the suggestion
+    implementations (which embed the prompt) on conversion back to the API
+    shape, instead of holding a copy of the prompt per suggestion.
+    """
+
+    __slots__ = (
+        "scores",
+        "overall_score",
+        "strength_codes",
+        "weakness_codes",
+        "suggestion_codes",
+        "prompt_text",
+        "optimized_prompt",
+        "extras",
+        "version"
+    )
+
+    def __init__(
+        self,
+        scores: array,
+        overall_score: float,
+        strength_codes: bytes,
+        weakness_codes: bytes,
+        suggestion_codes: bytes,
+        prompt_text: str,
+        optimized_prompt: Optional[str] = None,
+        extras: Optional[Dict[str, Any]] = None,
+        version: int = FORMAT_VERSION
+    ):
+        """
+        Initialize the record.
+
+        Args:
+            scores: Scores in DIMENSION_ORDER, NaN for dimensions not scored
+            overall_score: Overall score as returned by the API
+            strength_codes: Codes into STRENGTH_MESSAGES
+            weakness_codes: Codes into WEAKNESS_MESSAGES
+            suggestion_codes: Codes into SUGGESTION_TEMPLATES
+            prompt_text: The analyzed prompt text
+            optimized_prompt: Optimized prompt, or None when it equals prompt_text
+            extras: Verbatim items that have no code, or None when empty
+            version: Format version whose templates the suggestion codes
+                refer to (older for records read from storage)
+        """
+        self.scores = scores
+        self.overall_score = overall_score
+        self.strength_codes = strength_codes
+        self.weakness_codes = weakness_codes
+        self.suggestion_codes = suggestion_codes
+        self.prompt_text = prompt_text
+        self.optimized_prompt = optimized_prompt
+        self.extras = extras
+        self.version = version
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any], prompt_text: str) -> "CompactAnalysis":
+        """
+        Build a compact record from an API-shaped analysis response.
+
+        Args:
+            response: Dictionary with scores, overall_score, suggestions,
+                strengths, weaknesses and optimized_prompt
+            prompt_text: The prompt text the response was generated for
+
+        Returns:
+            CompactAnalysis holding the same information
+        """
+        extras: Dict[str, Any] = {}
+        scores_dict = response["scores"]
+
+        # Pack known float scores into the fixed-order array
+        scores = array("d", [_MISSING] * len(DIMENSION_ORDER))
+        canonical_keys = []
+        for index, dimension in enumerate(DIMENSION_ORDER):
+            value = scores_dict.get(dimension)
+            if type(value) is float and not math.isnan(value):
+                scores[index] = value
+                canonical_keys.append(dimension)
+
+        # Anything else (LLM-only keys, ints, unusual key order) is kept as-is
+        extra_keys = [key for key in scores_dict if key not in canonical_keys]
+        if list(scores_dict) != canonical_keys + extra_keys:
+            extras["scores"] = dict(scores_dict)
+        elif extra_keys:
+            extras["extra_scores"] = [[key, scores_dict[key]] for key in extra_keys]
+
+        strengths: List[Any] = []
+        weaknesses: List[Any] = []
+        strength_codes = _encode_messages(response["strengths"], _STRENGTH_CODES, strengths)
+        weakness_codes = _encode_messages(response["weaknesses"], _WEAKNESS_CODES, weaknesses)
+
+        # Store suggestions as template codes when they can be rebuilt exactly
+        suggestions: List[Any] = []
+        suggestion_codes = bytearray()
+        for suggestion in response["suggestions"]:
+            code = None
+            if isinstance(suggestion, dict):
+                code = _SUGGESTION_CODES.get(suggestion.get("title"))
+            if code is not None:
+                kind, key = SUGGESTION_TEMPLATES[code]
+                score = scores_dict.get(key, 0.0) if kind == "dimension" else 0.0
+                if _build_template(code, prompt_text, score) != suggestion:
+                    code = None
+            if code is None:
+                suggestion_codes.append(EXTRA_CODE)
+                suggestions.append(suggestion)
+            else:
+                suggestion_codes.append(code)
+
+        for name, items in (("strengths", strengths), ("weaknesses", weaknesses), ("suggestions", suggestions)):
+            if items:
+                extras[name] = items
+
+        optimized_prompt = response["optimized_prompt"]
+        if optimized_prompt == prompt_text:
+            optimized_prompt = None
+
+        return cls(
+            scores=scores,
+            overall_score=response["overall_score"],
+            strength_codes=strength_codes,
+            weakness_codes=weakness_codes,
+            suggestion_codes=bytes(suggestion_codes),
+            prompt_text=prompt_text,
+            optimized_prompt=optimized_prompt,
+            extras=extras or None
+        )
+
+    def score_dict(self) -> Dict[str, Any]:
+        """Return the dimension scores in the API shape."""
+        extras = self.extras or {}
+        if "scores" in extras:
+            return dict(extras["scores"])
+        scores = {
+            dimension: value
+            for dimension, value in zip(DIMENSION_ORDER, self.scores)
+            if not math.isnan(value)
+        }
+        for key, value in extras.get("extra_scores", ()):
+            scores[key] = value
+        return scores
+
+    def to_response(self) -> Dict[str, Any]:
+        """
+        Convert the record back to the API response shape.
+
+        Returns:
+            Dictionary equal to the response the record was built from
+        """
+        extras = self.extras or {}
+        scores = self.score_dict()
+
+        suggestions = []
+        verbatim = list(extras.get("suggestions", ()))
+        for code in self.suggestion_codes:
+            if code == EXTRA_CODE:
+                suggestions.append(verbatim.pop(0))
+                continue
+            kind, key = SUGGESTION_TEMPLATES[code]
+            score = scores.get(key, 0.0) if kind == "dimension" else 0.0
+            suggestions.append(_build_template(code, self.prompt_text, score, self.version))
+
+        return {
+            "scores": scores,
+            "overall_score": self.overall_score,
+            "suggestions": suggestions,
+            "strengths": _decode_messages(self.strength_codes, STRENGTH_MESSAGES, list(extras.get("strengths", ()))),
+            "weaknesses": _decode_messages(self.weakness_codes, WEAKNESS_MESSAGES, list(extras.get("weaknesses", ()))),
+            "optimized_prompt": self.prompt_text if self.optimized_prompt is None else self.optimized_prompt
+        }
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the record to a compact binary form for storage.
+
+        Layout: version, score count, overall score, scores as little-endian
+        doubles, then length-prefixed code strings, prompt, optimized prompt
+        and JSON extras.
+        """
+        parts = [_HEADER.pack(self.version, len(self.scores), self.overall_score)]
+        scores = array("d", self.scores)
+        if sys.byteorder == "big":
+            scores.byteswap()
+        parts.append(scores.tobytes())
+
+        optimized = b"" if self.optimized_prompt is None else b"\x01" + self.optimized_prompt.encode("utf-8")
+        extras = b"" if self.extras is None else json.dumps(self.extras, separators=(",", ":")).encode("utf-8")
+        for field in (
+            self.strength_codes,
+            self.weakness_codes,
+            self.suggestion_codes,
+            self.prompt_text.encode("utf-8"),
+            optimized,
+            extras
+        ):
+            parts.append(_LENGTH.pack(len(field)))
+            parts.append(field)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompactAnalysis":
+        """Deserialize a record produced by to_bytes."""
+        version, score_count, overall_score = _HEADER.unpack_from(data, 0)
+        if version not in TEMPLATE_DIGESTS:
+            raise ValueError(f"Unsupported compact analysis format version: {version}")
+        offset = _HEADER.size
+
+        scores = array("d")
+        scores.frombytes(data[offset:offset + score_count * 8])
+        if sys.byteorder == "big":
+            scores.byteswap()
+        offset += score_count * 8
+
+        fields = []
+        for _ in range(6):
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            fields.append(bytes(data[offset:offset + length]))
+            offset += length
+        strength_codes, weakness_codes, suggestion_codes, prompt, optimized, extras = fields
+
+        return cls(
+            scores=scores,
+            overall_score=overall_score,
+            strength_codes=strength_codes,
+            weakness_codes=weakness_codes,
+            suggestion_codes=suggestion_codes,
+            prompt_text=prompt.decode("utf-8"),
+            optimized_prompt=optimized[1:].decode("utf-8") if optimized else None,
+            extras=json.loads(extras) if extras else None,
+            version=version
+        )
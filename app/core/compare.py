@@ -0,0 +1,64 @@
+"""
+Prompt comparison module.
+
+This module compares two versions of a prompt: per-dimension score deltas,
+strengths and weaknesses gained or lost, and a line and word diff. Both
+versions are analyzed with one SegmentMemo, so lines and sentences they
+share are lowercased, split and matched once; comparing two nearly
+identical prompts costs little more than analyzing one of them.
+"""
+
+from typing import Dict, List, Any, Optional
+
+from app.core.analyzer import calculate_overall_score, calculate_weighted_overall_score
+from app.core.diff import diff_text
+from app.core.rules import SegmentMemo, get_rule_set
+
+def _changes(before: List[str], after: List[str]) -> Dict[str, List[str]]:
+    """Messages present in only one of two lists."""
+    return {
+        "added": [message for message in after if message not in before],
+        "removed": [message for message in before if message not in after]
+    }
+
+def compare_prompts(before: str, after: str, dimensions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Compare two versions of a prompt.
+
+    A module-level function so it can run in a process pool.
+
+    Args:
+        before: The earlier version
+        after: The revised version
+        dimensions: Only analyze these dimensions, a real subset as returned
+            by select_dimensions; overall scores are then DIMENSIONS-weighted,
+            as in /analyze (default: all)
+
+    Returns:
+        Scores and overall scores of both versions, score deltas (after
+        minus before), strength and weakness changes, the diff and the
+        rules version used
+    """
+    rule_set = get_rule_set()
+    memo = SegmentMemo()
+    analyses = [rule_set.analyze(text, dimensions, memo) for text in (before, after)]
+    overall = calculate_weighted_overall_score if dimensions else calculate_overall_score
+
+    versions = [
+        {"scores": analysis["dimension_scores"], "overall_score": overall(analysis["dimension_scores"])}
+        for analysis in analyses
+    ]
+    old, new = analyses
+    return {
+        "before": versions[0],
+        "after": versions[1],
+        "deltas": {
+            name: new["dimension_scores"][name] - score
+            for name, score in old["dimension_scores"].items()
+        },
+        "overall_delta": versions[1]["overall_score"] - versions[0]["overall_score"],
+        "strengths": _changes(old["strengths"], new["strengths"]),
+        "weaknesses": _changes(old["weaknesses"], new["weaknesses"]),
+        "diff": diff_text(before, after),
+        "rules_version": rule_set.version
+    }
@@ -0,0 +1,144 @@
+"""
+Response compression middleware.
+
+This module negotiates gzip or brotli (when the brotli package is installed)
+from Accept-Encoding and compresses API responses on the fly. Small bodies
+are sent as-is. Streaming responses such as NDJSON are compressed
+chunk by chunk and flushed after every chunk, so clients still receive each
+line as soon as it is produced.
+"""
+
+import zlib
+import logging
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.assets import choose_encoding, brotli
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Content types worth compressing
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json", "application/x-ndjson", "text/", "application/javascript"
+)
+
+class _Compressor:
+    """Incremental gzip or brotli compressor with per-chunk flushing."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=min(level, 11))
+        else:
+            # wbits 31 selects the gzip container
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            body = self._brotli.process(data)
+            return body + (self._brotli.finish() if final else self._brotli.flush())
+        body = self._zlib.compress(data)
+        return body + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    Compress responses according to the request's Accept-Encoding.
+
+    Responses that already carry a Content-Encoding (pre-compressed static
+    assets), non-compressible content types and single-message bodies
+    smaller than minimum_size are passed through unchanged.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, level: int = 6):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application to wrap
+            minimum_size: Smallest body, in bytes, worth compressing
+            level: Compression level (gzip 1-9; brotli quality is capped at 11)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.encodings: List[str] = (["br"] if brotli is not None else []) + ["gzip"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size, self.level)
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    """Rewrites the response messages of one request."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int, level: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.level = level
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+
+    def _should_compress(self, status: int, headers: Headers) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows the response size
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start = self.start_message
+            self.start_message = None
+            headers = MutableHeaders(scope=start)
+            if self._should_compress(start["status"], headers) and (more_body or len(body) >= self.minimum_size):
+                self.compressor = _Compressor(self.encoding, self.level)
+                headers["Content-Encoding"] = self.encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # The compressed bytes differ from the identity representation
+                    headers["ETag"] = f"W/{etag}"
+
+                # Single-message body: compress it whole and keep a Content-Length
+                if not more_body:
+                    body = self.compressor.compress(body, final=True)
+                    headers["Content-Length"] = str(len(body))
+                    await self._send(start)
+                    await self._send({"type": "http.response.body", "body": body, "more_body": False})
+                    return
+            await self._send(start)
+
+        if self.compressor is None:
+            await self._send(message)
+            return
+
+        await self._send({
+            "type": "http.response.body",
+            "body": self.compressor.compress(body, final=not more_body),
+            "more_body": more_body
+        })
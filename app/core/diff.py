@@ -0,0 +1,204 @@
+"""
+Linear-space text diff module.
+
+This module diffs sequences with Myers' O(ND) algorithm in its linear-space
+form: instead of keeping every edit path, each step finds the middle snake
+of the remaining block and splits the problem in two around it, so memory
+stays proportional to the input and time to its size times the number of
+differences. Common prefixes and suffixes are stripped first, which makes
+nearly identical texts almost free to diff.
+
+Texts are diffed by line, and replaced lines by word, with opcodes shaped
+like difflib's (tag, i1, i2, j1, j2).
+"""
+
+import re
+from typing import Dict, List, Any, Hashable, Sequence, Tuple
+
+# Differences explored per block before it is reported as one replacement,
+# which bounds the time spent on unrelated texts
+DIFF_MAX_EDITS = 2000
+
+# Words diffed inside a replaced block before it is reported whole
+WORD_DIFF_MAX_TOKENS = 5000
+
+_WORD_TOKENS = re.compile(r"\s+|\S+")
+
+Opcode = Tuple[str, int, int, int, int]
+
+def _middle_snake(a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int,
+                  max_edits: int) -> Tuple[int, int, int, int]:
+    """
+    Find the middle snake of a[alo:ahi] and b[blo:bhi].
+
+    Returns:
+        Start and end of the snake as offsets (x, y, u, v) into the block,
+        or None when the block has more than max_edits differences
+    """
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    limit = min((n + m + 1) // 2, (max_edits + 1) // 2)
+    offset = limit + 1
+    forward = [0] * (2 * limit + 3)
+    backward = [0] * (2 * limit + 3)
+
+    for d in range(limit + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            # The reverse paths of step d - 1 cover diagonals delta -/+ (d - 1)
+            if odd and delta - d < k < delta + d and x + backward[offset + delta - k] >= n:
+                return start_x, start_y, x, y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + forward[offset + delta - k] >= n:
+                return n - x, m - y, n - start_x, m - start_y
+    return None
+
+def diff_sequences(a: Sequence[Hashable], b: Sequence[Hashable], max_edits: int = DIFF_MAX_EDITS) -> List[Opcode]:
+    """
+    Diff two sequences in linear space.
+
+    Args:
+        a: Old sequence
+        b: New sequence
+        max_edits: Differences explored per block before the block is
+            reported as a single replacement
+
+    Returns:
+        difflib-style opcodes ("equal", "replace", "delete", "insert")
+        covering both sequences
+    """
+    # Compare small integers instead of the items themselves
+    ids: Dict[Hashable, int] = {}
+    a_ids = [ids.setdefault(item, len(ids)) for item in a]
+    b_ids = [ids.setdefault(item, len(ids)) for item in b]
+
+    matches: List[Tuple[int, int, int]] = []
+    stack = [(0, len(a_ids), 0, len(b_ids))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        # Strip the common prefix and suffix of the block
+        start = 0
+        while alo + start < ahi and blo + start < bhi and a_ids[alo + start] == b_ids[blo + start]:
+            start += 1
+        if start:
+            matches.append((alo, blo, start))
+            alo += start
+            blo += start
+        end = 0
+        while alo < ahi - end and blo < bhi - end and a_ids[ahi - 1 - end] == b_ids[bhi - 1 - end]:
+            end += 1
+        if end:
+            matches.append((ahi - end, bhi - end, end))
+            ahi -= end
+            bhi -= end
+        if alo == ahi or blo == bhi:
+            continue
+
+        snake = _middle_snake(a_ids, alo, ahi, b_ids, blo, bhi, max_edits)
+        if snake is None:
+            continue
+        x, y, u, v = snake
+        if u > x:
+            matches.append((alo + x, blo + y, u - x))
+        stack.append((alo + u, ahi, blo + v, bhi))
+        stack.append((alo, alo + x, blo, blo + y))
+
+    return _opcodes(sorted(matches), len(a_ids), len(b_ids))
+
+def _opcodes(matches: List[Tuple[int, int, int]], n: int, m: int) -> List[Opcode]:
+    """Turn sorted matching blocks into opcodes."""
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for start_a, start_b, size in matches + [(n, m, 0)]:
+        if i < start_a and j < start_b:
+            opcodes.append(("replace", i, start_a, j, start_b))
+        elif i < start_a:
+            opcodes.append(("delete", i, start_a, j, start_b))
+        elif j < start_b:
+            opcodes.append(("insert", i, start_a, j, start_b))
+        if size:
+            # Merge adjacent matching blocks
+            if opcodes and opcodes[-1][0] == "equal" and opcodes[-1][2] == start_a and opcodes[-1][4] == start_b:
+                _, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(("equal", i1, start_a + size, j1, start_b + size))
+            else:
+                opcodes.append(("equal", start_a, start_a + size, start_b, start_b + size))
+        i, j = start_a + size, start_b + size
+    return opcodes
+
+def diff_words(before: str, after: str) -> List[Dict[str, str]]:
+    """
+    Diff two texts word by word, keeping whitespace.
+
+    Returns:
+        Segments with an op ("equal", "delete" or "insert") and their text;
+        equal and deleted segments rebuild before, equal and inserted ones after
+    """
+    a = _WORD_TOKENS.findall(before)
+    b = _WORD_TOKENS.findall(after)
+    if len(a) + len(b) > WORD_DIFF_MAX_TOKENS:
+        opcodes = [("replace", 0, len(a), 0, len(b))]
+    else:
+        opcodes = diff_sequences(a, b)
+    segments = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            segments.append({"op": "equal", "text": "".join(a[i1:i2])})
+            continue
+        if i2 > i1:
+            segments.append({"op": "delete", "text": "".join(a[i1:i2])})
+        if j2 > j1:
+            segments.append({"op": "insert", "text": "".join(b[j1:j2])})
+    return segments
+
+def diff_text(before: str, after: str) -> Dict[str, Any]:
+    """
+    Diff two texts by line, with a word diff of each replaced block.
+
+    Args:
+        before: Old text
+        after: New text
+
+    Returns:
+        Line counts and hunks. Unchanged runs are reported by line range
+        only; deleted and inserted hunks carry their lines, and replaced
+        hunks the word-level segments of the replaced lines.
+    """
+    a = before.split("\n")
+    b = after.split("\n")
+    hunks: List[Dict[str, Any]] = []
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in diff_sequences(a, b):
+        hunk: Dict[str, Any] = {"op": tag, "before": [i1, i2], "after": [j1, j2]}
+        if tag == "delete":
+            hunk["lines"] = a[i1:i2]
+        elif tag == "insert":
+            hunk["lines"] = b[j1:j2]
+        elif tag == "replace":
+            hunk["words"] = diff_words("\n".join(a[i1:i2]), "\n".join(b[j1:j2]))
+        removed += i2 - i1 if tag != "equal" else 0
+        added += j2 - j1 if tag != "equal" else 0
+        hunks.append(hunk)
+    return {"lines_removed": removed, "lines_added": added, "hunks": hunks}
@@ -0,0 +1,235 @@
+"""
+Analysis execution module.
+
+This module decides where the CPU-bound part of an analysis (rule-based
+scoring and suggestion generation) runs. Small prompts are analyzed inline
+on the event loop, where offloading would cost more than it saves. Larger
+prompts go to a bounded thread pool or, to sidestep the GIL, a process pool,
+so one huge prompt cannot stall every other request on the worker.
+
+Offloaded work is bounded: once max_pending analyses are queued or running,
+further ones are rejected with AnalysisPoolSaturated instead of piling up.
+The time each analysis waited for a pool worker is recorded.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from app.core.analyzer import analyze_prompt_rules, get_rules_version
+from app.core.optimizer import generate_optimization_suggestions
+from app.core.rules import profiled_request
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = ("inline", "thread", "process")
+
+# Number of recent queue waits kept for percentiles
+QUEUE_WAIT_SAMPLES = 1024
+
+class AnalysisPoolSaturated(Exception):
+    """Raised when the analysis pool already has max_pending analyses."""
+
+def analyze_rules_with_suggestions(
+    prompt_text: str,
+    target_model: str,
+    dimensions: Optional[List[str]] = None,
+    with_suggestions: bool = True
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], str]:
+    """
+    Run the rule-based analysis and generate suggestions for a prompt.
+
+    A module-level function so it can run in a process pool.
+
+    Args:
+        prompt_text: The prompt text to analyze
+        target_model: The target model for the prompt
+        dimensions: Only analyze and suggest for these dimensions (default: all)
+        with_suggestions: Whether to generate suggestions at all
+
+    Returns:
+        The rule analysis, the suggestions (empty without with_suggestions)
+        and the rules version used
+    """
+    rules_version = get_rules_version()
+    rule_analysis = analyze_prompt_rules(prompt_text, target_model, dimensions)
+    suggestions = []
+    if with_suggestions:
+        suggestions = generate_optimization_suggestions(prompt_text, rule_analysis, target_model, dimensions)
+    return rule_analysis, suggestions, rules_version
+
+def _timed_call(function: Callable, *args) -> Tuple[float, Any]:
+    """Call a function in a pool worker, returning when it started and its result."""
+    return time.monotonic(), function(*args)
+
+class AnalysisExecutor:
+    """
+    Runs analyses inline, in a thread pool or in a process pool.
+
+    The pool is created on the first offloaded analysis.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        inline_threshold: int = 8192,
+        max_workers: Optional[int] = None,
+        max_pending: int = 32
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            mode: "inline", "thread" or "process"
+            inline_threshold: Prompts shorter than this many characters are
+                always analyzed inline
+            max_workers: Pool size (defaults to the CPU count, at most 4)
+            max_pending: Maximum number of offloaded analyses queued or running
+        """
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.mode = mode
+        self.inline_threshold = inline_threshold
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.inline = 0
+        self.offloaded = 0
+        self.rejected = 0
+        self._waits: deque = deque(maxlen=QUEUE_WAIT_SAMPLES)
+        self._max_wait = 0.0
+        self._lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+
+    @classmethod
+    def from_env(cls) -> "AnalysisExecutor":
+        """Create an executor from environment variables."""
+        max_workers = int(os.getenv("ANALYSIS_WORKERS", 0))
+        return cls(
+            mode=os.getenv("ANALYSIS_EXECUTOR", "thread").lower(),
+            inline_threshold=int(os.getenv("ANALYSIS_INLINE_THRESHOLD", 8192)),
+            max_workers=max_workers or None,
+            max_pending=int(os.getenv("ANALYSIS_MAX_PENDING", 32))
+        )
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                # Spawned rather than forked: the server process has threads
+                # and an event loop that must not be copied into workers
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="analysis")
+        return self._pool
+
+    def _release(self, _future):
+        # Runs when the work finishes, even if the awaiting request was cancelled
+        with self._lock:
+            self.pending -= 1
+
+    async def run(
+        self,
+        prompt_text: str,
+        target_model: str,
+        dimensions: Optional[List[str]] = None,
+        with_suggestions: bool = True
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]], str, float]:
+        """
+        Analyze a prompt with rules and generate its suggestions.
+
+        Args:
+            prompt_text: The prompt text to analyze
+            target_model: The target model for the prompt
+            dimensions: Only analyze and suggest for these dimensions (default: all)
+            with_suggestions: Whether to generate suggestions at all
+
+        Returns:
+            The rule analysis, the suggestions, the rules version and the
+            milliseconds spent waiting for a pool worker (0 when inline)
+
+        Raises:
+            AnalysisPoolSaturated: If max_pending analyses are already offloaded
+        """
+        result, wait = await self.call(
+            len(prompt_text),
+            analyze_rules_with_suggestions, prompt_text, target_model, dimensions, with_suggestions
+        )
+        return (*result, wait)
+
+    async def call(self, size: int, function: Callable, *args) -> Tuple[Any, float]:
+        """
+        Run a CPU-bound function inline or in the pool, depending on the
+        size of its input.
+
+        Args:
+            size: Characters of text the function processes
+            function: Module-level function (it may run in another process)
+            *args: Arguments of the function
+
+        Returns:
+            The function's result and the milliseconds spent waiting for a
+            pool worker (0 when inline)
+
+        Raises:
+            AnalysisPoolSaturated: If max_pending analyses are already offloaded
+        """
+        # Profiled requests are analyzed inline, where the profiler sees them
+        if self.mode == "inline" or size < self.inline_threshold or profiled_request.get():
+            self.inline += 1
+            return function(*args), 0.0
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise AnalysisPoolSaturated(f"{self.pending} analyses already pending")
+            self.pending += 1
+        self.offloaded += 1
+
+        submitted = time.monotonic()
+        try:
+            future = self._get_pool().submit(_timed_call, function, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        started, result = await asyncio.wrap_future(future)
+
+        wait = max(0.0, started - submitted) * 1000
+        self._waits.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+        return result, wait
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuration, counters and queue wait statistics (milliseconds)."""
+        waits = sorted(self._waits)
+        return {
+            "mode": self.mode,
+            "inline_threshold": self.inline_threshold,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "rejected": self.rejected,
+            "queue_wait_ms": {
+                "mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "max": round(self._max_wait, 3)
+            }
+        }
+
+    def shutdown(self):
+        """Stop the pool; running analyses are not waited for."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,379 @@
+"""
+Analysis history store module.
+
+This module persists analysis results to an embedded SQLite database so
+trends can be queried without re-running analyses. Writes are queued on the
+request path and batched into SQLite by a background writer, so recording an
+analysis never blocks the event loop on disk I/O.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from app.core.compact import CompactAnalysis
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    normalized_text TEXT NOT NULL,
+    target_model TEXT NOT NULL,
+    overall_score REAL NOT NULL,
+    scores TEXT NOT NULL,
+    rule_ms REAL,
+    llm_ms REAL,
+    total_ms REAL,
+    llm_used INTEGER NOT NULL DEFAULT 0,
+    result BLOB,
+    llm_analysis TEXT,
+    rules_version TEXT,
+    key_scope TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_prompt_hash ON analyses (prompt_hash);
+CREATE INDEX IF NOT EXISTS idx_analyses_model_time ON analyses (target_model, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at);
+"""
+
+# Columns returned by queries (the compact result blob is opt-in)
+QUERY_COLUMNS = [
+    "id", "created_at", "prompt_hash", "normalized_text", "target_model",
+    "overall_score", "scores", "rule_ms", "llm_ms", "total_ms", "llm_used", "rules_version"
+]
+
+# Columns added after the first release, applied to existing databases
+MIGRATIONS = [
+    ("llm_analysis", "ALTER TABLE analyses ADD COLUMN llm_analysis TEXT"),
+    ("rules_version", "ALTER TABLE analyses ADD COLUMN rules_version TEXT"),
+    ("key_scope", "ALTER TABLE analyses ADD COLUMN key_scope TEXT")
+]
+
+MAX_PAGE_SIZE = 500
+
+def normalize_prompt(prompt_text: str) -> str:
+    """Normalize a prompt for hashing by collapsing all whitespace runs."""
+    return " ".join(prompt_text.split())
+
+def prompt_hash(prompt_text: str) -> str:
+    """Return the SHA-256 hex digest of the normalized prompt text."""
+    return hashlib.sha256(normalize_prompt(prompt_text).encode("utf-8")).hexdigest()
+
+class HistoryStore:
+    """
+    SQLite-backed store of analysis results.
+
+    Records are put on an asyncio queue by record() and written in batches
+    by a background task that runs the SQLite work on a dedicated thread.
+    Queries open their own read connection, which WAL mode allows to run
+    alongside the writer.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000
+    ):
+        """
+        Initialize the history store.
+
+        Args:
+            db_path: Path to the SQLite database file
+            batch_size: Maximum number of records written per transaction
+            flush_interval: Maximum seconds a record waits before being written
+            max_queue_size: Maximum number of pending records; further records
+                are dropped rather than slowing down requests
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    @classmethod
+    def from_env(cls) -> Optional["HistoryStore"]:
+        """Create a history store from environment variables, or None if disabled."""
+        if os.getenv("HISTORY_ENABLED", "False").lower() not in ("true", "1", "yes"):
+            return None
+        return cls(
+            db_path=os.getenv("HISTORY_DB_PATH", "history.db"),
+            batch_size=int(os.getenv("HISTORY_BATCH_SIZE", 100)),
+            flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", 1.0)),
+            max_queue_size=int(os.getenv("HISTORY_MAX_QUEUE_SIZE", 10000))
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection and make sure the schema exists."""
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._schema_lock:
+            if not self._schema_ready:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                columns = {row[1] for row in connection.execute("PRAGMA table_info(analyses)")}
+                for column, statement in MIGRATIONS:
+                    if column not in columns:
+                        connection.execute(statement)
+                connection.commit()
+                self._schema_ready = True
+        return connection
+
+    def record(
+        self,
+        prompt_text: str,
+        target_model: str,
+        response: Dict[str, Any],
+        rule_ms: Optional[float] = None,
+        llm_ms: Optional[float] = None,
+        total_ms: Optional[float] = None,
+        llm_used: bool = False,
+        llm_analysis: Optional[Dict[str, Any]] = None,
+        rules_version: Optional[str] = None,
+        key_scope: Optional[str] = None
+    ) -> bool:
+        """
+        Queue an analysis for writing without blocking.
+
+        Must be called from a running event loop. Hashing, compaction and
+        serialization happen on the writer thread, not here.
+
+        Args:
+            prompt_text: The analyzed prompt text
+            target_model: The target model for the prompt
+            response: The API-shaped analysis response
+            rule_ms: Time spent in rule-based analysis
+            llm_ms: Time spent in LLM analysis, if any
+            total_ms: Total time spent handling the request
+            llm_used: Whether LLM results were merged into the response
+            llm_analysis: The raw LLM analysis, kept for reuse by near-duplicates
+            rules_version: Version of the rule pack that scored the prompt
+            key_scope: Scope of the API key llm_analysis was made with, so
+                near-duplicates reuse it only for the same key
+
+        Returns:
+            True if the record was queued, False if it was dropped
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-writer")
+            self._writer_task = asyncio.get_running_loop().create_task(self._writer())
+
+        try:
+            self._queue.put_nowait((
+                time.time(), prompt_text, target_model, response,
+                rule_ms, llm_ms, total_ms, llm_used, llm_analysis, rules_version, key_scope
+            ))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"History queue full, dropped record ({self.dropped} dropped so far)")
+            return False
+
+    async def _writer(self):
+        """Collect queued records into batches and write them on the writer thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            # Keep filling the batch until it is full or the flush interval passes
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await loop.run_in_executor(self._executor, self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} history records: {str(e)}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[tuple]):
+        """Serialize and insert a batch of records in one transaction."""
+        if self._connection is None:
+            self._connection = self._connect()
+
+        rows = []
+        for (created_at, prompt_text, target_model, response,
+             rule_ms, llm_ms, total_ms, llm_used, llm_analysis, rules_version, key_scope) in batch:
+            normalized = normalize_prompt(prompt_text)
+            rows.append((
+                created_at,
+                hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+                normalized,
+                target_model or "general",
+                response["overall_score"],
+                json.dumps(response["scores"]),
+                rule_ms,
+                llm_ms,
+                total_ms,
+                1 if llm_used else 0,
+                CompactAnalysis.from_response(response, prompt_text).to_bytes(),
+                json.dumps(llm_analysis) if llm_analysis is not None else None,
+                rules_version,
+                key_scope
+            ))
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO analyses (created_at, prompt_hash, normalized_text, target_model, "
+                "overall_score, scores, rule_ms, llm_ms, total_ms, llm_used, result, llm_analysis, rules_version, "
+                "key_scope) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    async def flush(self):
+        """Wait until every queued record has been written."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """Flush pending records and stop the writer."""
+        if self._queue is None:
+            return
+        await self.flush()
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        if self._connection is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+        self._queue = None
+        self._writer_task = None
+        self._executor = None
+
+    def query(
+        self,
+        prompt_hash: Optional[str] = None,
+        target_model: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+        cursor: Optional[int] = None,
+        include_result: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Query stored analyses, newest first.
+
+        Pagination is keyset-based: pass the returned next_cursor back as
+        cursor to get the following page.
+
+        Args:
+            prompt_hash: Only return analyses of this prompt hash
+            target_model: Only return analyses for this target model
+            since: Only return analyses created at or after this Unix time
+            until: Only return analyses created before this Unix time
+            limit: Maximum number of items to return (capped at MAX_PAGE_SIZE)
+            cursor: Only return analyses older than this cursor
+            include_result: Include the full API-shaped response of each item
+
+        Returns:
+            Dictionary with the page of items and the cursor for the next page
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        conditions = []
+        params: List[Any] = []
+        for clause, value in (
+            ("prompt_hash = ?", prompt_hash),
+            ("target_model = ?", target_model),
+            ("created_at >= ?", since),
+            ("created_at < ?", until),
+            ("id < ?", cursor)
+        ):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+
+        columns = QUERY_COLUMNS + (["result"] if include_result else [])
+        sql = f"SELECT {', '.join(columns)} FROM analyses"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+        items = []
+        for row in rows[:limit]:
+            item = dict(zip(columns, row))
+            item["scores"] = json.loads(item["scores"])
+            item["llm_used"] = bool(item["llm_used"])
+            if include_result:
+                result = item.pop("result")
+                item["result"] = CompactAnalysis.from_bytes(result).to_response() if result else None
+            items.append(item)
+
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def iter_llm_analyses(self, since: Optional[float] = None, batch_size: int = 500):
+        """
+        Yield stored LLM analyses, oldest first, for rebuilding caches.
+
+        Args:
+            since: Only yield analyses created at or after this Unix time
+            batch_size: Number of rows read per query
+
+        Yields:
+            Dictionaries with id, created_at, normalized_text, target_model,
+            key_scope and the decoded llm_analysis
+        """
+        last_id = 0
+        connection = self._connect()
+        try:
+            while True:
+                rows = connection.execute(
+                    "SELECT id, created_at, normalized_text, target_model, key_scope, llm_analysis FROM analyses "
+                    "WHERE id > ? AND created_at >= ? AND llm_used = 1 AND llm_analysis IS NOT NULL "
+                    "ORDER BY id LIMIT ?",
+                    (last_id, since or 0, batch_size)
+                ).fetchall()
+                if not rows:
+                    return
+                for row_id, created_at, normalized_text, target_model, key_scope, llm_analysis in rows:
+                    yield {
+                        "id": row_id,
+                        "created_at": created_at,
+                        "normalized_text": normalized_text,
+                        "target_model": target_model,
+                        "key_scope": key_scope,
+                        "llm_analysis": json.loads(llm_analysis)
+                    }
+                last_id = rows[-1][0]
+        finally:
+            connection.close()
+
+    async def aquery(self, **kwargs) -> Dict[str, Any]:
+        """Run query() in a worker thread so the event loop is not blocked."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.query(**kwargs))
@@ -6,16 +6,35 @@ for deeper, more nuanced analysis.
 """
 
 import os
+import re
 import json
+import time
 import asyncio
 import aiohttp
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, List, Any, Optional
+
+from app.core.packing import (
+    PACKED_INSTRUCTIONS, PACKED_MAX_ITEMS, build_packed_prompt, decode_json_reply, estimate_tokens,
+    parse_packed_content, plan_packs, strip_outer_fence
+)
+from app.core.providers import Provider, ProviderBusyError, ProviderRegistry
+from app.core.logs import Sensitive, log_event, log_exception
+from app.core.tracing import record_span, span
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Cleanups of malformed JSON in LLM responses. Responses are untrusted, so
+# each pattern must match in time linear in the response length: a match can
+# only start at its leading literal, and every repeated class stops at a
+# character the next element needs (see benchmarks/redos.py)
+_UNQUOTED_KEY = re.compile(r'([{,])\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:')
+_SINGLE_QUOTED_VALUE = re.compile(r":\s*'([^']*)'([,}])")
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_DIMENSION_SCORES = re.compile(r'"dimension_scores"\s*:\s*{([^}]+)}')
+_SCORE_PAIR = re.compile(r'"([^"]+)"\s*:\s*(\d+)')
+
 # Default system prompt for LLM analysis
 SYSTEM_PROMPT = """
 You are a prompt engineering expert tasked with analyzing and improving prompts for AI models.
@@ -26,8 +45,108 @@ Your analysis should be detailed, constructive, and focused on helping the user
 IMPORTANT: Do not include your own model name or identifier in your response. Do not modify or repeat the target model information provided in the prompt. Analyze the prompt for the specified target model without adding your own model name to the response.
 """
 
+# Static part of every analysis request. It is sent before anything that
+# varies (target model, prompt), together with SYSTEM_PROMPT, so that
+# provider prompt caches can reuse it across requests; keep it byte-stable.
+ANALYSIS_INSTRUCTIONS = """
+Please analyze the prompt given at the end of this message and provide detailed feedback on how to improve it.
+
+IMPORTANT: Do not modify or repeat the target model information given with the prompt. Do not include your own model name in your analysis.
+
+Evaluate the prompt on the following dimensions:
+1. Clarity & Specificity
+2. Context Provided
+3. Task Definition
+4. Structure & Organization
+5. Examples (if applicable)
+6. Conciseness
+7. Output Format Specification
+8. Role Assignment (if applicable)
+9. Reasoning Guidance
+10. Constraints & Limitations
+
+For each dimension, provide:
+- A score from 1-5
+- Specific strengths
+- Suggestions for improvement
+
+Then provide 3-5 specific, actionable suggestions to improve the overall effectiveness of the prompt.
+
+Format your response as a JSON object with the following structure:
+{
+    "dimension_scores": {
+        "clarity": 4,
+        "context": 3,
+        ...
+    },
+    "strengths": ["strength1", "strength2", ...],
+    "weaknesses": ["weakness1", "weakness2", ...],
+    "suggestions": [
+        {
+            "title": "Suggestion title",
+            "description": "Detailed description",
+            "example": "Example implementation",
+            "rationale": "Why this would help"
+        },
+        ...
+    ],
+    "improved_prompt": "A revised version of the prompt"
+}
+"""
+
+# Variable part of an analysis request; {0} is the target model, {1} the prompt
+ANALYSIS_REQUEST = """
+Target AI model: {0}
+
+PROMPT TO ANALYZE:
+```
+{1}
+```
+"""
+
+# Providers the analysis can be routed to, with their concurrency limits
+provider_registry = ProviderRegistry.from_env()
+
 # Default OpenRouter model
-DEFAULT_OPENROUTER_MODEL = "meta-llama/llama-3.3-8b-instruct:free"
+DEFAULT_OPENROUTER_MODEL = provider_registry.get("openrouter").default_model
+
+def resolve_api_key(target_model: str, api_key: Optional[str] = None) -> Optional[str]:
+    """
+    Return the API key to use for a target model.
+    
+    Args:
+        target_model: The target model for the prompt
+        api_key: API key provided with the request, if any
+        
+    Returns:
+        The provided key, else one from the environment, else None
+    """
+    if api_key:
+        return api_key
+    
+    # Use environment variable if no API key provided
+    # Try to get API key based on target model
+    if target_model == "openrouter" or target_model == "general":
+        return os.environ.get("OPENROUTER_API_KEY")
+    elif target_model.startswith("gpt"):
+        return os.environ.get("OPENAI_API_KEY")
+    elif target_model == "claude":
+        return os.environ.get("ANTHROPIC_API_KEY")
+    # Default to any available API key
+    return (os.environ.get("OPENAI_API_KEY") or 
+            os.environ.get("ANTHROPIC_API_KEY") or 
+            os.environ.get("OPENROUTER_API_KEY"))
+
+def get_display_target_model(target_model: str) -> str:
+    """Clean up the target model name named in analysis prompts to avoid model confusion."""
+    # Remove any "openrouter:" prefix for the analysis prompt
+    display_target_model = target_model
+    if ":" in target_model:
+        display_target_model = target_model.split(":", 1)[1]
+    # For free models, simplify further to avoid model confusion
+    if "/" in display_target_model and "free" in display_target_model:
+        display_target_model = display_target_model.split("/")[0]
+    return display_target_model
 
 async def analyze_prompt_with_llm(
     prompt_text: str,
@@ -45,263 +164,251 @@ async def analyze_prompt_with_llm(
     Returns:
         Dictionary containing analysis results
     """
-    logger.info(f"Starting LLM analysis for target model: {target_model}")
-    
-    # Use environment variable if no API key provided
-    if not api_key:
-        logger.info("No API key provided in request, checking environment variables")
-        # Try to get API key based on target model
-        if target_model == "openrouter" or target_model == "general":
-            api_key = os.environ.get("OPENROUTER_API_KEY")
-        elif target_model.startswith("gpt"):
-            api_key = os.environ.get("OPENAI_API_KEY")
-        elif target_model == "claude":
-            api_key = os.environ.get("ANTHROPIC_API_KEY")
-        else:
-            # Default to any available API key
-            api_key = (os.environ.get("OPENAI_API_KEY") or 
-                      os.environ.get("ANTHROPIC_API_KEY") or 
-                      os.environ.get("OPENROUTER_API_KEY"))
-    else:
-        logger.info("API key provided in request")
+    api_key = resolve_api_key(target_model, api_key)
     
     # If still no API key, use a free model or return an error
     if not api_key:
-        logger.warning("No API key available, falling back to free model")
+        log_event(logger, logging.WARNING, "llm.no_api_key", target_model=target_model)
         return await analyze_with_free_model(prompt_text, target_model)
     
-    # Clean up target model name to avoid model confusion
-    # Remove any "openrouter:" prefix for the analysis prompt
-    display_target_model = target_model
-    if ":" in target_model:
-        display_target_model = target_model.split(":", 1)[1]
-    # For free models, simplify further to avoid model confusion
-    if "/" in display_target_model and "free" in display_target_model:
-        display_target_model = display_target_model.split("/")[0]
+    display_target_model = get_display_target_model(target_model)
     
-    logger.info(f"Using display target model: {display_target_model}")
+    # Static instructions first, so providers can cache them as a shared prefix
+    analysis_prompt = ANALYSIS_REQUEST.format(display_target_model, prompt_text)
     
-    # Prepare the analysis prompt
-    analysis_prompt = """
-    Please analyze the following prompt and provide detailed feedback on how to improve it.
+    try:
+        # Route the target model to a provider and model
+        provider, model = provider_registry.resolve(target_model)
+        return await call_provider(provider, analysis_prompt, api_key, model, prefix=ANALYSIS_INSTRUCTIONS)
     
-    PROMPT TO ANALYZE:
-    ```
-    {0}
-    ```
+    except ProviderBusyError:
+        log_event(logger, logging.WARNING, "llm.provider_busy", provider=provider.name)
+        return {
+            "error": f"Too many pending requests to {provider.name}. Please try again later."
+        }
+    except Exception as e:
+        log_exception(logger, "llm.analysis_failed", target_model=target_model)
+        return {
+            "error": f"Failed to analyze prompt with LLM: {str(e)}"
+        }
+
+async def analyze_prompts_with_llm(
+    prompt_texts: List[str],
+    target_model: str = "general",
+    api_key: Optional[str] = None,
+    max_items: int = PACKED_MAX_ITEMS,
+    retries: int = 1
+) -> List[Dict[str, Any]]:
+    """
+    Analyze many prompts, packing several into each LLM call.
     
-    Target AI model: {1}
+    Prompts are grouped into packs sized to the provider's context window
+    and output budget, and packs run concurrently within the provider's
+    limits. Prompts whose analysis is missing from a packed response are
+    packed again, up to retries more times; a pack of one prompt is sent as
+    a normal single analysis.
     
-    IMPORTANT: Do not modify or repeat the target model information above. Do not include your own model name in your analysis.
+    Args:
+        prompt_texts: The prompt texts to analyze
+        target_model: The target model for the prompts
+        api_key: Optional API key for the LLM service
+        max_items: Maximum number of prompts per call
+        retries: Number of times failed prompts are analyzed again
+        
+    Returns:
+        One analysis result per prompt, in input order
+    """
+    api_key = resolve_api_key(target_model, api_key)
+    if not api_key:
+        log_event(logger, logging.WARNING, "llm.no_api_key", target_model=target_model)
+        return [await analyze_with_free_model(text, target_model) for text in prompt_texts]
     
-    Evaluate the prompt on the following dimensions:
-    1. Clarity & Specificity
-    2. Context Provided
-    3. Task Definition
-    4. Structure & Organization
-    5. Examples (if applicable)
-    6. Conciseness
-    7. Output Format Specification
-    8. Role Assignment (if applicable)
-    9. Reasoning Guidance
-    10. Constraints & Limitations
+    provider, model = provider_registry.resolve(target_model)
+    display_target_model = get_display_target_model(target_model)
+    output_budget = provider.max_output_tokens
+    input_budget = (provider.context_window - output_budget
+                    - estimate_tokens(SYSTEM_PROMPT) - estimate_tokens(PACKED_INSTRUCTIONS))
     
-    For each dimension, provide:
-    - A score from 1-5
-    - Specific strengths
-    - Suggestions for improvement
+    results: List[Optional[Dict[str, Any]]] = [None] * len(prompt_texts)
+    pending = list(range(len(prompt_texts)))
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            log_event(logger, logging.INFO, "llm.packed_retry", prompts=len(pending))
+        packs = [
+            [pending[position] for position in pack]
+            for pack in plan_packs([prompt_texts[index] for index in pending], input_budget, output_budget, max_items)
+        ]
+        log_event(logger, logging.INFO, "llm.packed_analysis", prompts=len(pending), calls=len(packs), provider=provider.name)
+        outcomes = await asyncio.gather(*(
+            analyze_pack(provider, model, api_key, [prompt_texts[index] for index in pack],
+                         target_model, display_target_model)
+            for pack in packs
+        ))
+        for pack, analyses in zip(packs, outcomes):
+            for index, analysis in zip(pack, analyses):
+                results[index] = analysis
+        pending = [index for index in pending if "error" in results[index]]
     
-    Then provide 3-5 specific, actionable suggestions to improve the overall effectiveness of the prompt.
+    return results
+
+async def analyze_pack(
+    provider: Provider,
+    model: str,
+    api_key: str,
+    prompt_texts: List[str],
+    target_model: str,
+    display_target_model: str
+) -> List[Dict[str, Any]]:
+    """
+    Analyze a pack of prompts in one LLM call.
     
-    Format your response as a JSON object with the following structure:
-    {{
-        "dimension_scores": {{
-            "clarity": 4,
-            "context": 3,
-            ...
-        }},
-        "strengths": ["strength1", "strength2", ...],
-        "weaknesses": ["weakness1", "weakness2", ...],
-        "suggestions": [
-            {{
-                "title": "Suggestion title",
-                "description": "Detailed description",
-                "example": "Example implementation",
-                "rationale": "Why this would help"
-            }},
-            ...
-        ],
-        "improved_prompt": "A revised version of the prompt"
-    }}
-    """.format(prompt_text, display_target_model)
+    Returns:
+        One analysis result per prompt; prompts missing from the response
+        get an error result
+    """
+    if len(prompt_texts) == 1:
+        return [await analyze_prompt_with_llm(prompt_texts[0], target_model, api_key)]
     
+    packed_prompt = build_packed_prompt(prompt_texts, display_target_model)
     try:
-        # Determine which API to use based on target_model
-        if target_model.startswith("openrouter"):
-            logger.info("Making API call to OpenRouter")
-            # Extract the specific model if provided in the format "openrouter:model-name"
-            if ":" in target_model:
-                model = target_model.split(":", 1)[1]
-                logger.info(f"Using specified OpenRouter model: {model}")
-            else:
-                model = DEFAULT_OPENROUTER_MODEL
-                logger.info(f"Using default OpenRouter model: {model}")
-            return await call_openrouter_api(analysis_prompt, api_key, model)
-        elif target_model.startswith("gpt"):
-            logger.info(f"Making API call to OpenAI with model {target_model}")
-            return await call_openai_api(analysis_prompt, api_key, target_model)
-        elif target_model == "claude":
-            logger.info("Making API call to Anthropic")
-            return await call_anthropic_api(analysis_prompt, api_key)
-        else:
-            # Default to OpenRouter for "general" or unknown models
-            logger.info(f"Using default OpenRouter model ({DEFAULT_OPENROUTER_MODEL}) for general analysis")
-            return await call_openrouter_api(analysis_prompt, api_key, DEFAULT_OPENROUTER_MODEL)
-            
+        result = await call_provider(
+            provider, packed_prompt, api_key, model,
+            max_tokens=provider.max_output_tokens,
+            prefix=PACKED_INSTRUCTIONS,
+            handler=process_packed_response
+        )
+    except ProviderBusyError:
+        log_event(logger, logging.WARNING, "llm.provider_busy", provider=provider.name, prompts=len(prompt_texts))
+        result = {"error": f"Too many pending requests to {provider.name}. Please try again later."}
     except Exception as e:
-        logger.error(f"Error during LLM analysis: {str(e)}", exc_info=True)
-        return {
-            "error": f"Failed to analyze prompt with LLM: {str(e)}"
-        }
+        log_exception(logger, "llm.packed_analysis_failed", provider=provider.name, prompts=len(prompt_texts))
+        result = {"error": f"Failed to analyze prompts with LLM: {str(e)}"}
+    
+    if "error" in result:
+        return [dict(result) for _ in prompt_texts]
+    analyses = parse_packed_content(result["content"], len(prompt_texts))
+    missing = {"error": "Analysis missing from packed LLM response"}
+    return [analyses.get(position, dict(missing)) for position in range(len(prompt_texts))]
+
+async def call_provider(
+    provider: Provider,
+    prompt: str,
+    api_key: str,
+    model: str,
+    max_tokens: Optional[int] = None,
+    prefix: Optional[str] = None,
+    handler=None
+) -> Dict[str, Any]:
+    """
+    Call a provider, waiting for a slot in its scheduler first.
+    
+    Args:
+        provider: The provider to call
+        prompt: The analysis prompt
+        api_key: API key for the provider
+        model: The model to use
+        max_tokens: Completion token limit (defaults to the model's)
+        prefix: Static instructions sent before the prompt, cacheable by the provider
+        handler: Coroutine reading the response (defaults to process_llm_response)
+        
+    Returns:
+        Dictionary containing analysis results
+        
+    Raises:
+        ProviderBusyError: If the provider's queue is full
+    """
+    handler = handler or process_llm_response
+    with span("provider_queue", provider=provider.name):
+        await provider.scheduler.acquire()
+    try:
+        log_event(logger, logging.DEBUG, "llm.request", provider=provider.name, model=model)
+        async with aiohttp.ClientSession(trace_configs=[HTTP_TRACE_CONFIG]) as session:
+            async with session.post(
+                provider.url,
+                headers=provider.build_headers(api_key),
+                json=provider.build_payload(SYSTEM_PROMPT, prompt, model, max_tokens, prefix)
+            ) as response:
+                log_event(logger, logging.INFO, "llm.response", provider=provider.name, model=model, status=response.status)
+                with span("llm_parse", provider=provider.name):
+                    return await handler(response, provider)
+    finally:
+        provider.scheduler.release()
+
+async def _on_connection_create_start(session, context, params):
+    context.connect_start = time.perf_counter()
+
+async def _on_connection_create_end(session, context, params):
+    record_span("http_connect", context.connect_start)
+
+async def _on_request_headers_sent(session, context, params):
+    context.sent = time.perf_counter()
+
+async def _on_request_end(session, context, params):
+    # From the request being sent to the response headers: the provider's
+    # time to first byte, generation included for non-streaming calls
+    if hasattr(context, "sent"):
+        record_span("provider_response", context.sent, status=params.response.status)
+
+def _http_trace_config() -> aiohttp.TraceConfig:
+    """Record connection setup and the provider's response time as trace spans."""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_request_headers_sent.append(_on_request_headers_sent)
+    trace_config.on_request_end.append(_on_request_end)
+    return trace_config
+
+HTTP_TRACE_CONFIG = _http_trace_config()
 
 async def call_openrouter_api(prompt: str, api_key: str, model: str = DEFAULT_OPENROUTER_MODEL) -> Dict[str, Any]:
     """Call OpenRouter API"""
-    logger.info(f"Sending request to OpenRouter API using model: {model}")
-    
-    # Set higher token limit for free models
-    max_tokens_value = 4000 if "free" in model else 1000
-    logger.info(f"Using max_tokens: {max_tokens_value} for model: {model}")
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": model,  # Use the provided model parameter
-                "messages": [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.3,
-                "max_tokens": max_tokens_value
-            }
-        ) as response:
-            logger.info(f"Received response from OpenRouter API with status: {response.status}")
-            return await process_llm_response(response)
+    return await call_provider(provider_registry.get("openrouter"), prompt, api_key, model)
 
 async def call_openai_api(prompt: str, api_key: str, model: str = "gpt-3.5-turbo") -> Dict[str, Any]:
     """Call OpenAI API"""
-    logger.info(f"Sending request to OpenAI API with model: {model}")
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.3,
-                "max_tokens": 1000
-            }
-        ) as response:
-            logger.info(f"Received response from OpenAI API with status: {response.status}")
-            return await process_llm_response(response)
+    return await call_provider(provider_registry.get("openai"), prompt, api_key, model)
 
-async def call_anthropic_api(prompt: str, api_key: str) -> Dict[str, Any]:
+async def call_anthropic_api(prompt: str, api_key: str, model: Optional[str] = None) -> Dict[str, Any]:
     """Call Anthropic API"""
-    logger.info("Sending request to Anthropic API")
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "claude-2",
-                "system": SYSTEM_PROMPT,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.3,
-                "max_tokens": 1000
-            }
-        ) as response:
-            logger.info(f"Received response from Anthropic API with status: {response.status}")
-            return await process_llm_response(response)
+    provider = provider_registry.get("anthropic")
+    return await call_provider(provider, prompt, api_key, model or provider.default_model)
 
-async def process_llm_response(response) -> Dict[str, Any]:
-    """Process response from LLM API"""
+async def process_llm_response(response, provider: Optional[Provider] = None) -> Dict[str, Any]:
+    """Process response from LLM API, read with the provider's response adapter if given"""
     if response.status == 200:
         result = await response.json()
-        logger.info("Successfully received JSON response from LLM API")
+        if provider is not None and isinstance(result, dict):
+            provider.record_usage(result)
         
         try:
             # Extract content based on API response structure
-            if "choices" in result and len(result["choices"]) > 0:
-                # OpenAI or OpenRouter format
-                content = result["choices"][0]["message"]["content"]
-                logger.info("Extracted content from OpenAI/OpenRouter format response")
-                # Log a preview of the content
-                content_preview = content[:200] + "..." if len(content) > 200 else content
-                logger.info(f"Content preview: {content_preview}")
-            elif "content" in result:
-                # Anthropic format
-                content = result["content"][0]["text"]
-                logger.info("Extracted content from Anthropic format response")
-                # Log a preview of the content
-                content_preview = content[:200] + "..." if len(content) > 200 else content
-                logger.info(f"Content preview: {content_preview}")
-            else:
-                logger.error(f"Unexpected API response format: {result.keys()}")
-                return {"error": "Unexpected API response format"}
+            content = provider.extract_content(result) if provider is not None else None
+            if content is None:
+                if "choices" in result and len(result["choices"]) > 0:
+                    # OpenAI or OpenRouter format
+                    content = result["choices"][0]["message"]["content"]
+                elif "content" in result:
+                    # Anthropic format
+                    content = result["content"][0]["text"]
+                else:
+                    log_event(logger, logging.ERROR, "llm.unexpected_response", keys=list(result))
+                    return {"error": "Unexpected API response format"}
+            log_event(logger, logging.DEBUG, "llm.content", chars=len(content), content=Sensitive(content))
                 
-            # Extract JSON from the response
-            json_str = content.strip()
-            
-            # Try to find JSON in the response
-            # First, look for JSON code blocks
-            if "```json" in json_str:
-                # Extract content between ```json and ```
-                start_idx = json_str.find("```json") + 7
-                end_idx = json_str.find("```", start_idx)
-                if end_idx != -1:
-                    json_str = json_str[start_idx:end_idx].strip()
-                    logger.info("Extracted JSON from ```json code block")
-            elif "```" in json_str:
-                # Extract content between ``` and ```
-                start_idx = json_str.find("```") + 3
-                end_idx = json_str.find("```", start_idx)
-                if end_idx != -1:
-                    json_str = json_str[start_idx:end_idx].strip()
-                    logger.info("Extracted JSON from ``` code block")
-            else:
-                # Try to find JSON object directly
-                start_idx = json_str.find("{")
-                end_idx = json_str.rfind("}") + 1
-                if start_idx != -1 and end_idx != 0:
-                    json_str = json_str[start_idx:end_idx].strip()
-                    logger.info("Extracted JSON object directly from content")
+            # Extract JSON from the response. It is decoded as is before a code
+            # fence around it is removed, as the improved prompt may contain
+            # fences of its own
+            json_str = strip_outer_fence(content.strip())
             
+            repair_start = None
             try:
-                # First, strip any leading/trailing whitespace
-                json_str = json_str.strip()
-                analysis = json.loads(json_str)
-                logger.info("Successfully parsed JSON from LLM response")
+                analysis = decode_json_reply(content, "{")
             except json.JSONDecodeError:
                 # If parsing fails, try to clean up the JSON string
-                logger.warning("Initial JSON parsing failed, attempting to clean up the JSON string")
+                repair_start = time.perf_counter()
+                log_event(logger, logging.DEBUG, "llm.json_cleanup", stage="trim")
                 # Remove any text before the first { and after the last }
                 start_idx = json_str.find("{")
                 end_idx = json_str.rfind("}") + 1
@@ -309,26 +416,22 @@ async def process_llm_response(response) -> Dict[str, Any]:
                     json_str = json_str[start_idx:end_idx].strip()
                     try:
                         analysis = json.loads(json_str)
-                        logger.info("Successfully parsed JSON after cleanup")
                     except json.JSONDecodeError as e:
                         # Try more aggressive cleanup - fix common JSON formatting issues
-                        logger.warning(f"JSON parsing still failed: {str(e)}, attempting more aggressive cleanup")
+                        log_event(logger, logging.DEBUG, "llm.json_cleanup", stage="repair", reason=str(e))
                         # Replace single quotes with double quotes for keys and string values
-                        import re
                         # Fix keys without quotes or with single quotes
-                        json_str = re.sub(r'([{,])\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:', r'\1"\2":', json_str)
+                        json_str = _UNQUOTED_KEY.sub(r'\1"\2":', json_str)
                         # Fix values with single quotes
-                        json_str = re.sub(r':\s*\'([^\']*?)\'([,}])', r':"\1"\2', json_str)
+                        json_str = _SINGLE_QUOTED_VALUE.sub(r':"\1"\2', json_str)
                         # Remove trailing commas
-                        json_str = re.sub(r',\s*}', '}', json_str)
-                        json_str = re.sub(r',\s*]', ']', json_str)
+                        json_str = _TRAILING_COMMA.sub(r'\1', json_str)
                         
                         try:
                             analysis = json.loads(json_str)
-                            logger.info("Successfully parsed JSON after aggressive cleanup")
                         except json.JSONDecodeError:
                             # If all else fails, try a more manual approach
-                            logger.error("All JSON parsing attempts failed, falling back to manual extraction")
+                            log_event(logger, logging.WARNING, "llm.json_unparsed", content=Sensitive(content))
                             # Create a basic structure with what we can extract
                             analysis = {
                                 "error": "Failed to parse complete JSON response",
@@ -339,25 +442,18 @@ async def process_llm_response(response) -> Dict[str, Any]:
                             }
                             
                             # Try to extract dimension scores
-                            score_match = re.search(r'"dimension_scores"\s*:\s*{([^}]+)}', json_str)
+                            score_match = _DIMENSION_SCORES.search(json_str)
                             if score_match:
                                 score_text = score_match.group(1)
-                                score_pairs = re.findall(r'"([^"]+)"\s*:\s*(\d+)', score_text)
+                                score_pairs = _SCORE_PAIR.findall(score_text)
                                 for key, value in score_pairs:
                                     try:
                                         analysis["dimension_scores"][key] = float(value) / 5.0  # Convert to 0-1 scale
                                     except ValueError:
                                         pass
             
-            # Log some key parts of the analysis
-            if "dimension_scores" in analysis:
-                logger.info(f"Dimension scores: {analysis['dimension_scores']}")
-            if "strengths" in analysis and analysis["strengths"]:
-                logger.info(f"First strength: {analysis['strengths'][0]}")
-            if "weaknesses" in analysis and analysis["weaknesses"]:
-                logger.info(f"First weakness: {analysis['weaknesses'][0]}")
-            if "suggestions" in analysis and analysis["suggestions"]:
-                logger.info(f"First suggestion title: {analysis['suggestions'][0].get('title', 'No title')}")
+            if repair_start is not None:
+                record_span("json_repair", repair_start)
             
             # Convert dimension scores from 1-5 scale to 0-1 scale if needed
             if "dimension_scores" in analysis:
@@ -365,24 +461,49 @@ async def process_llm_response(response) -> Dict[str, Any]:
                     # Check if score is on 1-5 scale and convert to 0-1
                     if isinstance(score, (int, float)) and score > 1:
                         analysis["dimension_scores"][dim] = score / 5.0
-                        logger.info(f"Converted {dim} score from {score} to {analysis['dimension_scores'][dim]}")
             
+            log_event(logger, logging.DEBUG, "llm.response_parsed",
+                      dimensions=len(analysis.get("dimension_scores") or ()),
+                      strengths=len(analysis.get("strengths") or ()),
+                      weaknesses=len(analysis.get("weaknesses") or ()),
+                      suggestions=len(analysis.get("suggestions") or ()))
             return analysis
         except (KeyError, json.JSONDecodeError) as e:
-            logger.error(f"Failed to parse LLM response: {str(e)}", exc_info=True)
-            logger.error(f"Raw content: {content[:500]}..." if 'content' in locals() else "No content")
+            log_exception(logger, "llm.parse_failed", content=Sensitive(content) if 'content' in locals() else None)
             return {
                 "error": f"Failed to parse LLM response: {str(e)}",
                 "raw_response": content[:1000] if 'content' in locals() else "No content"
             }
     else:
         error_text = await response.text()
-        logger.error(f"API request failed with status {response.status}: {error_text}")
+        log_event(logger, logging.ERROR, "llm.request_failed", status=response.status, details=Sensitive(error_text))
         return {
             "error": f"API request failed with status {response.status}",
             "details": error_text
         }
 
+async def process_packed_response(response, provider: Provider) -> Dict[str, Any]:
+    """Read the generated text of a packed analysis response"""
+    if response.status != 200:
+        error_text = await response.text()
+        log_event(logger, logging.ERROR, "llm.request_failed", status=response.status, details=Sensitive(error_text))
+        return {
+            "error": f"API request failed with status {response.status}",
+            "details": error_text
+        }
+    
+    try:
+        result = await response.json(content_type=None)
+        content = provider.extract_content(result)
+        provider.record_usage(result)
+    except (KeyError, IndexError, TypeError, AttributeError, json.JSONDecodeError) as e:
+        log_event(logger, logging.ERROR, "llm.parse_failed", reason=str(e))
+        return {"error": f"Failed to parse LLM response: {str(e)}"}
+    if content is None:
+        log_event(logger, logging.ERROR, "llm.unexpected_response", keys=list(result))
+        return {"error": "Unexpected API response format"}
+    return {"content": content}
+
 async def analyze_with_free_model(prompt_text: str, target_model: str) -> Dict[str, Any]:
     """
     Analyze a prompt using a free model or service.
@@ -396,7 +517,6 @@ async def analyze_with_free_model(prompt_text: str, target_model: str) -> Dict[s
     Returns:
         Dictionary containing analysis results
     """
-    logger.info("Using free model fallback as no API key is available")
     # This is a placeholder - in a real implementation, this would connect to a free API
     # For now, return a message indicating that LLM analysis requires an API key
     return {
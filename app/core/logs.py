@@ -0,0 +1,342 @@
+"""
+Structured logging module.
+
+This module keeps logging off the request path. Records are put on a bounded
+queue and formatted and written by a background listener thread, so a
+request pays for creating a record and nothing else; when the queue is full
+records are dropped and counted rather than blocking the event loop.
+
+Request handlers log named events with log_event: the level check and the
+event's sampling rate are applied before a record is created, and fields are
+passed as values and only formatted by the listener, so a disabled or
+sampled-out event costs no string formatting. Records carry the id of the
+request that emitted them, and prompt and response text wrapped in Sensitive
+is redacted according to the configured policy before it is written.
+"""
+
+import os
+import sys
+import json
+import queue
+import random
+import atexit
+import hashlib
+import logging
+import logging.handlers
+from uuid import uuid4
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Id of the request being handled, attached to every record
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Sampling rates by event name, set by LogPipeline.start (events not listed
+# are always logged)
+_sample_rates: Dict[str, float] = {}
+
+# Records sampled out by log_event
+_sampled_out = 0
+
+# Redaction policies for Sensitive fields
+REDACTION_POLICIES = ("length", "hash", "preview")
+
+# Characters of a Sensitive field kept by the preview policy
+PREVIEW_CHARS = 200
+
+# Longest request id accepted from the X-Request-ID header
+MAX_REQUEST_ID_LENGTH = 64
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has, so they are not taken for extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class Sensitive:
+    """
+    Prompt or response text in a log field.
+
+    Wrapping is free; the text is only redacted when the record is written.
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def redact(self, policy: str) -> str:
+        """The text as the redaction policy allows it to be written."""
+        if policy == "preview":
+            return self.text[:PREVIEW_CHARS] + "..." if len(self.text) > PREVIEW_CHARS else self.text
+        if policy == "hash":
+            digest = hashlib.sha256(self.text.encode("utf-8", "replace")).hexdigest()[:12]
+            return f"[redacted {len(self.text)} chars sha256:{digest}]"
+        return f"[redacted {len(self.text)} chars]"
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any):
+    """
+    Log a named event with structured fields.
+
+    Nothing is formatted here: the record is created only if the level is
+    enabled and the event is not sampled out (events at WARNING and above are
+    never sampled), and the fields are formatted by the listener thread.
+    Field values should not be mutated after the call.
+
+    Args:
+        logger: Logger of the calling module
+        level: Logging level
+        event: Dotted event name, e.g. "analysis.completed"
+        **fields: Values to log with the event; wrap prompt and response
+            text in Sensitive
+    """
+    global _sampled_out
+    if not logger.isEnabledFor(level):
+        return
+    rate = _sample_rates.get(event)
+    if rate is not None and level < logging.WARNING and random.random() >= rate:
+        _sampled_out += 1
+        return
+    logger.log(level, event, extra={"event": event, "fields": fields}, stacklevel=2)
+
+def log_exception(logger: logging.Logger, event: str, **fields: Any):
+    """Log a named event at ERROR level with the current exception's traceback."""
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error(event, exc_info=True, extra={"event": event, "fields": fields}, stacklevel=2)
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Format records as JSON lines or as text with key=value fields.
+
+    Records logged with log_event are written with their event name and
+    fields; other records with their formatted message. Sensitive values are
+    redacted according to the policy.
+    """
+
+    def __init__(self, output: str = "text", redaction: str = "length"):
+        """
+        Initialize the formatter.
+
+        Args:
+            output: "json" for one JSON object per line, "text" for the
+                plain log format followed by key=value fields
+            redaction: How Sensitive values are written (see REDACTION_POLICIES)
+        """
+        super().__init__(TEXT_FORMAT)
+        self.output = output
+        self.redaction = redaction
+
+    def _value(self, value: Any) -> Any:
+        if isinstance(value, Sensitive):
+            return value.redact(self.redaction)
+        if isinstance(value, float):
+            return round(value, 3)
+        return value
+
+    def _fields(self, record: logging.LogRecord) -> Dict[str, Any]:
+        fields = getattr(record, "fields", None)
+        if fields is None:
+            # Plain records may still carry extra attributes
+            fields = {key: value for key, value in vars(record).items()
+                      if key not in _RECORD_ATTRIBUTES and key not in ("event", "request_id")}
+        return {key: self._value(value) for key, value in fields.items() if value is not None}
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = self._fields(record)
+        request_id = getattr(record, "request_id", None)
+        if self.output == "json":
+            entry = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "event": getattr(record, "event", None),
+                "message": None if hasattr(record, "event") else record.getMessage(),
+                "request_id": request_id
+            }
+            entry = {key: value for key, value in entry.items() if value is not None}
+            entry.update(fields)
+            if record.exc_info:
+                entry["exception"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        text = super().format(record)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if request_id:
+            text += f" request_id={request_id}"
+        return text
+
+class _RequestIdFilter(logging.Filter):
+    """Attach the current request id while still in the emitting thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue records unformatted, dropping them when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in the same process, so the record needs no
+        # flattening; formatting it is left to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogPipeline:
+    """
+    Route all logging through a queue to a background handler thread.
+
+    start() replaces the root logger's handlers with a queue handler and
+    starts a listener writing formatted records to stderr; stop() flushes the
+    queue and stops the listener.
+    """
+
+    def __init__(
+        self,
+        level: int = logging.INFO,
+        output: str = "text",
+        redaction: str = "length",
+        sample_rates: Optional[Dict[str, float]] = None,
+        queue_size: int = 10000
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            level: Root logger level
+            output: "json" or "text"
+            redaction: Policy for Sensitive fields: "length" writes only the
+                length, "hash" the length and a short SHA-256 (to correlate
+                records without the text), "preview" the first characters
+            sample_rates: Fraction of each named event's records to keep
+            queue_size: Records buffered for the listener before new ones
+                are dropped
+        """
+        if output not in ("json", "text"):
+            raise ValueError(f"Unknown log format: {output}")
+        if redaction not in REDACTION_POLICIES:
+            raise ValueError(f"Unknown log redaction policy: {redaction}")
+        self.level = level
+        self.output = output
+        self.redaction = redaction
+        self.sample_rates = dict(sample_rates or {})
+        self.queue_size = queue_size
+        self._handler: Optional[_QueueHandler] = None
+        self._stream_handler: Optional[logging.Handler] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    @classmethod
+    def from_env(cls) -> "LogPipeline":
+        """
+        Create a pipeline from environment variables.
+
+        LOG_SAMPLE_RATES is a comma-separated list of event=rate pairs, e.g.
+        "llm.response_parsed=0.1,analysis.completed=0.5".
+        """
+        sample_rates = {}
+        for pair in os.getenv("LOG_SAMPLE_RATES", "").split(","):
+            if "=" in pair:
+                event, rate = pair.split("=", 1)
+                sample_rates[event.strip()] = float(rate)
+        return cls(
+            level=logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper()),
+            output=os.getenv("LOG_FORMAT", "text").lower(),
+            redaction=os.getenv("LOG_REDACTION", "length").lower(),
+            sample_rates=sample_rates,
+            queue_size=int(os.getenv("LOG_QUEUE_SIZE", 10000))
+        )
+
+    def start(self):
+        """Install the queue handler on the root logger and start the listener."""
+        global _sample_rates
+        if self._listener is not None:
+            return
+        self._stream_handler = stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(StructuredFormatter(self.output, self.redaction))
+
+        log_queue: queue.Queue = queue.Queue(self.queue_size)
+        self._handler = _QueueHandler(log_queue)
+        self._handler.addFilter(_RequestIdFilter())
+        self._listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self._handler)
+        root.setLevel(self.level)
+        _sample_rates = self.sample_rates
+
+        self._listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Write the queued records and stop the listener; records logged after
+        this are written directly.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            root = logging.getLogger()
+            root.removeHandler(self._handler)
+            root.addHandler(self._stream_handler)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and how many records were dropped or sampled out."""
+        return {
+            "queued": self._handler.queue.qsize() if self._handler is not None else 0,
+            "dropped": self._handler.dropped if self._handler is not None else 0,
+            "sampled_out": _sampled_out
+        }
+
+class RequestIdMiddleware:
+    """
+    Give each HTTP request an id for log correlation.
+
+    The id is taken from the X-Request-ID header when it is a short token,
+    generated otherwise, set for the request's logging context and returned
+    in the X-Request-ID response header.
+    """
+
+    def __init__(self, app: ASGIApp, header: str = "x-request-id"):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application to wrap
+            header: Request and response header carrying the id
+        """
+        self.app = app
+        self.header = header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(self.header)
+        if not request_id or len(request_id) > MAX_REQUEST_ID_LENGTH or not all(
+            character.isalnum() or character in "-_." for character in request_id
+        ):
+            request_id = uuid4().hex
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[self.header] = request_id
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
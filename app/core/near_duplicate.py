@@ -0,0 +1,265 @@
+"""
+Near-duplicate prompt index module.
+
+This module finds previously analyzed prompts that are nearly identical to a
+new one (whitespace, punctuation or a word changed) so their LLM analysis can
+be reused. Prompts are sketched with one-permutation MinHash over character
+shingles and indexed with LSH banding, so a lookup costs one pass over the
+prompt plus a few dictionary probes.
+"""
+
+import os
+import re
+import copy
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from operator import eq
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.core.history import prompt_hash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+# Marker for signature bins that received no shingle
+EMPTY_BIN = 0xFFFFFFFF
+
+def normalize_for_similarity(prompt_text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", prompt_text.lower()).split())
+
+def key_scope(api_key: str) -> str:
+    """Scope of the analyses made with an API key (a digest, never the key)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+class NearDuplicateEntry:
+    """Indexed prompt with its signature and the LLM analysis to reuse."""
+
+    __slots__ = ("key", "scope", "target_model", "signature", "analysis", "created_at")
+
+    def __init__(self, key: str, scope: str, target_model: str, signature: Tuple[int, ...],
+                 analysis: Dict[str, Any], created_at: float):
+        self.key = key
+        self.scope = scope
+        self.target_model = target_model
+        self.signature = signature
+        self.analysis = analysis
+        self.created_at = created_at
+
+class NearDuplicateIndex:
+    """
+    Bounded MinHash/LSH index of analyzed prompts.
+
+    The signature has num_bins bins split into bands of rows_per_band bins;
+    prompts sharing any band are candidates, and candidates are confirmed by
+    the estimated Jaccard similarity of their signatures. Only entries of the
+    same scope (API key) and target model match. Entries are evicted
+    least-recently-used once capacity is reached, and after max_age seconds.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        capacity: int = 10000,
+        max_age: float = 86400.0,
+        shingle_size: int = 5,
+        num_bins: int = 64,
+        rows_per_band: int = 8
+    ):
+        """
+        Initialize the index.
+
+        Args:
+            threshold: Minimum estimated similarity (0-1) for a match
+            capacity: Maximum number of indexed prompts
+            max_age: Seconds after which an entry is no longer returned
+            shingle_size: Length of the character shingles in bytes
+            num_bins: Number of MinHash bins (a power of two)
+            rows_per_band: Bins per LSH band; num_bins must be a multiple
+        """
+        if num_bins & (num_bins - 1) or num_bins % rows_per_band:
+            raise ValueError("num_bins must be a power of two and a multiple of rows_per_band")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.max_age = max_age
+        self.shingle_size = shingle_size
+        self.num_bins = num_bins
+        self.rows_per_band = rows_per_band
+        self._bin_bits = num_bins.bit_length() - 1
+        self._entries: "OrderedDict[str, NearDuplicateEntry]" = OrderedDict()
+        self._bands: List[Dict[Tuple[int, ...], set]] = [{} for _ in range(num_bins // rows_per_band)]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["NearDuplicateIndex"]:
+        """Create an index from environment variables, or None if disabled."""
+        if os.getenv("NEAR_DUPLICATE_ENABLED", "True").lower() != "true":
+            return None
+        return cls(
+            threshold=float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.9)),
+            capacity=int(os.getenv("NEAR_DUPLICATE_CAPACITY", 10000)),
+            max_age=float(os.getenv("NEAR_DUPLICATE_MAX_AGE", 86400))
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, prompt_text: str) -> Tuple[int, ...]:
+        """
+        Compute the one-permutation MinHash signature of a prompt.
+
+        Each shingle is hashed once; the low bits pick its bin and the
+        remaining bits are the value minimized within that bin.
+        """
+        data = normalize_for_similarity(prompt_text).encode("utf-8")
+        size = self.shingle_size
+        mask = self.num_bins - 1
+        bits = self._bin_bits
+        bins = [EMPTY_BIN] * self.num_bins
+        crc32 = zlib.crc32
+
+        # Prompts shorter than one shingle are hashed whole
+        for start in range(max(1, len(data) - size + 1)):
+            value = crc32(data[start:start + size])
+            index = value & mask
+            value >>= bits
+            if value < bins[index]:
+                bins[index] = value
+        return tuple(bins)
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimate Jaccard similarity from two signatures, ignoring bins empty in both."""
+        matches = sum(map(eq, first, second))
+        used = len(first)
+
+        # Only short prompts leave bins empty, so only they take the slow path
+        if EMPTY_BIN in first and EMPTY_BIN in second:
+            both_empty = sum(1 for a, b in zip(first, second) if a == EMPTY_BIN and b == EMPTY_BIN)
+            matches -= both_empty
+            used -= both_empty
+        return matches / used if used else 1.0
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        rows = self.rows_per_band
+        return [signature[start:start + rows] for start in range(0, self.num_bins, rows)]
+
+    def _remove(self, key: str):
+        """Remove an entry and its band postings. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band, band_key in zip(self._bands, self._band_keys(entry.signature)):
+            postings = band.get(band_key)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del band[band_key]
+
+    def add(self, prompt_text: str, target_model: str, analysis: Dict[str, Any],
+            created_at: Optional[float] = None, scope: str = ""):
+        """
+        Index a prompt and the LLM analysis produced for it.
+
+        Args:
+            prompt_text: The analyzed prompt text
+            target_model: The target model the analysis was made for
+            analysis: The LLM analysis to reuse for near-duplicates
+            created_at: Unix time of the analysis (defaults to now)
+            scope: Scope of the API key the analysis was made with (key_scope)
+        """
+        key = f"{scope}:{target_model}:{prompt_hash(prompt_text)}"
+        entry = NearDuplicateEntry(
+            key, scope, target_model, self.signature(prompt_text),
+            analysis, time.time() if created_at is None else created_at
+        )
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            for band, band_key in zip(self._bands, self._band_keys(entry.signature)):
+                band.setdefault(band_key, set()).add(key)
+
+            # Evict least recently used entries beyond capacity
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def lookup(self, prompt_text: str, target_model: str,
+               scope: str = "") -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        Find the most similar indexed prompt for the same scope and target model.
+
+        Args:
+            prompt_text: The prompt text to look up
+            target_model: The target model of the request
+            scope: Scope of the request's API key (key_scope)
+
+        Returns:
+            Tuple of (similarity, copy of the stored analysis) for the best
+            match at or above the threshold, or None
+        """
+        signature = self.signature(prompt_text)
+        oldest = time.time() - self.max_age
+        best: Optional[NearDuplicateEntry] = None
+        best_similarity = 0.0
+
+        with self._lock:
+            candidates = set()
+            for band, band_key in zip(self._bands, self._band_keys(signature)):
+                postings = band.get(band_key)
+                if postings:
+                    candidates.update(postings)
+
+            for key in candidates:
+                entry = self._entries[key]
+                if entry.target_model != target_model or entry.scope != scope:
+                    continue
+                if entry.created_at < oldest:
+                    self._remove(key)
+                    continue
+                score = self.similarity(signature, entry.signature)
+                if score >= self.threshold and score > best_similarity:
+                    best, best_similarity = entry, score
+
+            if best is None:
+                return None
+            self._entries.move_to_end(best.key)
+            analysis = copy.deepcopy(best.analysis)
+        return best_similarity, analysis
+
+    def rebuild_from_history(self, history_store, batch_size: int = 500) -> int:
+        """
+        Rebuild the index from LLM analyses stored in the history store.
+
+        Only analyses younger than max_age are loaded, oldest first, so the
+        most recent ones end up most recently used. Analyses stored without
+        the scope of their API key are skipped.
+
+        Args:
+            history_store: HistoryStore to read from
+            batch_size: Number of rows read per query
+
+        Returns:
+            Number of indexed analyses
+        """
+        with self._lock:
+            self._entries.clear()
+            for band in self._bands:
+                band.clear()
+
+        count = 0
+        since = time.time() - self.max_age
+        for row in history_store.iter_llm_analyses(since=since, batch_size=batch_size):
+            if row["key_scope"] is None:
+                continue
+            self.add(row["normalized_text"], row["target_model"], row["llm_analysis"], row["created_at"],
+                     row["key_scope"])
+            count += 1
+        logger.info(f"Rebuilt near-duplicate index with {len(self)} of {count} stored LLM analyses")
+        return count
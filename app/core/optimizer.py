@@ -5,12 +5,15 @@ This module contains functions for generating optimization suggestions
 based on prompt analysis results.
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+from app.core.repetition import RepeatedSpan, find_repeats, remove_repeats
 
 def generate_optimization_suggestions(
     prompt_text: str, 
     analysis_results: Dict[str, Any],
-    target_model: str = "general"
+    target_model: str = "general",
+    dimensions: Optional[List[str]] = None
 ) -> List[Dict[str, Any]]:
     """
     Generate optimization suggestions based on analysis results.
@@ -19,6 +22,8 @@ def generate_optimization_suggestions(
         prompt_text: The original prompt text
         analysis_results: Results from the prompt analyzer
         target_model: The target model for optimization
+        dimensions: When set, only suggest for these dimensions, without
+            model-specific or general suggestions
         
     Returns:
         List of optimization suggestions
@@ -30,10 +35,14 @@ def generate_optimization_suggestions(
     
     # Generate suggestions based on low scores
     for dimension, score in scores.items():
+        if dimensions and dimension not in dimensions:
+            continue
         if score < 0.5:
             suggestion = generate_suggestion_for_dimension(dimension, prompt_text, score)
             if suggestion:
                 suggestions.append(suggestion)
+    if dimensions:
+        return suggestions
     
     # Add model-specific suggestions if applicable
     if target_model != "general":
@@ -47,86 +56,92 @@ def generate_optimization_suggestions(
     
     return suggestions
 
+# Static suggestion templates for each dimension. The implementation field is
+# built per prompt by the matching get_*_implementation helper.
+DIMENSION_SUGGESTIONS = {
+    "clarity": {
+        "title": "Improve clarity and specificity",
+        "description": "Your prompt could benefit from clearer instructions and more specific language.",
+        "example": "Instead of 'Tell me about AI', try 'Explain how AI is used in healthcare, focusing on diagnostic applications and patient outcomes'.",
+        "rationale": "Clear, specific instructions help the AI understand exactly what you're looking for."
+    },
+    "context": {
+        "title": "Add more context or background information",
+        "description": "Providing more context would help the AI understand the situation better.",
+        "example": "Instead of 'How do I fix this?', try 'I'm working with a Python Flask application that's returning a 500 error when accessing the /users endpoint. The error log shows a database connection issue. How can I troubleshoot and fix this?'",
+        "rationale": "Context helps the AI provide more relevant and accurate responses."
+    },
+    "task_definition": {
+        "title": "Define the task more clearly",
+        "description": "Be more explicit about what you want the AI to do.",
+        "example": "Instead of 'Help with my presentation', try 'Create an outline for a 10-minute presentation on renewable energy sources, including 3 main points with supporting data'.",
+        "rationale": "A well-defined task leads to more focused and useful responses."
+    },
+    "structure": {
+        "title": "Improve prompt structure",
+        "description": "Organizing your prompt with clear sections or bullet points can make it easier to understand.",
+        "example": "Try structuring your prompt with numbered points or sections with headers.",
+        "rationale": "Well-structured prompts are easier for AI to parse and respond to methodically."
+    },
+    "examples": {
+        "title": "Include examples",
+        "description": "Adding examples of what you're looking for can improve results.",
+        "example": "For instance, 'Write a product description for a coffee maker. Example tone: Our premium water filter combines elegant design with powerful filtration technology...'",
+        "rationale": "Examples help the AI understand your expectations for style, format, and content."
+    },
+    "conciseness": {
+        "title": "Make your prompt more concise",
+        "description": "Your prompt contains unnecessary words or repetition that could be removed.",
+        "example": "Try removing filler words and focusing on essential information.",
+        "rationale": "Concise prompts are clearer and help the AI focus on what's important."
+    },
+    "specificity": {
+        "title": "Specify desired output format",
+        "description": "Clearly indicate what format you want the response in.",
+        "example": "Add instructions like 'Format the response as a bulleted list' or 'Provide your answer in a table with columns for Feature, Benefit, and Example'.",
+        "rationale": "Specifying output format ensures you get results in the most useful form for your needs."
+    },
+    "role_assignment": {
+        "title": "Use role prompting",
+        "description": "Assigning a specific role to the AI can improve responses.",
+        "example": "Start your prompt with 'Act as an experienced data scientist' or 'You are an expert in maritime law'.",
+        "rationale": "Role prompting helps frame the AI's perspective and knowledge base appropriately for your question."
+    },
+    "reasoning_guidance": {
+        "title": "Add reasoning guidance",
+        "description": "Instruct the AI to explain its thinking process.",
+        "example": "Add 'Think step by step' or 'Explain your reasoning as you solve this problem'.",
+        "rationale": "Guidance for reasoning leads to more thorough and logical responses."
+    },
+    "constraints": {
+        "title": "Add clear constraints",
+        "description": "Specify limitations or boundaries for the response.",
+        "example": "Add constraints like 'Keep the explanation under 200 words' or 'Only include methods that don't require specialized tools'.",
+        "rationale": "Clear constraints help focus the response on what's most useful to you."
+    }
+}
+
 def generate_suggestion_for_dimension(dimension: str, prompt_text: str, score: float) -> Dict[str, Any]:
     """Generate a suggestion for improving a specific dimension."""
+    template = DIMENSION_SUGGESTIONS.get(dimension)
+    if template is None:
+        return None
     
-    suggestions = {
-        "clarity": {
-            "title": "Improve clarity and specificity",
-            "description": "Your prompt could benefit from clearer instructions and more specific language.",
-            "example": "Instead of 'Tell me about AI', try 'Explain how AI is used in healthcare, focusing on diagnostic applications and patient outcomes'.",
-            "rationale": "Clear, specific instructions help the AI understand exactly what you're looking for.",
-            "implementation": get_clarity_implementation(prompt_text, score)
-        },
-        "context": {
-            "title": "Add more context or background information",
-            "description": "Providing more context would help the AI understand the situation better.",
-            "example": "Instead of 'How do I fix this?', try 'I'm working with a Python Flask application that's returning a 500 error when accessing the /users endpoint. The error log shows a database connection issue. How can I troubleshoot and fix this?'",
-            "rationale": "Context helps the AI provide more relevant and accurate responses.",
-            "implementation": get_context_implementation(prompt_text, score)
-        },
-        "task_definition": {
-            "title": "Define the task more clearly",
-            "description": "Be more explicit about what you want the AI to do.",
-            "example": "Instead of 'Help with my presentation', try 'Create an outline for a 10-minute presentation on renewable energy sources, including 3 main points with supporting data'.",
-            "rationale": "A well-defined task leads to more focused and useful responses.",
-            "implementation": get_task_implementation(prompt_text, score)
-        },
-        "structure": {
-            "title": "Improve prompt structure",
-            "description": "Organizing your prompt with clear sections or bullet points can make it easier to understand.",
-            "example": "Try structuring your prompt with numbered points or sections with headers.",
-            "rationale": "Well-structured prompts are easier for AI to parse and respond to methodically.",
-            "implementation": get_structure_implementation(prompt_text, score)
-        },
-        "examples": {
-            "title": "Include examples",
-            "description": "Adding examples of what you're looking for can improve results.",
-            "example": "For instance, 'Write a product description for a coffee maker. Example tone: Our premium water filter combines elegant design with powerful filtration technology...'",
-            "rationale": "Examples help the AI understand your expectations for style, format, and content.",
-            "implementation": get_examples_implementation(prompt_text, score)
-        },
-        "conciseness": {
-            "title": "Make your prompt more concise",
-            "description": "Your prompt contains unnecessary words or repetition that could be removed.",
-            "example": "Try removing filler words and focusing on essential information.",
-            "rationale": "Concise prompts are clearer and help the AI focus on what's important.",
-            "implementation": get_conciseness_implementation(prompt_text, score)
-        },
-        "specificity": {
-            "title": "Specify desired output format",
-            "description": "Clearly indicate what format you want the response in.",
-            "example": "Add instructions like 'Format the response as a bulleted list' or 'Provide your answer in a table with columns for Feature, Benefit, and Example'.",
-            "rationale": "Specifying output format ensures you get results in the most useful form for your needs.",
-            "implementation": get_specificity_implementation(prompt_text, score)
-        },
-        "role_assignment": {
-            "title": "Use role prompting",
-            "description": "Assigning a specific role to the AI can improve responses.",
-            "example": "Start your prompt with 'Act as an experienced data scientist' or 'You are an expert in maritime law'.",
-            "rationale": "Role prompting helps frame the AI's perspective and knowledge base appropriately for your question.",
-            "implementation": get_role_implementation(prompt_text, score)
-        },
-        "reasoning_guidance": {
-            "title": "Add reasoning guidance",
-            "description": "Instruct the AI to explain its thinking process.",
-            "example": "Add 'Think step by step' or 'Explain your reasoning as you solve this problem'.",
-            "rationale": "Guidance for reasoning leads to more thorough and logical responses.",
-            "implementation": get_reasoning_implementation(prompt_text, score)
-        },
-        "constraints": {
-            "title": "Add clear constraints",
-            "description": "Specify limitations or boundaries for the response.",
-            "example": "Add constraints like 'Keep the explanation under 200 words' or 'Only include methods that don't require specialized tools'.",
-            "rationale": "Clear constraints help focus the response on what's most useful to you.",
-            "implementation": get_constraints_implementation(prompt_text, score)
-        }
-    }
-    
-    if dimension in suggestions:
-        return suggestions[dimension]
-    
-    return None
+    # Only build the implementation for the dimension that needs it
+    suggestion = dict(template)
+    if dimension == "conciseness":
+        # Report the repeated passages, and cut them from the implementation
+        repeats = find_repeats(prompt_text)
+        if repeats:
+            suggestion["description"] += (
+                f" {len(repeats)} repeated passage{'s waste' if len(repeats) > 1 else ' wastes'} about "
+                f"{sum(repeated.tokens for repeated in repeats)} tokens."
+            )
+        suggestion["repeated_spans"] = [repeated.to_dict() for repeated in repeats]
+        suggestion["implementation"] = get_conciseness_implementation(prompt_text, score, repeats)
+        return suggestion
+    suggestion["implementation"] = IMPLEMENTATION_BUILDERS[dimension](prompt_text, score)
+    return suggestion
 
 def generate_model_specific_suggestions(prompt_text: str, target_model: str) -> List[Dict[str, Any]]:
     """Generate suggestions specific to the target model."""
@@ -229,12 +244,12 @@ def get_examples_implementation(prompt_text: str, score: float) -> str:
     """Generate implementation suggestion for adding examples."""
     return prompt_text + "\n\nFor example:\n```\n[Example of what you're looking for]\n```"
 
-def get_conciseness_implementation(prompt_text: str, score: float) -> str:
+def get_conciseness_implementation(prompt_text: str, score: float,
+                                   repeats: Optional[List[RepeatedSpan]] = None) -> str:
     """Generate implementation suggestion for improving conciseness."""
-    # This would require more sophisticated NLP to implement properly
-    # For now, just suggest removing common filler words
+    # Drop repeated sentences and blocks, then common filler words
     filler_words = ["basically", "actually", "literally", "very", "really", "just", "so", "quite"]
-    result = prompt_text
+    result = remove_repeats(prompt_text, repeats)
     for word in filler_words:
         result = result.replace(f" {word} ", " ")
     return result
@@ -254,3 +269,17 @@ def get_reasoning_implementation(prompt_text: str, score: float) -> str:
 def get_constraints_implementation(prompt_text: str, score: float) -> str:
     """Generate implementation suggestion for adding constraints."""
     return prompt_text + "\n\nConstraints:\n- Keep your response under 300 words\n- Focus only on [specific aspect]\n- Do not include [what to exclude]"
+
+# Map each dimension to the helper that builds its implementation suggestion
+IMPLEMENTATION_BUILDERS = {
+    "clarity": get_clarity_implementation,
+    "context": get_context_implementation,
+    "task_definition": get_task_implementation,
+    "structure": get_structure_implementation,
+    "examples": get_examples_implementation,
+    "conciseness": get_conciseness_implementation,
+    "specificity": get_specificity_implementation,
+    "role_assignment": get_role_implementation,
+    "reasoning_guidance": get_reasoning_implementation,
+    "constraints": get_constraints_implementation
+}
@@ -0,0 +1,245 @@
+"""
+Multi-prompt packing module.
+
+This module groups several prompts into one detailed-analysis request and
+reads the per-prompt analyses back out, so bulk analyses pay the system
+prompt, the instructions and the request latency once per pack instead of
+once per prompt.
+
+Packs are filled greedily in input order while the estimated input fits the
+model's context window and the estimated output fits its output budget.
+The model answers with a JSON array of analyses tagged with the prompt ids;
+when the array is cut short or partly malformed, every complete analysis
+before the damage is still recovered, and only the missing prompts need to
+be analyzed again.
+"""
+
+import re
+import json
+import logging
+from typing import Dict, List, Any
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upper bound on prompts per pack, however short they are
+PACKED_MAX_ITEMS = 10
+
+# Estimated output tokens of one analysis, excluding its improved prompt
+PACKED_ITEM_OUTPUT_TOKENS = 450
+
+# Static instructions of a packed request, sent before the variable part so
+# provider prompt caches can reuse them
+PACKED_INSTRUCTIONS = """
+Please analyze each of the prompts given at the end of this message and provide feedback on how to improve it.
+Each prompt is enclosed between <<<PROMPT id=N>>> and <<<END PROMPT id=N>>>.
+Analyze every prompt on its own; do not compare them.
+
+IMPORTANT: Do not modify or repeat the target model information given with the prompts. Do not include your own model name in your analysis.
+
+Score each prompt from 1-5 on: clarity, context, task_definition, structure, examples, conciseness, specificity, role_assignment, reasoning_guidance, constraints.
+Give 2-3 specific, actionable suggestions per prompt.
+
+Respond with only a JSON array holding one object per prompt, in the order given:
+[
+    {
+        "id": 1,
+        "dimension_scores": {"clarity": 4, "context": 3, ...},
+        "strengths": ["strength1", ...],
+        "weaknesses": ["weakness1", ...],
+        "suggestions": [
+            {
+                "title": "Suggestion title",
+                "description": "Detailed description",
+                "example": "Example implementation",
+                "rationale": "Why this would help"
+            }
+        ],
+        "improved_prompt": "A revised version of the prompt"
+    },
+    ...
+]
+"""
+
+# Variable part of a packed request; {0} is the target model, {1} the prompts
+PACKED_REQUEST = """
+Target AI model: {0}
+
+{1}
+"""
+
+# A code fence around the whole reply: an opening line such as ```json, the
+# body and a closing ``` at the very end
+_OUTER_FENCE = re.compile(r"\A```[\w-]*[ \t]*\n(.*)\n[ \t]*```\Z", re.DOTALL)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def item_output_tokens(prompt_text: str) -> int:
+    """Estimated output tokens of one prompt's analysis."""
+    return PACKED_ITEM_OUTPUT_TOKENS + estimate_tokens(prompt_text)
+
+def plan_packs(
+    prompt_texts: List[str],
+    input_budget: int,
+    output_budget: int,
+    max_items: int = PACKED_MAX_ITEMS
+) -> List[List[int]]:
+    """
+    Group prompts into packs that fit the model's budgets.
+
+    Args:
+        prompt_texts: Prompts to analyze
+        input_budget: Tokens available for the prompts in one request
+            (context window minus system prompt, instructions and output)
+        output_budget: Maximum output tokens of one request
+        max_items: Maximum number of prompts per pack
+
+    Returns:
+        Lists of prompt indices, in input order; a prompt too large to share
+        a request gets a pack of its own
+    """
+    packs: List[List[int]] = []
+    current: List[int] = []
+    input_tokens = output_tokens = 0
+    for index, text in enumerate(prompt_texts):
+        item_input = estimate_tokens(text) + 20  # Delimiters
+        item_output = item_output_tokens(text)
+        if current and (
+            len(current) >= max_items
+            or input_tokens + item_input > input_budget
+            or output_tokens + item_output > output_budget
+        ):
+            packs.append(current)
+            current = []
+            input_tokens = output_tokens = 0
+        current.append(index)
+        input_tokens += item_input
+        output_tokens += item_output
+    if current:
+        packs.append(current)
+    return packs
+
+def build_packed_prompt(prompt_texts: List[str], display_target_model: str) -> str:
+    """
+    Build the variable part of a pack's request (sent after
+    PACKED_INSTRUCTIONS); prompts get ids 1 to len(prompt_texts).
+
+    Args:
+        prompt_texts: Prompts of the pack
+        display_target_model: Target model named in the instructions
+
+    Returns:
+        The target model and the delimited prompts
+    """
+    blocks = [
+        f"<<<PROMPT id={number}>>>\n{text}\n<<<END PROMPT id={number}>>>"
+        for number, text in enumerate(prompt_texts, 1)
+    ]
+    return PACKED_REQUEST.format(display_target_model, "\n\n".join(blocks))
+
+def parse_packed_content(content: str, count: int) -> Dict[int, Dict[str, Any]]:
+    """
+    Read the analyses out of a packed response.
+
+    Args:
+        content: Text generated by the model
+        count: Number of prompts in the pack
+
+    Returns:
+        Analyses by prompt position (0-based); positions whose analysis is
+        missing or malformed are absent
+    """
+    try:
+        items = decode_json_reply(content, "[")
+    except json.JSONDecodeError:
+        items = _salvage_items(strip_outer_fence(content.strip()))
+    if not isinstance(items, list):
+        return {}
+
+    analyses: Dict[int, Dict[str, Any]] = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("dimension_scores"), dict):
+            continue
+        try:
+            number = int(item.pop("id"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 1 <= number <= count and number - 1 not in analyses:
+            analyses[number - 1] = _normalize(item)
+
+    if len(analyses) < count:
+        logger.warning(f"Recovered {len(analyses)} of {count} analyses from a packed response")
+    return analyses
+
+def strip_outer_fence(text: str) -> str:
+    """Remove a code fence that brackets the whole of a stripped reply, if any."""
+    match = _OUTER_FENCE.match(text)
+    return match.group(1) if match else text
+
+def decode_json_reply(content: str, opener: str) -> Any:
+    """
+    Decode the JSON value a model reply consists of.
+
+    The reply is decoded as is first, then from its first opener character
+    (to skip a leading ```json line or a sentence), and only then without a
+    code fence around it. Fences inside the value, such as in an improved
+    prompt, therefore never cut it short.
+
+    Args:
+        content: Text generated by the model
+        opener: "[" for an array, "{" for an object
+
+    Returns:
+        The decoded value
+
+    Raises:
+        json.JSONDecodeError: If no JSON value can be decoded
+    """
+    decoder = json.JSONDecoder()
+    text = content.strip()
+    error = None
+    for candidate in (text, strip_outer_fence(text)):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError as e:
+            error = error or e
+        start = candidate.find(opener)
+        if start != -1:
+            try:
+                return decoder.raw_decode(candidate, start)[0]
+            except json.JSONDecodeError:
+                pass
+    raise error
+
+def _salvage_items(text: str) -> List[Any]:
+    """Decode the complete objects at the start of a truncated or damaged JSON array."""
+    start = text.find("[")
+    if start == -1:
+        return []
+    decoder = json.JSONDecoder()
+    items: List[Any] = []
+    position = start + 1
+    length = len(text)
+    while position < length:
+        while position < length and text[position] in " \t\r\n,":
+            position += 1
+        if position >= length or text[position] == "]":
+            break
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            break
+        items.append(item)
+    return items
+
+def _normalize(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert 1-5 dimension scores to the 0-1 scale of single analyses."""
+    scores = analysis["dimension_scores"]
+    for dimension, score in scores.items():
+        if isinstance(score, (int, float)) and score > 1:
+            scores[dimension] = score / 5.0
+    for key in ("strengths", "weaknesses", "suggestions"):
+        analysis.setdefault(key, [])
+    return analysis
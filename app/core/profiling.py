@@ -0,0 +1,355 @@
+"""
+On-demand profiling module.
+
+This module lets an operator see where a live worker spends its time without
+redeploying it. It has two parts, both off unless PROFILING_ENABLED is set and
+both guarded by an admin token:
+
+- Request profiles: a request sent with X-Profile: 1 (and the token) runs
+  under cProfile. Its rule analysis runs inline and bypasses the rule cache,
+  so the analysis itself is in the profile. The profile is kept in memory and
+  its id returned in X-Profile-Id.
+- Worker sampling: for a bounded number of seconds a background thread
+  samples the stacks of every thread in the worker and returns them as
+  collapsed stacks, the input format of flamegraph.pl, inferno and speedscope.
+
+While either is running, rule extraction is also timed per dimension and per
+rule, since the compiled rules are closures that a function profile cannot
+tell apart. Results break these timings down next to the analyzer and
+optimizer functions. When nothing is being profiled, the only cost is a
+check of a module attribute per analysis.
+"""
+
+import io
+import os
+import sys
+import hmac
+import time
+import pstats
+import cProfile
+import threading
+from uuid import uuid4
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import rules
+
+# Modules whose functions are reported in result breakdowns
+BREAKDOWN_MODULES = ("app.core.analyzer", "app.core.optimizer", "app.core.execution")
+
+# Functions listed in text and JSON request profiles
+PROFILE_TOP_FUNCTIONS = 40
+
+def in_profiled_request() -> bool:
+    """Whether the current request runs under a request profile."""
+    return rules.profiled_request.get()
+
+class StageTimer:
+    """Time spent extracting features, per dimension and per rule."""
+
+    def __init__(self):
+        self.dimensions: Dict[str, List[float]] = {}
+        self.rules: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, dimension_times: List[Tuple[str, float]], rule_times: List[Tuple[str, float]]):
+        """Add the timings of one extraction (may be called from any thread)."""
+        with self._lock:
+            for table, times in ((self.dimensions, dimension_times), (self.rules, rule_times)):
+                for name, seconds in times:
+                    entry = table.get(name)
+                    if entry is None:
+                        table[name] = [1, seconds]
+                    else:
+                        entry[0] += 1
+                        entry[1] += seconds
+
+    def summary(self, top: int = PROFILE_TOP_FUNCTIONS) -> Dict[str, Any]:
+        """Dimensions and the slowest rules, with calls and milliseconds."""
+        def rows(table: Dict[str, List[float]], limit: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+            ranked = sorted(table.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+            return {name: {"calls": calls, "ms": round(seconds * 1000, 3)} for name, (calls, seconds) in ranked}
+        with self._lock:
+            return {"dimensions": rows(self.dimensions), "rules": rows(self.rules, top)}
+
+# Timer of the request being profiled, and of the running sampling window
+_request_timer: ContextVar[Optional[StageTimer]] = ContextVar("request_timer", default=None)
+_window_timer: Optional[StageTimer] = None
+_active_profiles = 0
+_active_lock = threading.Lock()
+
+def _current_timers() -> List[StageTimer]:
+    timers = []
+    request_timer = _request_timer.get()
+    if request_timer is not None:
+        timers.append(request_timer)
+    if _window_timer is not None:
+        timers.append(_window_timer)
+    return timers
+
+def _profile_started():
+    global _active_profiles
+    with _active_lock:
+        _active_profiles += 1
+        rules.stage_timers = _current_timers
+
+def _profile_finished():
+    global _active_profiles
+    with _active_lock:
+        _active_profiles -= 1
+        if not _active_profiles:
+            rules.stage_timers = None
+
+def _frame_label(code) -> str:
+    """module:function for a code object, the module named from its import path."""
+    module = code.co_filename
+    roots = [path for path in sys.path if path and module.startswith(path.rstrip(os.sep) + os.sep)]
+    if roots:
+        module = module[len(max(roots, key=len)):].lstrip(os.sep)
+    module = module[:-3] if module.endswith(".py") else module
+    return f"{module.replace(os.sep, '.')}:{code.co_name}"
+
+class Profiler:
+    """
+    Request profiles and worker sampling, with the profiles kept for
+    retrieval.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        token: Optional[str] = None,
+        max_seconds: float = 60.0,
+        keep: int = 20
+    ):
+        """
+        Initialize the profiler.
+
+        Args:
+            enabled: Whether profiling is available at all
+            token: Admin token that requests must send in X-Admin-Token;
+                profiling stays unavailable without one
+            max_seconds: Longest sampling window
+            keep: Request profiles kept for retrieval
+        """
+        self.enabled = bool(enabled and token)
+        self.token = token
+        self.max_seconds = max_seconds
+        self.keep = keep
+        self.profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._request_lock = threading.Lock()
+        self._sampling_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        """Create a profiler from environment variables."""
+        return cls(
+            enabled=os.getenv("PROFILING_ENABLED", "False").lower() in ("true", "1", "yes"),
+            token=os.getenv("PROFILING_TOKEN") or None,
+            max_seconds=float(os.getenv("PROFILING_MAX_SECONDS", 60)),
+            keep=int(os.getenv("PROFILING_KEEP", 20))
+        )
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether a request may use profiling."""
+        return self.enabled and token is not None and hmac.compare_digest(token.encode(), self.token.encode())
+
+    async def profile_request(self, app: ASGIApp, scope: Scope, receive: Receive, send: Send):
+        """
+        Run a request under cProfile and keep the profile.
+
+        Only one request is profiled at a time, since cProfile follows the
+        whole event-loop thread; a request arriving meanwhile is served
+        unprofiled with X-Profile-Status: busy.
+        """
+        if not self._request_lock.acquire(blocking=False):
+            await app(scope, receive, _with_headers(send, {"X-Profile-Status": "busy"}))
+            return
+
+        profile_id = uuid4().hex[:12]
+        timer = StageTimer()
+        profile = cProfile.Profile()
+        tokens = (rules.profiled_request.set(True), _request_timer.set(timer))
+        started = time.perf_counter()
+        _profile_started()
+        try:
+            profile.enable()
+            try:
+                await app(scope, receive, _with_headers(send, {"X-Profile-Id": profile_id}))
+            finally:
+                profile.disable()
+        finally:
+            _profile_finished()
+            _request_timer.reset(tokens[1])
+            rules.profiled_request.reset(tokens[0])
+            self._request_lock.release()
+
+        self.profiles[profile_id] = {
+            "id": profile_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "wall_ms": round((time.perf_counter() - started) * 1000, 3),
+            "profile": profile,
+            "stages": timer.summary()
+        }
+        while len(self.profiles) > self.keep:
+            self.profiles.popitem(last=False)
+
+    def request_profile(self, profile_id: str, output: str = "json") -> Optional[Any]:
+        """
+        A kept request profile.
+
+        Args:
+            profile_id: Id returned in X-Profile-Id
+            output: "json" for the breakdown and the top functions, "text"
+                for the pstats report sorted by cumulative time
+
+        Returns:
+            The profile, or None if it is unknown or no longer kept
+        """
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            return None
+        stream = io.StringIO()
+        stats = pstats.Stats(profile["profile"], stream=stream)
+        if output == "text":
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            return stream.getvalue()
+
+        functions = []
+        breakdown = {}
+        for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+            label = _frame_label(_Code(filename, name))
+            entry = {"function": label, "line": line, "calls": calls,
+                     "own_ms": round(own * 1000, 3), "cumulative_ms": round(cumulative * 1000, 3)}
+            functions.append(entry)
+            if label.startswith(BREAKDOWN_MODULES):
+                breakdown[label] = {"calls": calls, "ms": entry["cumulative_ms"]}
+        functions.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+        return {
+            "id": profile["id"],
+            "method": profile["method"],
+            "path": profile["path"],
+            "wall_ms": profile["wall_ms"],
+            "functions_breakdown": dict(sorted(breakdown.items(), key=lambda item: item[1]["ms"], reverse=True)),
+            **profile["stages"],
+            "top_functions": functions[:PROFILE_TOP_FUNCTIONS]
+        }
+
+    def sample(self, seconds: float, interval: float = 0.005) -> Dict[str, Any]:
+        """
+        Sample the stacks of every thread of the worker (blocking; run it in
+        a thread).
+
+        Args:
+            seconds: Sampling window, capped at max_seconds
+            interval: Seconds between samples
+
+        Returns:
+            Collapsed stack counts, the function and stage breakdowns and
+            the number of samples
+
+        Raises:
+            RuntimeError: If a sampling window is already running
+        """
+        global _window_timer
+        if not self._sampling_lock.acquire(blocking=False):
+            raise RuntimeError("A sampling profile is already running")
+        seconds = min(seconds, self.max_seconds)
+        stacks: Counter = Counter()
+        labels: Dict[Any, str] = {}
+        own_thread = threading.get_ident()
+        samples = 0
+
+        _window_timer = StageTimer()
+        _profile_started()
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_thread:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        label = labels.get(code)
+                        if label is None:
+                            label = labels[code] = _frame_label(code)
+                        stack.append(label)
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    stacks[";".join(reversed(stack))] += 1
+                samples += 1
+                time.sleep(interval)
+            timer = _window_timer
+        finally:
+            _window_timer = None
+            _profile_finished()
+            self._sampling_lock.release()
+
+        # Inclusive samples per analyzer and optimizer function (counted
+        # once per stack, so recursion is not counted twice)
+        breakdown: Counter = Counter()
+        for stack, count in stacks.items():
+            for label in set(stack.split(";")):
+                if label.startswith(BREAKDOWN_MODULES):
+                    breakdown[label] += count
+        return {
+            "seconds": seconds,
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "functions_breakdown": dict(breakdown.most_common()),
+            **timer.summary(),
+            "stacks": stacks
+        }
+
+class _Code:
+    """Filename and name of a pstats entry, shaped like a code object for _frame_label."""
+
+    __slots__ = ("co_filename", "co_name")
+
+    def __init__(self, filename: str, name: str):
+        self.co_filename = filename
+        self.co_name = name
+
+def collapsed_stacks(stacks: Counter) -> str:
+    """Collapsed stack lines ("frame;frame;frame count"), most frequent first."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+def _with_headers(send: Send, headers: Dict[str, str]) -> Send:
+    async def send_with_headers(message: Message):
+        if message["type"] == "http.response.start":
+            response_headers = MutableHeaders(scope=message)
+            for name, value in headers.items():
+                response_headers[name] = value
+        await send(message)
+    return send_with_headers
+
+class ProfilingMiddleware:
+    """Profile API requests sent with X-Profile: 1 and a valid admin token."""
+
+    def __init__(self, app: ASGIApp, profiler: Profiler, path_prefix: str = "/api/"):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application to wrap
+            profiler: Profiler keeping the request profiles
+            path_prefix: Paths that can be profiled
+        """
+        self.app = app
+        self.profiler = profiler
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"].startswith(self.path_prefix):
+            headers = Headers(scope=scope)
+            if headers.get("x-profile") == "1" and self.profiler.authorized(headers.get("x-admin-token")):
+                await self.profiler.profile_request(self.app, scope, receive, send)
+                return
+        await self.app(scope, receive, send)
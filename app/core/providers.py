@@ -0,0 +1,425 @@
+"""
+LLM provider registry module.
+
+This module describes the LLM providers the detailed analysis can call. Each
+provider declares its endpoint, how requests are built and responses read,
+its models and token limits, and how many calls it runs at once. Calls are
+scheduled per provider: at most max_concurrency run concurrently, further
+calls wait in a first-in-first-out queue of at most max_queue_size, and calls
+beyond that are rejected. A burst against one provider therefore never holds
+up calls to the others.
+
+Requests put their static instructions first, so providers can cache them as
+a prefix: Anthropic requests mark it with cache_control breakpoints, OpenAI
+and OpenRouter cache prefixes automatically. Token usage, including cached
+input tokens, is totalled per provider.
+
+Limits and default models can be overridden per provider with environment
+variables named after the provider, e.g. OPENAI_MAX_CONCURRENCY,
+OPENAI_MAX_QUEUE_SIZE, OPENAI_MAX_TOKENS, ANTHROPIC_DEFAULT_MODEL or
+OPENROUTER_BASE_URL.
+"""
+
+import os
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Token usage counters kept per provider; input_tokens includes cached tokens
+USAGE_KEYS = ("requests", "input_tokens", "output_tokens", "cached_tokens", "cache_write_tokens")
+
+class ProviderBusyError(Exception):
+    """Raised when a provider's queue is full."""
+
+class ProviderScheduler:
+    """
+    Bounded concurrency with a fair queue for one provider.
+
+    A released slot is handed directly to the longest-waiting call, so calls
+    run in arrival order and a new call cannot overtake queued ones.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_size: int):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency: Maximum number of calls running at once
+            max_queue_size: Maximum number of calls waiting for a slot
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        """Number of calls waiting for a slot."""
+        return len(self._waiters)
+
+    async def acquire(self):
+        """
+        Wait for a slot.
+
+        Raises:
+            ProviderBusyError: If all slots are taken and the queue is full
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue_size:
+            self.rejected += 1
+            raise ProviderBusyError("Provider queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation; pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self):
+        """Hand the slot to the next waiting call, or free it."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                # in_flight is unchanged: the slot moves to the waiter
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Context manager holding a slot for the duration of a call."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        """Current load of the scheduler."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue_size": self.max_queue_size,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected
+        }
+
+class Provider:
+    """
+    An LLM provider speaking the OpenAI chat completions format.
+
+    Subclasses override the request and response adapters for other wire
+    formats.
+    """
+
+    # Path of the completion endpoint, relative to the base URL
+    path = "/chat/completions"
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        default_model: str,
+        models: Optional[List[str]] = None,
+        max_tokens: int = 1000,
+        max_tokens_overrides: Optional[Dict[str, int]] = None,
+        context_window: int = 8192,
+        max_output_tokens: int = 4096,
+        max_concurrency: int = 4,
+        max_queue_size: int = 32,
+        temperature: float = 0.3,
+        prompt_caching: bool = True
+    ):
+        """
+        Initialize the provider.
+
+        Args:
+            name: Registry name; also the prefix of its environment variables
+            base_url: Public base URL, used unless {NAME}_BASE_URL is set
+            default_model: Model used when the target model names none
+            models: Known models (informational; other model names are passed through)
+            max_tokens: Completion token limit
+            max_tokens_overrides: Token limits for models whose name contains the key
+            context_window: Context window of the models in tokens, used to size packed requests
+            max_output_tokens: Completion token limit of packed requests
+            max_concurrency: Maximum number of calls running at once
+            max_queue_size: Maximum number of calls waiting for a slot
+            temperature: Sampling temperature of analysis calls
+            prompt_caching: Mark the static request prefix as cacheable where
+                the wire format needs it (prefix caching is automatic otherwise)
+        """
+        self.name = name
+        self.default_base_url = base_url
+        self.default_model = default_model
+        self.models = models or [default_model]
+        self.max_tokens = max_tokens
+        self.max_tokens_overrides = max_tokens_overrides or {}
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.prompt_caching = prompt_caching
+        self.scheduler = ProviderScheduler(max_concurrency, max_queue_size)
+        self.usage = {key: 0 for key in USAGE_KEYS}
+
+    @property
+    def env_prefix(self) -> str:
+        return self.name.upper()
+
+    @property
+    def base_url(self) -> str:
+        """Base URL without a trailing slash, read from {NAME}_BASE_URL on every call."""
+        return os.getenv(f"{self.env_prefix}_BASE_URL", self.default_base_url).rstrip("/")
+
+    @property
+    def url(self) -> str:
+        """URL of the completion endpoint."""
+        return self.base_url + self.path
+
+    def max_tokens_for(self, model: str) -> int:
+        """Completion token limit of a model."""
+        for fragment, limit in self.max_tokens_overrides.items():
+            if fragment in model:
+                return limit
+        return self.max_tokens
+
+    def build_headers(self, api_key: str) -> Dict[str, str]:
+        """Request headers."""
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, system_prompt: str, prompt: str, model: str,
+                      max_tokens: Optional[int] = None, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Request body.
+
+        Args:
+            system_prompt: System instructions
+            prompt: The variable part of the request
+            model: The model to call
+            max_tokens: Completion token limit (defaults to the model's)
+            prefix: Static instructions placed before the prompt, so that
+                the provider's automatic prefix caching can reuse them
+        """
+        return {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": (prefix or "") + prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": max_tokens or self.max_tokens_for(model)
+        }
+
+    def extract_content(self, result: Dict[str, Any]) -> Optional[str]:
+        """The generated text of a response body, or None if it has none."""
+        choices = result.get("choices")
+        if choices:
+            return choices[0]["message"]["content"]
+        return None
+
+    def extract_usage(self, result: Dict[str, Any]) -> Dict[str, int]:
+        """Token counts of a response body, by USAGE_KEYS."""
+        usage = result.get("usage") or {}
+        details = usage.get("prompt_tokens_details") or {}
+        return {
+            "input_tokens": usage.get("prompt_tokens") or 0,
+            "output_tokens": usage.get("completion_tokens") or 0,
+            "cached_tokens": details.get("cached_tokens") or 0,
+            "cache_write_tokens": details.get("cache_write_tokens") or 0
+        }
+
+    def record_usage(self, result: Dict[str, Any]) -> Dict[str, int]:
+        """Add a response's token counts to the provider's totals and return them."""
+        usage = self.extract_usage(result)
+        self.usage["requests"] += 1
+        for key, value in usage.items():
+            self.usage[key] += value
+        if usage["cached_tokens"]:
+            logger.info(f"{self.name} served {usage['cached_tokens']} of {usage['input_tokens']} input tokens from cache")
+        return usage
+
+class AnthropicProvider(Provider):
+    """An LLM provider speaking the Anthropic messages format."""
+
+    path = "/v1/messages"
+
+    def build_headers(self, api_key: str) -> Dict[str, str]:
+        return {
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, system_prompt: str, prompt: str, model: str,
+                      max_tokens: Optional[int] = None, prefix: Optional[str] = None) -> Dict[str, Any]:
+        # Cache breakpoints after the system prompt and after the static prefix
+        cache_control = {"cache_control": {"type": "ephemeral"}} if self.prompt_caching else {}
+        content = []
+        if prefix:
+            content.append({"type": "text", "text": prefix, **cache_control})
+        content.append({"type": "text", "text": prompt})
+        return {
+            "model": model,
+            "system": [{"type": "text", "text": system_prompt, **cache_control}],
+            "messages": [
+                {"role": "user", "content": content}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": max_tokens or self.max_tokens_for(model)
+        }
+
+    def extract_content(self, result: Dict[str, Any]) -> Optional[str]:
+        content = result.get("content")
+        if content:
+            return content[0]["text"]
+        return None
+
+    def extract_usage(self, result: Dict[str, Any]) -> Dict[str, int]:
+        usage = result.get("usage") or {}
+        cached = usage.get("cache_read_input_tokens") or 0
+        written = usage.get("cache_creation_input_tokens") or 0
+        # input_tokens only counts the tokens after the last cache breakpoint
+        return {
+            "input_tokens": (usage.get("input_tokens") or 0) + cached + written,
+            "output_tokens": usage.get("output_tokens") or 0,
+            "cached_tokens": cached,
+            "cache_write_tokens": written
+        }
+
+class ProviderRegistry:
+    """
+    Named providers and the routing of target models to them.
+
+    Target models resolve as follows:
+    - "openrouter" or "openrouter:<model>": OpenRouter
+    - "gpt*": OpenAI, with the target model as the model
+    - "claude" or "claude:<model>": Anthropic
+    - anything else ("general" included): OpenRouter's default model
+    """
+
+    def __init__(self, providers: Optional[List[Provider]] = None, fallback: str = "openrouter"):
+        """
+        Initialize the registry.
+
+        Args:
+            providers: Providers to register
+            fallback: Provider used for target models no rule matches
+        """
+        self.providers: Dict[str, Provider] = {}
+        self.fallback = fallback
+        for provider in providers or []:
+            self.register(provider)
+
+    @classmethod
+    def from_env(cls) -> "ProviderRegistry":
+        """Create the default providers, applying environment overrides."""
+        registry = cls([
+            Provider(
+                name="openrouter",
+                base_url="https://openrouter.ai/api/v1",
+                default_model="meta-llama/llama-3.3-8b-instruct:free",
+                max_tokens=1000,
+                # Free models get a higher limit
+                max_tokens_overrides={"free": 4000},
+                context_window=8192,
+                max_output_tokens=4000,
+                max_concurrency=4,
+                max_queue_size=32
+            ),
+            Provider(
+                name="openai",
+                base_url="https://api.openai.com/v1",
+                default_model="gpt-3.5-turbo",
+                models=["gpt-3.5-turbo", "gpt-4", "gpt-4o", "gpt-4o-mini"],
+                max_tokens=1000,
+                context_window=16385,
+                max_output_tokens=4096,
+                max_concurrency=8,
+                max_queue_size=64
+            ),
+            AnthropicProvider(
+                name="anthropic",
+                base_url="https://api.anthropic.com",
+                default_model="claude-2",
+                max_tokens=1000,
+                context_window=100000,
+                max_output_tokens=4096,
+                max_concurrency=4,
+                max_queue_size=32
+            )
+        ])
+        for provider in registry.providers.values():
+            prefix = provider.env_prefix
+            provider.default_model = os.getenv(f"{prefix}_DEFAULT_MODEL", provider.default_model)
+            provider.max_tokens = int(os.getenv(f"{prefix}_MAX_TOKENS", provider.max_tokens))
+            provider.context_window = int(os.getenv(f"{prefix}_CONTEXT_WINDOW", provider.context_window))
+            provider.max_output_tokens = int(os.getenv(f"{prefix}_MAX_OUTPUT_TOKENS", provider.max_output_tokens))
+            provider.prompt_caching = os.getenv(
+                f"{prefix}_PROMPT_CACHING", str(provider.prompt_caching)).lower() == "true"
+            provider.scheduler.max_concurrency = int(os.getenv(
+                f"{prefix}_MAX_CONCURRENCY", provider.scheduler.max_concurrency))
+            provider.scheduler.max_queue_size = int(os.getenv(
+                f"{prefix}_MAX_QUEUE_SIZE", provider.scheduler.max_queue_size))
+        return registry
+
+    def register(self, provider: Provider):
+        """Add or replace a provider."""
+        self.providers[provider.name] = provider
+
+    def get(self, name: str) -> Provider:
+        """Look up a provider by name."""
+        return self.providers[name]
+
+    def resolve(self, target_model: str) -> Tuple[Provider, str]:
+        """
+        Route a target model to a provider and model.
+
+        Args:
+            target_model: The target model of the analysis request
+
+        Returns:
+            The provider and the model to call
+        """
+        if target_model.startswith("openrouter"):
+            provider = self.get("openrouter")
+        elif target_model.startswith("gpt"):
+            provider = self.get("openai")
+            return provider, target_model
+        elif target_model == "claude" or target_model.startswith("claude:"):
+            provider = self.get("anthropic")
+        else:
+            provider = self.get(self.fallback)
+            return provider, provider.default_model
+
+        # "<provider>:<model>" names the model explicitly
+        if ":" in target_model:
+            return provider, target_model.split(":", 1)[1]
+        return provider, provider.default_model
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Scheduler load and token usage per provider."""
+        return {
+            name: {**provider.scheduler.stats(), "usage": dict(provider.usage)}
+            for name, provider in self.providers.items()
+        }
@@ -7,11 +7,13 @@ API requests within allowed limits.
 
 import time
 import asyncio
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Response
 from typing import Dict, List, Optional, Callable
 import threading
 from collections import deque
 
+from app.core.tracing import span
+
 class RateLimiter:
     """
     Queue-based rate limiter for API requests.
@@ -33,18 +35,46 @@ class RateLimiter:
         self.time_window = time_window
         self.max_queue_size = max_queue_size
         self.request_timestamps: deque = deque(maxlen=max_requests)
-        self.request_queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
         self.lock = threading.Lock()
         
-        # Start the queue processor
-        self.queue_task = asyncio.create_task(self._process_queue())
+        # The queue and its processor task need a running event loop, so they
+        # are created on the first request that has to wait
+        self.request_queue: Optional[asyncio.Queue] = None
+        self.queue_task: Optional[asyncio.Task] = None
+    
+    def _ensure_queue_processor(self):
+        """Create the request queue and start its processor if not running yet."""
+        if self.request_queue is None:
+            self.request_queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if self.queue_task is None or self.queue_task.done():
+            self.queue_task = asyncio.get_running_loop().create_task(self._process_queue())
     
-    async def limit(self):
+    async def limit(self, response: Response = None):
         """
         Rate limiting dependency for FastAPI endpoints.
         
         This method can be used as a dependency in FastAPI routes to
-        apply rate limiting.
+        apply rate limiting. Requests that had to wait in the queue get
+        an X-Queue-Wait-Ms header with the time they spent there.
+        
+        Args:
+            response: The response whose headers FastAPI merges (injected)
+        
+        Raises:
+            HTTPException: If rate limit is exceeded and queue is full
+        """
+        await self.acquire(1, response)
+    
+    async def acquire(self, cost: int = 1, response: Response = None):
+        """
+        Take cost tokens, waiting in the queue if they are not available.
+        
+        Used directly by endpoints whose cost depends on the request body,
+        such as batches charged per prompt.
+        
+        Args:
+            cost: Tokens to take (at most max_requests)
+            response: Response to add X-Queue-Wait-Ms to
         
         Raises:
             HTTPException: If rate limit is exceeded and queue is full
@@ -58,21 +88,27 @@ class RateLimiter:
                 self.request_timestamps.popleft()
             
             # If we're under the limit, allow the request immediately
-            if len(self.request_timestamps) < self.max_requests:
-                self.request_timestamps.append(current_time)
+            if len(self.request_timestamps) + cost <= self.max_requests:
+                self.request_timestamps.extend([current_time] * cost)
                 return
         
         # If we're over the limit, try to queue the request
+        self._ensure_queue_processor()
         try:
             # Create a future to wait on
             future = asyncio.Future()
-            await self.request_queue.put(future)
+            self.request_queue.put_nowait((future, cost))
+            queued_at = time.perf_counter()
             
             # Wait for our turn (when the future is resolved)
-            await future
+            with span("rate_limit", queued=self.request_queue.qsize()):
+                await future
+            
+            if response is not None:
+                response.headers["X-Queue-Wait-Ms"] = f"{(time.perf_counter() - queued_at) * 1000:.1f}"
             
         except asyncio.QueueFull:
-            # If the queue is full, reject the request
+            # If the queue is full, reject the request (instead of blocking on put)
             raise HTTPException(
                 status_code=429,
                 detail="Too many requests. Please try again later."
@@ -87,20 +123,22 @@ class RateLimiter:
         """
         while True:
             # Get the next request from the queue
-            future = await self.request_queue.get()
+            future, cost = await self.request_queue.get()
             
             # Wait until we can process a request
-            await self._wait_for_token()
+            await self._wait_for_token(cost)
             
             # Mark the future as done to unblock the waiting request
-            future.set_result(None)
+            # (unless the client gave up while it was queued)
+            if not future.done():
+                future.set_result(None)
             
             # Mark the task as done in the queue
             self.request_queue.task_done()
     
-    async def _wait_for_token(self):
+    async def _wait_for_token(self, cost: int = 1):
         """
-        Wait until a token is available in the rate limiter.
+        Wait until cost tokens are available in the rate limiter.
         """
         while True:
             current_time = time.time()
@@ -110,9 +148,9 @@ class RateLimiter:
                 while self.request_timestamps and self.request_timestamps[0] < current_time - self.time_window:
                     self.request_timestamps.popleft()
                 
-                # If we're under the limit, add a timestamp and return
-                if len(self.request_timestamps) < self.max_requests:
-                    self.request_timestamps.append(current_time)
+                # If we're under the limit, add the timestamps and return
+                if len(self.request_timestamps) + cost <= self.max_requests:
+                    self.request_timestamps.extend([current_time] * cost)
                     return
             
             # If we're still over the limit, wait a bit and try again
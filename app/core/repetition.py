@@ -0,0 +1,214 @@
+"""
+Repeated passage detection module.
+
+This module finds the passages of a prompt that repeat earlier text: an
+instruction block pasted twice, or the same sentence written in several
+places. Such repeats are most of what inflates long prompts, and a
+unique-word ratio does not locate them.
+
+Two detectors share the lowercased words of the prompt. Phrases of at least
+MIN_PHRASE_WORDS words that occurred earlier are found by hashing every
+window of that many words; sentences and lines of at least
+MIN_SENTENCE_WORDS words that occurred earlier by hashing each of them
+whole. Both take time linear in the prompt length, and a prompt without
+repeats costs a split and two set builds, all in C.
+"""
+
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.core.packing import estimate_tokens
+
+# Shortest repeated phrase reported, in words
+MIN_PHRASE_WORDS = 8
+
+# Shortest repeated sentence reported, in words
+MIN_SENTENCE_WORDS = 4
+
+_WORDS = re.compile(r"\S+")
+_SENTENCE_END = (".", "!", "?")
+
+class RepeatedSpan:
+    """
+    A passage that repeats earlier text.
+
+    Attributes:
+        start: Offset of the passage in the prompt
+        end: Offset just past the passage
+        first_start: Offset of the earlier text it repeats
+        words: Words in the passage
+        tokens: Estimated tokens the passage wastes
+        cut: (start, end) of the whole sentences the passage covers, which
+            can be removed without leaving part of a sentence behind, or
+            None if it covers no whole sentence
+    """
+
+    __slots__ = ("start", "end", "first_start", "words", "tokens", "cut")
+
+    def __init__(self, start: int, end: int, first_start: int, words: int, tokens: int,
+                 cut: Optional[Tuple[int, int]]):
+        self.start = start
+        self.end = end
+        self.first_start = first_start
+        self.words = words
+        self.tokens = tokens
+        self.cut = cut
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "start": self.start,
+            "end": self.end,
+            "first_start": self.first_start,
+            "words": self.words,
+            "tokens": self.tokens
+        }
+
+def find_repeats(
+    prompt_text: str,
+    min_phrase_words: int = MIN_PHRASE_WORDS,
+    min_sentence_words: int = MIN_SENTENCE_WORDS
+) -> List[RepeatedSpan]:
+    """
+    Find the passages of a prompt that repeat earlier text.
+
+    The first occurrence of a passage is kept; each later occurrence is
+    reported. Overlapping and adjacent repeats are merged into one span.
+
+    Args:
+        prompt_text: The prompt text
+        min_phrase_words: Shortest repeated phrase, in words
+        min_sentence_words: Shortest repeated sentence, in words
+
+    Returns:
+        The repeated spans, in prompt order
+    """
+    # Words, and sentences and lines as (first word, end word) pairs
+    words: List[str] = []
+    sentences: List[Tuple[int, int]] = []
+    for line in prompt_text.lower().split("\n"):
+        sentence_start = len(words)
+        words.extend(line.split())
+        for index in range(sentence_start, len(words)):
+            if words[index].endswith(_SENTENCE_END):
+                sentences.append((sentence_start, index + 1))
+                sentence_start = index + 1
+        if sentence_start < len(words):
+            sentences.append((sentence_start, len(words)))
+    count = len(words)
+
+    # Earlier word each repeated word copies (-1 where it is not repeated)
+    source = [-1] * count
+
+    def mark(start: int, earlier: int, length: int):
+        for offset in range(length):
+            if source[start + offset] < 0:
+                source[start + offset] = earlier + offset
+
+    # Phrases: hash every window of min_phrase_words words, keeping the
+    # first window with each hash. A later window with the same words that
+    # does not overlap it repeats it. Windows are hashed as tuples of the
+    # (hash-cached) words, which CPython does faster than a rolling hash
+    # updated in Python, and a set of the hashes skips the loop for prompts
+    # without repeats. Marking skips words already marked, so the pass
+    # stays linear.
+    window = min_phrase_words
+    found = False
+    if count >= 2 * window:
+        hashes = list(map(hash, zip(*(words[offset:] for offset in range(window)))))
+        if len(set(hashes)) < len(hashes):
+            first: Dict[int, int] = {}
+            marked_end = 0
+            for start, key in enumerate(hashes):
+                earlier = first.setdefault(key, start)
+                if earlier + window <= start and words[earlier:earlier + window] == words[start:start + window]:
+                    skip = max(0, marked_end - start)
+                    mark(start + skip, earlier + skip, window - skip)
+                    marked_end = start + window
+                    found = True
+
+    # Sentences and lines, ended by .!? or a line break
+    keys = [(tuple(words[start:end]), start, end) for start, end in sentences if end - start >= min_sentence_words]
+    if len({key for key, _, _ in keys}) < len(keys):
+        seen: Dict[Tuple[str, ...], int] = {}
+        for key, start, end in keys:
+            earlier = seen.setdefault(key, start)
+            if earlier != start:
+                mark(start, earlier, end - start)
+                found = True
+    if not found:
+        return []
+
+    # Offsets of the words (the same whitespace-separated words as above)
+    starts, ends = [], []
+    for match in _WORDS.finditer(prompt_text):
+        starts.append(match.start())
+        ends.append(match.end())
+
+    # Whole sentences each word belongs to, for the cuts
+    sentence_of = [0] * count
+    for number, (start, end) in enumerate(sentences):
+        for index in range(start, end):
+            sentence_of[index] = number
+
+    spans = []
+    index = 0
+    while index < count:
+        if source[index] < 0:
+            index += 1
+            continue
+        first_word = index
+        while index < count and source[index] >= 0:
+            index += 1
+        last_word = index - 1
+        start, end = starts[first_word], ends[last_word]
+
+        # Snap inward to sentence boundaries
+        first_sentence = sentence_of[first_word]
+        if sentences[first_sentence][0] != first_word:
+            first_sentence += 1
+        last_sentence = sentence_of[last_word]
+        if sentences[last_sentence][1] != last_word + 1:
+            last_sentence -= 1
+        cut = None
+        if first_sentence <= last_sentence:
+            cut = (starts[sentences[first_sentence][0]], ends[sentences[last_sentence][1] - 1])
+
+        spans.append(RepeatedSpan(
+            start, end, starts[source[first_word]], last_word - first_word + 1,
+            estimate_tokens(prompt_text[start:end]), cut
+        ))
+    return spans
+
+def remove_repeats(prompt_text: str, spans: Optional[List[RepeatedSpan]] = None) -> str:
+    """
+    Remove the repeated sentences of a prompt.
+
+    Only whole sentences are removed, together with the whitespace that
+    follows them, so the remaining text still reads as written.
+
+    Args:
+        prompt_text: The prompt text
+        spans: Spans found by find_repeats (found here if not given)
+
+    Returns:
+        The prompt without its repeated sentences
+    """
+    if spans is None:
+        spans = find_repeats(prompt_text)
+    parts = []
+    position = 0
+    for repeated in spans:
+        if repeated.cut is None:
+            continue
+        start, end = repeated.cut
+        # Take the whitespace after the sentences with them, or the
+        # whitespace before them at the end of the prompt
+        while end < len(prompt_text) and prompt_text[end].isspace():
+            end += 1
+        if end == len(prompt_text):
+            while start > position and prompt_text[start - 1].isspace():
+                start -= 1
+        parts.append(prompt_text[position:start])
+        position = end
+    parts.append(prompt_text[position:])
+    return "".join(parts)
@@ -0,0 +1,410 @@
+"""
+Request tracing module.
+
+This module times the stages of a request with lightweight spans. The
+middleware decides at the start of each request whether it is traced (head
+sampling, or the sampled flag of an incoming W3C traceparent header); spans
+opened anywhere below it with span() are recorded on that request's trace,
+which is found through a context variable, so it follows the request through
+awaits, dependencies and tasks it starts without being passed around.
+
+Traced requests get a Server-Timing header with the time spent in each stage
+and their trace is handed to an exporter after the response is sent; other
+requests only get their total time. Opening a span on an untraced request
+costs a context variable lookup.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import logging
+import importlib
+import threading
+from uuid import uuid4
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logs import request_id_var
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class Span:
+    """A timed stage of a request."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any], start: Optional[float] = None):
+        self.name = name
+        self.span_id = uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    def set(self, **attributes: Any):
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+class _NoopSpan:
+    """Stands in for a span on untraced requests."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes: Any):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """The spans recorded for one request."""
+
+    __slots__ = ("trace_id", "root", "spans")
+
+    def __init__(self, trace_id: str, root: Span):
+        self.trace_id = trace_id
+        self.root = root
+        self.spans: List[Span] = []
+
+    def server_timing(self) -> str:
+        """Time per stage (summed over spans of the same name) as a Server-Timing value."""
+        totals: Dict[str, float] = {}
+        for recorded in self.spans:
+            totals[recorded.name] = totals.get(recorded.name, 0.0) + (recorded.end - recorded.start)
+        totals["total"] = time.perf_counter() - self.root.start
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+    def to_dict(self, wall_start: float) -> Dict[str, Any]:
+        """The trace as an export record, with span times relative to the request start."""
+        origin = self.root.start
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.root.span_id,
+            "start": wall_start,
+            "duration_ms": round((self.root.end - origin) * 1000, 3),
+            **self.root.attributes,
+            "spans": [
+                {
+                    "name": recorded.name,
+                    "span_id": recorded.span_id,
+                    "parent_id": recorded.parent_id,
+                    "start_ms": round((recorded.start - origin) * 1000, 3),
+                    "duration_ms": round((recorded.end - recorded.start) * 1000, 3),
+                    **recorded.attributes
+                }
+                for recorded in self.spans
+            ]
+        }
+
+# Trace of the request being handled (None when it is not traced) and the
+# innermost open span
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+class _SpanContext:
+    """Opens a span on a traced request and records it when closed."""
+
+    __slots__ = ("trace", "span", "token")
+
+    def __init__(self, trace: Trace, name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.trace = trace
+        self.span = Span(name, parent.span_id if parent is not None else trace.root.span_id, attributes)
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.end = time.perf_counter()
+        _current_span.reset(self.token)
+        self.trace.spans.append(self.span)
+        return False
+
+def span(name: str, **attributes: Any):
+    """
+    Time a stage of the current request.
+
+    Use as a context manager; it does nothing when the request is not
+    traced. Spans nest: a span opened inside another one, including in a
+    task started inside it, is its child.
+
+    Args:
+        name: Stage name, also used in Server-Timing (a token, e.g. "rules")
+        **attributes: Values recorded with the span
+
+    Returns:
+        A context manager yielding the span, whose set() adds attributes
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _SpanContext(trace, name, attributes)
+
+def record_span(name: str, start: float, end: Optional[float] = None, **attributes: Any):
+    """
+    Record a stage timed elsewhere (e.g. by client library callbacks).
+
+    Args:
+        name: Stage name
+        start: perf_counter() at the start of the stage
+        end: perf_counter() at its end (default: now)
+        **attributes: Values recorded with the span
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    recorded = Span(name, parent.span_id if parent is not None else trace.root.span_id, attributes, start)
+    recorded.end = time.perf_counter() if end is None else end
+    trace.spans.append(recorded)
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple]:
+    """
+    Read a W3C traceparent header.
+
+    Returns:
+        (trace_id, parent_id, sampled), or None if the header is missing or
+        malformed
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+class TraceExporter:
+    """
+    Receives finished traces.
+
+    Subclasses override export; it is called on the event loop after the
+    response is sent, so it should hand the trace off rather than do I/O.
+    """
+
+    def export(self, trace: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self):
+        """Flush pending traces."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class JsonLinesExporter(TraceExporter):
+    """Append traces as JSON lines to a file from a background thread."""
+
+    def __init__(self, path: str, max_queue_size: int = 10000):
+        """
+        Initialize the exporter.
+
+        Args:
+            path: File the traces are appended to
+            max_queue_size: Traces waiting to be written before new ones
+                are dropped
+        """
+        self.path = path
+        self.exported = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(max_queue_size)
+        self._thread = threading.Thread(target=self._write, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        with open(self.path, "a", encoding="utf-8") as output:
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    return
+                output.write(json.dumps(trace, default=str) + "\n")
+                self.exported += 1
+                # Flush once the backlog is written, not after every trace
+                if self._queue.empty():
+                    output.flush()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "exported": self.exported, "dropped": self.dropped}
+
+def load_exporter(spec: str, path: str = "traces.jsonl") -> Optional[TraceExporter]:
+    """
+    Create the exporter named by TRACE_EXPORTER.
+
+    Args:
+        spec: "none", "jsonl", or "package.module:factory" for a custom
+            exporter created by calling factory()
+        path: File used by the jsonl exporter
+
+    Returns:
+        The exporter, or None when traces are not exported
+    """
+    if not spec or spec == "none":
+        return None
+    if spec == "jsonl":
+        return JsonLinesExporter(path)
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise ValueError(f"Unknown trace exporter: {spec}")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+class Tracer:
+    """Sampling decision and export for request traces."""
+
+    def __init__(self, sample_rate: float = 0.1, exporter: Optional[TraceExporter] = None):
+        """
+        Initialize the tracer.
+
+        Args:
+            sample_rate: Fraction of requests without a traceparent header
+                that are traced
+            exporter: Where finished traces go (None: Server-Timing only)
+        """
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.traced = 0
+        self.export_errors = 0
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Create a tracer from environment variables."""
+        return cls(
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", 0.1)),
+            exporter=load_exporter(
+                os.getenv("TRACE_EXPORTER", "none"),
+                os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+            )
+        )
+
+    def sample(self, traceparent: Optional[str]) -> Optional[str]:
+        """
+        Decide whether a request is traced.
+
+        A valid traceparent header decides for the request (its trace id is
+        kept); otherwise the sample rate does.
+
+        Returns:
+            The trace id if the request is traced, else None
+        """
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            return parent[0] if parent[2] else None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return uuid4().hex
+        return None
+
+    def export(self, trace: Trace, wall_start: float):
+        self.traced += 1
+        if self.exporter is None:
+            return
+        try:
+            self.exporter.export(trace.to_dict(wall_start))
+        except Exception:
+            self.export_errors += 1
+            logger.exception("Trace export failed")
+
+    def close(self):
+        """Flush the exporter."""
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Sample rate and how many traces were recorded and exported."""
+        return {
+            "sample_rate": self.sample_rate,
+            "traced": self.traced,
+            "export_errors": self.export_errors,
+            "exporter": self.exporter.stats() if self.exporter is not None else None
+        }
+
+class TracingMiddleware:
+    """
+    Trace sampled requests and add Server-Timing to responses.
+
+    Traced responses list the time of every stage and the total; untraced
+    ones only the total.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer, path_prefix: str = "/api/"):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application to wrap
+            tracer: Sampling decision and export
+            path_prefix: Paths that are traced and timed
+        """
+        self.app = app
+        self.tracer = tracer
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        trace_id = self.tracer.sample(Headers(scope=scope).get("traceparent"))
+        if trace_id is None:
+            async def send_with_total(message: Message):
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", f"total;dur={(time.perf_counter() - start) * 1000:.1f}"
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_with_total)
+            return
+
+        wall_start = time.time()
+        root = Span("request", None, {
+            "method": scope["method"],
+            "path": scope["path"],
+            "request_id": request_id_var.get()
+        }, start)
+        trace = Trace(trace_id, root)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                root.attributes["status"] = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            root.end = time.perf_counter()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self.tracer.export(trace, wall_start)
@@ -1,42 +1,138 @@
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import HTMLResponse
-import uvicorn
+import asyncio
 import os
 from dotenv import load_dotenv
 
+# Load environment variables (before the routers read their configuration)
+load_dotenv()
+
+# Configure logging before anything logs: records are written by a background
+# thread, sampled and redacted according to the LOG_* settings
+from app.core.logs import LogPipeline, RequestIdMiddleware
+log_pipeline = LogPipeline.from_env()
+log_pipeline.start()
+
 # Import routers
-from app.api.prompt_analysis import router as prompt_router
+from app.api.prompt_analysis import router as prompt_router, history_store, near_duplicate_index, analysis_executor, load_monitor
+from app.core.assets import get_asset_manifest, render_page
+from app.core.compression import CompressionMiddleware
+from app.core.admission import AdmissionMiddleware
+from app.core.tracing import Tracer, TracingMiddleware
 
-# Load environment variables
-load_dotenv()
+# Profiling and its admin endpoints are only imported when enabled; otherwise
+# /api/admin/* is not mounted and answers 404
+profiling_enabled = os.getenv("PROFILING_ENABLED", "False").lower() in ("true", "1", "yes")
+if profiling_enabled:
+    from app.core.profiling import ProfilingMiddleware
+    from app.api.admin import router as admin_router, profiler
+
+# Samples requests for tracing and exports their traces
+tracer = Tracer.from_env()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the near-duplicate index from stored LLM analyses in the background,
+    # so the server accepts requests immediately (lookups miss until it is done)
+    if near_duplicate_index is not None and history_store is not None:
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, near_duplicate_index.rebuild_from_history, history_store)
+
+    # Fingerprint and pre-compress static assets in the background as well
+    asyncio.get_running_loop().run_in_executor(None, get_asset_manifest)
+
+    # Sample event-loop lag for admission control
+    load_monitor.start()
+
+    yield
+
+    await load_monitor.stop()
+
+    # Flush queued history records on shutdown
+    if history_store is not None:
+        await history_store.close()
+    
+    analysis_executor.shutdown()
+    
+    # Write the remaining traces
+    tracer.close()
+    
+    # Write the remaining log records
+    log_pipeline.stop()
 
 # Create FastAPI app
 app = FastAPI(
     title="Prompt Inspector and Optimizer",
     description="A tool to analyze and optimize prompts for AI models",
     version="0.1.0",
+    lifespan=lifespan,
+)
+
+# Compress API responses according to Accept-Encoding
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+    level=int(os.getenv("COMPRESSION_LEVEL", 6))
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Limit request bodies and shed analysis requests when overloaded
+# (added last, so it runs before compression and the routers)
+app.add_middleware(
+    AdmissionMiddleware,
+    monitor=load_monitor,
+    max_body_bytes=int(os.getenv("MAX_REQUEST_BODY_BYTES", 4 * 1024 * 1024))
+)
+
+# Profile requests sent with X-Profile: 1 and the admin token (only installed
+# when profiling is enabled, so it costs nothing otherwise)
+if profiling_enabled and profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
 
-# Set up templates
-templates = Jinja2Templates(directory="templates")
+# Time the stages of sampled requests and add Server-Timing (inside the
+# request id middleware, so traces carry the request id)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Tag each request with an id that its log records carry (added last, so it
+# is the outermost middleware and covers shed and rejected requests too)
+app.add_middleware(RequestIdMiddleware)
 
 # Include routers
 app.include_router(prompt_router, prefix="/api")
+if profiling_enabled:
+    app.include_router(admin_router, prefix="/api/admin")
 
-# Root route
+# Root route; the page is rendered once per asset version
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return render_page("index.html").response(
+        request.headers.get("accept-encoding"),
+        request.headers.get("if-none-match")
+    )
+
+# Static files, served pre-compressed from memory
+@app.get("/static/{path:path}", include_in_schema=False)
+async def static_files(path: str, request: Request):
+    response = get_asset_manifest().response(
+        path,
+        request.headers.get("accept-encoding"),
+        request.headers.get("if-none-match")
+    )
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
 
-# Health check
+# Health check, with the event loop's and the analysis pool's load
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "load": load_monitor.stats(),
+        "analysis_pool": analysis_executor.stats(),
+        "logging": log_pipeline.stats(),
+        "tracing": tracer.stats()
+    }
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,80 @@
+"""
+Throughput and equivalence benchmark for the NumPy batch scoring engine.
+
+Scores the generated rule corpus (see benchmarks.rules_speed) with the
+scalar path (analyze_prompt_rules without its cache, plus the overall and
+weighted overall scores) and with app.core.batch.score_batch, checks that
+every score, strength, weakness and overall score is identical, and reports
+prompts per second for both.
+
+Exits with status 1 if any result differs.
+
+Usage:
+    python -m benchmarks.batch_scoring [--count 20000] [--batch-size 1000]
+"""
+
+import sys
+import time
+import argparse
+from typing import Any, Dict, List
+
+from app.core.analyzer import calculate_overall_score, calculate_weighted_overall_score
+from app.core.batch import score_batch
+from app.core.rules import get_rule_set
+from benchmarks.rules_speed import build_corpus
+
+def scalar_path(corpus: List[str]) -> List[Dict[str, Any]]:
+    """Score every prompt one at a time."""
+    rule_set = get_rule_set()
+    results = []
+    for prompt_text in corpus:
+        analysis = rule_set.analyze(prompt_text)
+        scores = analysis["dimension_scores"]
+        analysis["overall_score"] = calculate_overall_score(scores)
+        analysis["weighted_score"] = calculate_weighted_overall_score(scores)
+        results.append(analysis)
+    return results
+
+def batch_path(corpus: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    """Score the corpus in batches with the vectorized engine."""
+    results = []
+    for start in range(0, len(corpus), batch_size):
+        batch = score_batch(corpus[start:start + batch_size])
+        for index, analysis in enumerate(batch.analyses()):
+            analysis["overall_score"] = float(batch.overall_scores[index])
+            analysis["weighted_score"] = float(batch.weighted_scores[index])
+            results.append(analysis)
+    return results
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000, help="Number of generated prompts")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Prompts per batch")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.count)
+
+    # Warm up both paths so imports and regex compilation are not timed
+    scalar_path(corpus[:10])
+    batch_path(corpus[:10], args.batch_size)
+
+    scalar, scalar_time = timed(scalar_path, corpus)
+    batch, batch_time = timed(batch_path, corpus, args.batch_size)
+
+    mismatches = sum(1 for expected, actual in zip(scalar, batch) if expected != actual)
+
+    print(f"{len(corpus)} prompts, batch size {args.batch_size}")
+    print(f"{'':<8} {'total (s)':>10} {'prompts/sec':>12}")
+    for name, elapsed in (("scalar", scalar_time), ("batch", batch_time)):
+        print(f"{name:<8} {elapsed:>10.3f} {len(corpus) / elapsed:>12.0f}")
+    print(f"speedup: {scalar_time / batch_time:.2f}x, mismatches: {mismatches}")
+
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Cold start benchmark.
+
+Measures, in fresh interpreter processes:
+
+- import time of app.main, of which FastAPI's own import, and that heavy or
+  optional modules (aiohttp, Jinja2, the LLM analyzer, NumPy, and profiling
+  while PROFILING_ENABLED is off) are not loaded by it
+- time to first response: from spawning a uvicorn server until /health
+  answers, and until the first /api/analyze request completes
+
+Exits with status 1 if a heavy module is imported eagerly or a median
+exceeds its budget, so it can gate CI.
+
+Usage:
+    python -m benchmarks.cold_start [--runs 5] [--import-budget-ms 1000] [--first-response-budget-ms 3000]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import http.client
+from typing import Dict, List, Optional, Tuple
+
+# Modules that must only be imported when first needed
+LAZY_MODULES = ["aiohttp", "jinja2", "app.core.llm_analyzer", "numpy", "app.core.profiling", "app.api.admin"]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import fastapi
+framework = (time.perf_counter() - start) * 1000
+import app.main
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"import_ms": elapsed, "fastapi_ms": framework,
+                  "loaded": [name for name in %r if name in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+def _environment(tmpdir: str) -> Dict[str, str]:
+    """Environment for child processes; keeps history out of the project."""
+    env = dict(os.environ)
+    env["HISTORY_DB_PATH"] = os.path.join(tmpdir, "history.db")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    env["PROFILING_ENABLED"] = "False"
+    return env
+
+def measure_import(env: Dict[str, str]) -> Dict[str, object]:
+    """Import app.main in a fresh interpreter and report time and loaded modules."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _request(port: int, method: str, path: str, body: Optional[dict] = None) -> Optional[int]:
+    """Send one request and return the status, or None if the server is not up."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+def measure_first_response(env: Dict[str, str], timeout: float = 30.0) -> Tuple[float, float]:
+    """
+    Start a server and time its first responses.
+
+    Returns:
+        Milliseconds from spawn until /health answered and until the first
+        /api/analyze request completed
+    """
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while _request(port, "GET", "/health") != 200:
+            if server.poll() is not None or time.perf_counter() - start > timeout:
+                raise RuntimeError("Server did not start")
+            time.sleep(0.005)
+        health_ms = (time.perf_counter() - start) * 1000
+
+        status = _request(port, "POST", "/api/analyze", {"prompt_text": "Explain how photosynthesis works."})
+        if status != 200:
+            raise RuntimeError(f"/api/analyze returned {status}")
+        analyze_ms = (time.perf_counter() - start) * 1000
+        return health_ms, analyze_ms
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--import-budget-ms", type=float, default=1000.0,
+                        help="Maximum median import time of app.main")
+    parser.add_argument("--first-response-budget-ms", type=float, default=3000.0,
+                        help="Maximum median time from spawn to the first /api/analyze response")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = _environment(tmpdir)
+
+        imports = [measure_import(env) for _ in range(args.runs)]
+        import_ms = statistics.median(run["import_ms"] for run in imports)
+        fastapi_ms = statistics.median(run["fastapi_ms"] for run in imports)
+        loaded = sorted({name for run in imports for name in run["loaded"]})
+
+        responses = [measure_first_response(env) for _ in range(args.runs)]
+        health_ms = statistics.median(health for health, _ in responses)
+        analyze_ms = statistics.median(analyze for _, analyze in responses)
+
+    print(f"Median of {args.runs} fresh processes:")
+    print(f"  import app.main:              {import_ms:8.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"    of which FastAPI itself:    {fastapi_ms:8.1f} ms")
+    print(f"  spawn to /health:             {health_ms:8.1f} ms")
+    print(f"  spawn to first /api/analyze:  {analyze_ms:8.1f} ms (budget {args.first_response_budget_ms:.0f} ms)")
+    print(f"  eagerly imported lazy modules: {', '.join(loaded) or 'none'}")
+
+    if loaded:
+        failures.append(f"modules imported at startup: {', '.join(loaded)}")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import time {import_ms:.1f} ms over budget")
+    if analyze_ms > args.first_response_budget_ms:
+        failures.append(f"first response {analyze_ms:.1f} ms over budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Memory benchmark for the compact analysis representation.
+
+Builds the same set of analysis results twice, once as the API-shaped nested
+dictionaries and once as CompactAnalysis records, and reports the retained
+memory per result (measured with tracemalloc) and the serialized size per
+result (JSON vs CompactAnalysis.to_bytes).
+
+It also checks that the suggestion templates of every supported format
+version still generate what they did when the version was recorded
+(TEMPLATE_DIGESTS). Stored records rebuild their suggestions from the
+templates, so a template change without a FORMAT_VERSION bump would change
+what old records decode to. Exits with status 1 if a digest differs.
+
+Usage:
+    python -m benchmarks.compact_memory [--count 20000]
+"""
+
+import sys
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app.core.analyzer import analyze_prompt_rules
+from app.core.compact import FORMAT_VERSION, TEMPLATE_DIGESTS, CompactAnalysis, template_digest
+from app.core.optimizer import generate_optimization_suggestions
+
+SAMPLE_PROMPTS = [
+    "Tell me about AI",
+    "Explain how photosynthesis works for a high school audience in 200 words.",
+    "You are an expert data scientist. Analyze the attached sales data and list "
+    "the 3 most important trends. Think step by step and format the output as a table.",
+    "Context: we are a small startup building a mobile app for dog owners. "
+    "Please write 5 catchy taglines. Do not use puns. For example, 'Walk smarter'.",
+    "Summarize this article:\n\n- point one\n- point two\n- point three\n\n"
+    "Keep it under 100 words and avoid jargon.",
+]
+
+def build_responses(count: int) -> List[Dict[str, Any]]:
+    """Build API-shaped responses for count prompts."""
+    responses = []
+    for index in range(count):
+        # Make every prompt a distinct string, as it would be in real history
+        prompt_text = f"{SAMPLE_PROMPTS[index % len(SAMPLE_PROMPTS)]} (request {index})"
+        analysis = analyze_prompt_rules(prompt_text)
+        suggestions = generate_optimization_suggestions(prompt_text, analysis)
+        scores = analysis["dimension_scores"]
+        responses.append({
+            "prompt_text": prompt_text,
+            "response": {
+                "scores": scores,
+                "overall_score": sum(scores.values()) / len(scores) * 5,
+                "suggestions": suggestions,
+                "strengths": analysis["strengths"],
+                "weaknesses": analysis["weaknesses"],
+                "optimized_prompt": prompt_text
+            }
+        })
+    return responses
+
+def measure(build: Callable[[], List[Any]]) -> int:
+    """Return the bytes retained by the objects build() returns."""
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare dict vs compact analysis memory usage")
+    parser.add_argument("--count", type=int, default=20000, help="Number of analysis results to build")
+    args = parser.parse_args()
+
+    # Round-trip JSON so the dict results own their strings, like stored rows do
+    payload = json.dumps(build_responses(args.count))
+    prompts = [item["prompt_text"] for item in json.loads(payload)]
+
+    dict_bytes = measure(lambda: [item["response"] for item in json.loads(payload)])
+
+    def build_compact():
+        items = json.loads(payload)
+        compact = [
+            CompactAnalysis.from_response(item["response"], item["prompt_text"])
+            for item in items
+        ]
+        del items
+        gc.collect()
+        return compact
+
+    # The prompt text is retained by both representations: the dicts hold it
+    # inside optimized_prompt and the implementations, the records hold it once
+    compact_bytes = measure(build_compact)
+
+    sample = json.loads(payload)
+    json_size = sum(len(json.dumps(item["response"]).encode("utf-8")) for item in sample)
+    binary_size = sum(
+        len(CompactAnalysis.from_response(item["response"], item["prompt_text"]).to_bytes())
+        for item in sample
+    )
+
+    count = len(prompts)
+    print(f"Results:                 {count}")
+    print(f"In-memory dict:          {dict_bytes / count:8.0f} bytes/result")
+    print(f"In-memory compact:       {compact_bytes / count:8.0f} bytes/result "
+          f"({dict_bytes / compact_bytes:.1f}x smaller)")
+    print(f"Serialized JSON:         {json_size / count:8.0f} bytes/result")
+    print(f"Serialized compact:      {binary_size / count:8.0f} bytes/result "
+          f"({json_size / binary_size:.1f}x smaller)")
+
+    changed = [version for version, digest in TEMPLATE_DIGESTS.items() if template_digest(version) != digest]
+    print(f"Template digests:        {len(TEMPLATE_DIGESTS) - len(changed)} of {len(TEMPLATE_DIGESTS)} "
+          f"format versions unchanged")
+    if changed:
+        print(f"FAIL: suggestion templates of format version(s) {', '.join(map(str, changed))} changed; "
+              f"bump FORMAT_VERSION (now {FORMAT_VERSION}) and keep the old output in _LEGACY_BUILDERS",
+              file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Speed and equivalence benchmark for prompt comparison.
+
+Builds a prompt of about --size characters from the rule corpus fragments
+and a revision of it with --edits scattered line edits, then compares
+app.core.compare.compare_prompts against the naive way: two independent
+rule analyses (with the rule-analysis cache bypassed) plus a difflib line
+diff, and against what two /api/analyze calls compute (rule analyses and
+suggestions). Checks that the compared scores equal the independent
+analyses'.
+
+Exits with status 1 if any score differs.
+
+Usage:
+    python -m benchmarks.compare_speed [--size 100000] [--edits 5] [--repeat 20]
+"""
+
+import gc
+import sys
+import time
+import random
+import difflib
+import argparse
+from typing import Callable, List, Tuple
+
+from app.core.compare import compare_prompts
+from app.core.optimizer import generate_optimization_suggestions
+from app.core.rules import get_rule_set
+from benchmarks.rules_speed import FRAGMENTS
+
+def build_versions(size: int, edits: int, seed: int = 7) -> Tuple[str, str]:
+    """Build a prompt of about size characters and a revision with edits line edits."""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(4, 20))) + rng.choice([".", "?", "", ":"])
+        lines.append(line)
+        length += len(line) + 1
+
+    revised = list(lines)
+    for _ in range(edits):
+        index = rng.randrange(len(revised))
+        action = rng.choice(["insert", "replace", "delete"])
+        if action == "insert":
+            revised.insert(index, "Act as an expert and think step by step.")
+        elif action == "replace":
+            revised[index] = revised[index].replace(" ", " very ", 1)
+        else:
+            del revised[index]
+    return "\n".join(lines), "\n".join(revised)
+
+def naive_compare(before: str, after: str):
+    """Analyze both versions independently and diff them with difflib."""
+    rule_set = get_rule_set()
+    return (
+        rule_set.analyze(before),
+        rule_set.analyze(after),
+        list(difflib.SequenceMatcher(None, before.split("\n"), after.split("\n"), autojunk=False).get_opcodes())
+    )
+
+def analyze_twice(before: str, after: str):
+    """Analyze both versions the way /api/analyze does, suggestions included."""
+    rule_set = get_rule_set()
+    results = []
+    for text in (before, after):
+        analysis = rule_set.analyze(text)
+        results.append((analysis, generate_optimization_suggestions(text, analysis)))
+    return results
+
+def best_time(function: Callable, repeat: int, *args) -> float:
+    """Best of repeat runs, in milliseconds, with the garbage collector paused."""
+    times = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(*args)
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(times) * 1000
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000, help="Prompt size in characters")
+    parser.add_argument("--edits", type=int, default=5, help="Line edits in the revision")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    before, after = build_versions(args.size, args.edits)
+    rule_set = get_rule_set()
+
+    result = compare_prompts(before, after)
+    mismatches = sum(
+        1 for version, text in (("before", before), ("after", after))
+        if result[version]["scores"] != rule_set.analyze(text)["dimension_scores"]
+    )
+
+    single = best_time(rule_set.analyze, args.repeat, after)
+    naive = best_time(naive_compare, args.repeat, before, after)
+    requests = best_time(analyze_twice, args.repeat, before, after)
+    compared = best_time(compare_prompts, args.repeat, before, after)
+
+    diff = result["diff"]
+    print(f"{len(before)} -> {len(after)} characters, {diff['lines_removed']} lines removed, "
+          f"{diff['lines_added']} added")
+    print(f"{'':<28} {'best (ms)':>10}")
+    print(f"{'one analysis':<28} {single:>10.2f}")
+    print(f"{'two analyses + difflib':<28} {naive:>10.2f}")
+    print(f"{'two /api/analyze analyses':<28} {requests:>10.2f}")
+    print(f"{'compare_prompts':<28} {compared:>10.2f}")
+    print(f"speedup: {naive / compared:.2f}x over two analyses + difflib, "
+          f"{requests / compared:.2f}x over two /api/analyze analyses, mismatches: {mismatches}")
+
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Speed and equivalence benchmark for analyses of a subset of dimensions.
+
+Analyzes the generated rule corpus (see benchmarks.rules_speed) the way
+/api/analyze does, once for all dimensions and once for a subset, with the
+rule-analysis cache bypassed. Checks that every subset score equals the
+matching score of the full analysis, and reports prompts per second for
+both, with and without suggestion generation.
+
+Exits with status 1 if any subset score differs.
+
+Usage:
+    python -m benchmarks.dimension_subset [--count 5000] [--dimensions task_definition,constraints,specificity]
+"""
+
+import sys
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+
+from app.core.analyzer import select_dimensions
+from app.core.optimizer import generate_optimization_suggestions
+from app.core.rules import get_rule_set
+from benchmarks.rules_speed import build_corpus
+
+DEFAULT_DIMENSIONS = "task_definition,constraints,specificity"
+
+def analyze_corpus(corpus: List[str], dimensions: Optional[List[str]], with_suggestions: bool) -> List[Dict[str, Any]]:
+    """Analyze every prompt without the cache, optionally generating suggestions."""
+    rule_set = get_rule_set()
+    results = []
+    for prompt_text in corpus:
+        analysis = rule_set.analyze(prompt_text, dimensions)
+        if with_suggestions:
+            analysis["suggestions"] = generate_optimization_suggestions(prompt_text, analysis, "general", dimensions)
+        results.append(analysis)
+    return results
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5000, help="Number of generated prompts")
+    parser.add_argument("--dimensions", default=DEFAULT_DIMENSIONS, help="Comma-separated subset to analyze")
+    args = parser.parse_args()
+
+    dimensions = select_dimensions([name.strip() for name in args.dimensions.split(",") if name.strip()])
+    corpus = build_corpus(args.count)
+
+    # Warm up so imports and regex compilation are not timed
+    analyze_corpus(corpus[:10], None, True)
+
+    rows = []
+    mismatches = 0
+    for with_suggestions in (False, True):
+        full, full_time = timed(analyze_corpus, corpus, None, with_suggestions)
+        subset, subset_time = timed(analyze_corpus, corpus, dimensions, with_suggestions)
+        mismatches += sum(
+            1 for expected, actual in zip(full, subset)
+            if any(actual["dimension_scores"][name] != expected["dimension_scores"][name] for name in dimensions)
+        )
+        label = "+ suggestions" if with_suggestions else "scores"
+        rows.append((f"all {label}", full_time))
+        rows.append((f"subset {label}", subset_time))
+
+    print(f"{len(corpus)} prompts, subset: {', '.join(dimensions)}")
+    print(f"{'':<22} {'total (s)':>10} {'prompts/sec':>12}")
+    for name, elapsed in rows:
+        print(f"{name:<22} {elapsed:>10.3f} {len(corpus) / elapsed:>12.0f}")
+    print(f"speedup: {rows[0][1] / rows[1][1]:.2f}x scores only, "
+          f"{rows[2][1] / rows[3][1]:.2f}x with suggestions, mismatches: {mismatches}")
+
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,572 @@
+"""
+Fake LLM provider server.
+
+Speaks the OpenAI and OpenRouter chat completions and the Anthropic messages
+wire formats, both as a single JSON response and streamed as server-sent
+events, so the LLM path of the app can be exercised and benchmarked offline:
+
+    POST /v1/chat/completions        OpenAI      (OPENAI_BASE_URL=http://host:port/v1)
+    POST /api/v1/chat/completions    OpenRouter  (OPENROUTER_BASE_URL=http://host:port/api/v1)
+    POST /v1/messages                Anthropic   (ANTHROPIC_BASE_URL=http://host:port)
+    GET  /stats                      request counters; POST /stats/reset clears them
+
+Every response is a valid analysis in the format the app asks for (a JSON
+array for packed multi-prompt requests), derived from the prompt so that
+repeated runs return the same content. Behaviour is controlled by
+FakeProviderConfig (or the command line):
+
+- latency before the first token, drawn from a fixed, uniform, exponential
+  or lognormal distribution with the given mean
+- generation speed in tokens per second (one token per whitespace-delimited
+  word); streamed chunks are paced at that rate
+- injected 429 responses (with Retry-After) and 500 errors
+- malformed outputs: truncated analysis JSON in the message content, or a
+  response body that is not JSON at all
+- prompt caching: a request prefix seen before is reported as cached in the
+  usage fields, at OpenAI's automatic 128-token prefix granularity or at
+  Anthropic's cache_control breakpoints, once it reaches --cache-min-tokens
+
+Random choices come from a seeded generator, so a run with the same seed and
+request sequence is reproducible.
+
+Usage:
+    python -m benchmarks.fake_provider [--port 8100] [--latency-ms 800]
+        [--latency-distribution lognormal] [--tokens-per-second 50]
+        [--rate-429 0.05] [--error-rate 0.01] [--malformed-rate 0.02]
+        [--cache-min-tokens 1024] [--seed 7]
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from app.core.analyzer import DIMENSIONS
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# A prompt of a packed analysis request (see app.core.packing)
+_PACKED_PROMPT = re.compile(r"<<<PROMPT id=(\d+)>>>\n(.*?)\n<<<END PROMPT id=\1>>>", re.DOTALL)
+
+# The prompt of a single analysis request (see app.core.llm_analyzer); the
+# closing fence is the last one, as the prompt may contain fences itself
+_SINGLE_PROMPT = re.compile(r"PROMPT TO ANALYZE:\n```\n(.*)\n```", re.DOTALL)
+
+class FakeProviderConfig:
+    """Behaviour of the fake provider."""
+
+    def __init__(
+        self,
+        latency_ms: float = 500.0,
+        latency_distribution: str = "lognormal",
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: float = 1.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        malformed_body_rate: float = 0.0,
+        cache_min_tokens: int = 1024,
+        seed: int = 7
+    ):
+        """
+        Initialize the configuration.
+
+        Args:
+            latency_ms: Mean time to first token in milliseconds
+            latency_distribution: "fixed", "uniform" (0 to twice the mean),
+                "exponential" or "lognormal"
+            latency_sigma: Shape of the lognormal distribution
+            tokens_per_second: Generation speed; 0 returns all tokens at once
+            rate_429: Fraction of requests answered with 429
+            retry_after: Retry-After seconds sent with 429 responses
+            error_rate: Fraction of requests answered with 500
+            malformed_rate: Fraction of responses whose content is truncated JSON
+            malformed_body_rate: Fraction of (non-streaming) responses whose
+                body is not JSON
+            cache_min_tokens: Shortest prefix, in tokens, that is cached; 0
+                disables prompt caching
+            seed: Seed of the random generator
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.malformed_body_rate = malformed_body_rate
+        self.cache_min_tokens = cache_min_tokens
+        self.seed = seed
+
+class FakeProvider:
+    """The fake provider's request handlers and counters."""
+
+    def __init__(self, config: Optional[FakeProviderConfig] = None):
+        self.config = config or FakeProviderConfig()
+        self.rng = random.Random(self.config.seed)
+        # Digests of the request prefixes cached so far
+        self.prefix_cache: set = set()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear the request counters."""
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "streamed": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "statuses": {},
+            "formats": {},
+            "malformed": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0
+        }
+
+    def create_app(self) -> web.Application:
+        """Build the aiohttp application."""
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle_openai)
+        app.router.add_post("/api/v1/chat/completions", self.handle_openrouter)
+        app.router.add_post("/v1/messages", self.handle_anthropic)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_post("/stats/reset", self.handle_reset)
+        return app
+
+    # Behaviour
+
+    def sample_latency(self) -> float:
+        """Draw a time to first token, in seconds."""
+        mean = self.config.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        distribution = self.config.latency_distribution
+        if distribution == "fixed":
+            return mean
+        if distribution == "uniform":
+            return self.rng.uniform(0, 2 * mean)
+        if distribution == "exponential":
+            return self.rng.expovariate(1.0 / mean)
+        # Lognormal with the requested mean
+        sigma = self.config.latency_sigma
+        return self.rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+    def choose_outcome(self) -> str:
+        """Pick "429", "error", "malformed_body", "malformed" or "ok" for a request."""
+        roll = self.rng.random()
+        if roll < self.config.rate_429:
+            return "429"
+        roll -= self.config.rate_429
+        if roll < self.config.error_rate:
+            return "error"
+        roll = self.rng.random()
+        if roll < self.config.malformed_body_rate:
+            return "malformed_body"
+        roll -= self.config.malformed_body_rate
+        if roll < self.config.malformed_rate:
+            return "malformed"
+        return "ok"
+
+    def build_content(self, prompt: str, malformed: bool) -> str:
+        """
+        Build the analysis the model "writes" for a prompt.
+
+        Packed requests (prompts between <<<PROMPT id=N>>> delimiters) get a
+        JSON array with one analysis per prompt.
+        """
+        packed = _PACKED_PROMPT.findall(prompt)
+        if packed:
+            payload: Any = [dict(self.build_analysis(text), id=int(number)) for number, text in packed]
+        else:
+            payload = self.build_analysis(_prompt_to_analyze(prompt))
+        content = "```json\n" + json.dumps(payload, indent=2) + "\n```"
+        if malformed:
+            # Cut the JSON off part-way, as a model hitting its token limit would
+            content = content[:self.rng.randint(10, max(11, len(content) // 2))]
+        return content
+
+    def build_analysis(self, prompt_text: str) -> Dict[str, Any]:
+        """The analysis of one prompt, derived from its text."""
+        digest = hashlib.sha256(prompt_text.encode("utf-8")).digest()
+        return {
+            "dimension_scores": {name: 1 + digest[i] % 5 for i, name in enumerate(DIMENSIONS)},
+            "strengths": ["The task is stated directly."],
+            "weaknesses": ["The expected output format is not specified."],
+            "suggestions": [
+                {
+                    "title": "Specify the output format",
+                    "description": "State the structure and length of the answer you expect.",
+                    "example": "Answer in three bullet points.",
+                    "rationale": "A stated format makes the response easier to use."
+                }
+            ],
+            "improved_prompt": prompt_text.strip()[:2000]
+        }
+
+    def prompt_usage(self, body: Dict[str, Any], wire_format: str) -> Tuple[int, int, int]:
+        """
+        Count a request's prompt tokens and simulate the provider's prefix cache.
+
+        Returns:
+            Total prompt tokens, tokens read from the cache and tokens written
+            to it (written is only reported by the Anthropic format)
+        """
+        segments = _request_segments(body, wire_format)
+        tokens = _tokenize("".join(text for text, _ in segments))
+        total = len(tokens)
+        self.stats["prompt_tokens"] += total
+        minimum = self.config.cache_min_tokens
+        if minimum <= 0 or total < minimum:
+            return total, 0, 0
+
+        if wire_format == "anthropic":
+            # Prefixes end at the blocks marked with cache_control
+            boundaries = []
+            length = 0
+            for text, breakpoint in segments:
+                length += len(_tokenize(text))
+                if breakpoint and length >= minimum:
+                    boundaries.append(length)
+        else:
+            # Automatic caching of the longest prefix, in 128-token steps
+            boundaries = list(range(minimum, total + 1, 128))
+
+        cached = 0
+        for boundary in boundaries:
+            digest = hashlib.sha256("".join(tokens[:boundary]).encode("utf-8")).digest()
+            if digest in self.prefix_cache:
+                cached = boundary
+            else:
+                self.prefix_cache.add(digest)
+        written = boundaries[-1] - cached if wire_format == "anthropic" and boundaries else 0
+        self.stats["cached_tokens"] += cached
+        return total, cached, written
+
+    def pace(self, tokens: int) -> float:
+        """Seconds needed to generate a number of tokens."""
+        rate = self.config.tokens_per_second
+        return tokens / rate if rate > 0 else 0.0
+
+    # Handlers
+
+    async def handle_openai(self, request: web.Request) -> web.StreamResponse:
+        return await self.handle(request, "openai")
+
+    async def handle_openrouter(self, request: web.Request) -> web.StreamResponse:
+        return await self.handle(request, "openrouter")
+
+    async def handle_anthropic(self, request: web.Request) -> web.StreamResponse:
+        return await self.handle(request, "anthropic")
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset_stats()
+        return web.json_response({"status": "reset"})
+
+    async def handle(self, request: web.Request, wire_format: str) -> web.StreamResponse:
+        """Answer one completion request in the given wire format."""
+        stats = self.stats
+        stats["requests"] += 1
+        stats["formats"][wire_format] = stats["formats"].get(wire_format, 0) + 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            response = await self._respond(request, wire_format)
+        finally:
+            stats["in_flight"] -= 1
+        status = str(response.status)
+        stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+        return response
+
+    async def _respond(self, request: web.Request, wire_format: str) -> web.StreamResponse:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return self.error_response(wire_format, 400, "invalid_request_error", "Request body is not JSON")
+
+        model = body.get("model", "fake-model")
+        prompt = _prompt_text(body, wire_format)
+        outcome = self.choose_outcome()
+
+        if outcome == "429":
+            response = self.error_response(wire_format, 429, "rate_limit_error", "Rate limit exceeded")
+            response.headers["Retry-After"] = str(self.config.retry_after)
+            return response
+
+        await asyncio.sleep(self.sample_latency())
+        if outcome == "error":
+            return self.error_response(wire_format, 500, "api_error", "Internal server error")
+
+        if outcome.startswith("malformed"):
+            self.stats["malformed"] += 1
+        content = self.build_content(prompt, outcome == "malformed")
+        tokens = _tokenize(content)
+        usage = self.prompt_usage(body, wire_format)
+
+        if body.get("stream"):
+            self.stats["streamed"] += 1
+            return await self.stream(request, wire_format, model, tokens, usage)
+
+        await asyncio.sleep(self.pace(len(tokens)))
+        if outcome == "malformed_body":
+            return web.Response(status=200, text="<html>upstream error", content_type="application/json")
+        return web.json_response(_completion(wire_format, model, content, usage, len(tokens)))
+
+    async def stream(self, request: web.Request, wire_format: str, model: str,
+                     tokens: List[str], usage: Tuple[int, int, int]) -> web.StreamResponse:
+        """Send the tokens as server-sent events, paced at the token rate."""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        message_id = f"fake-{uuid.uuid4().hex[:12]}"
+        delay = self.pace(1)
+
+        for event, data in _stream_prologue(wire_format, message_id, model, usage):
+            await response.write(_sse(event, data))
+        for token in tokens:
+            if delay:
+                await asyncio.sleep(delay)
+            event, data = _stream_delta(wire_format, message_id, model, token)
+            await response.write(_sse(event, data))
+        for event, data in _stream_epilogue(wire_format, message_id, model, usage, len(tokens)):
+            await response.write(_sse(event, data))
+
+        await response.write_eof()
+        return response
+
+    def error_response(self, wire_format: str, status: int, error_type: str, message: str) -> web.Response:
+        """An error in the provider's error format."""
+        if wire_format == "anthropic":
+            body = {"type": "error", "error": {"type": error_type, "message": message}}
+        else:
+            body = {"error": {"message": message, "type": error_type, "code": status}}
+        return web.json_response(body, status=status)
+
+def _prompt_text(body: Dict[str, Any], wire_format: str) -> str:
+    """The last user message of a request."""
+    for message in reversed(body.get("messages") or []):
+        if message.get("role") == "user":
+            content = message.get("content", "")
+            if isinstance(content, list):
+                # Anthropic content blocks
+                return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+            return str(content)
+    return ""
+
+def _request_segments(body: Dict[str, Any], wire_format: str) -> List[Tuple[str, bool]]:
+    """The prompt text of a request in order, with whether a cache breakpoint follows each piece."""
+    parts: List[Any] = []
+    if wire_format == "anthropic":
+        system = body.get("system")
+        parts.extend(system if isinstance(system, list) else [system or ""])
+    for message in body.get("messages") or []:
+        content = message.get("content", "")
+        parts.extend(content if isinstance(content, list) else [content])
+
+    segments = []
+    for part in parts:
+        if isinstance(part, dict):
+            segments.append((str(part.get("text", "")), "cache_control" in part))
+        else:
+            segments.append((str(part), False))
+    return segments
+
+def _usage(wire_format: str, prompt_usage: Tuple[int, int, int], completion_tokens: int) -> Dict[str, Any]:
+    """The usage field of a response."""
+    total, cached, written = prompt_usage
+    if wire_format == "anthropic":
+        return {
+            "input_tokens": total - cached - written,
+            "cache_read_input_tokens": cached,
+            "cache_creation_input_tokens": written,
+            "output_tokens": completion_tokens
+        }
+    return {
+        "prompt_tokens": total,
+        "completion_tokens": completion_tokens,
+        "total_tokens": total + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached}
+    }
+
+def _prompt_to_analyze(prompt: str) -> str:
+    """The prompt quoted in the app's analysis request, as sent."""
+    match = _SINGLE_PROMPT.search(prompt)
+    return match.group(1) if match else prompt
+
+def _tokenize(content: str) -> List[str]:
+    """Split content into "tokens" (words with their trailing whitespace)."""
+    tokens: List[str] = []
+    start = 0
+    length = len(content)
+    while start < length:
+        end = start
+        while end < length and not content[end].isspace():
+            end += 1
+        while end < length and content[end].isspace():
+            end += 1
+        tokens.append(content[start:end])
+        start = end
+    return tokens
+
+def _completion(wire_format: str, model: str, content: str, prompt_usage: Tuple[int, int, int],
+                completion_tokens: int) -> Dict[str, Any]:
+    """A complete (non-streaming) response body."""
+    if wire_format == "anthropic":
+        return {
+            "id": f"msg_fake{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": content}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": _usage(wire_format, prompt_usage, completion_tokens)
+        }
+    return {
+        "id": f"chatcmpl-fake{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+        ],
+        "usage": _usage(wire_format, prompt_usage, completion_tokens)
+    }
+
+def _chunk(message_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": message_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+def _stream_prologue(wire_format: str, message_id: str, model: str,
+                     prompt_usage: Tuple[int, int, int]) -> List[Tuple[Optional[str], Any]]:
+    if wire_format == "anthropic":
+        return [
+            ("message_start", {"type": "message_start", "message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+                "stop_reason": None, "stop_sequence": None,
+                "usage": _usage(wire_format, prompt_usage, 1)
+            }}),
+            ("content_block_start", {"type": "content_block_start", "index": 0,
+                                     "content_block": {"type": "text", "text": ""}}),
+            ("ping", {"type": "ping"})
+        ]
+    return [(None, _chunk(message_id, model, {"role": "assistant", "content": ""}))]
+
+def _stream_delta(wire_format: str, message_id: str, model: str, token: str) -> Tuple[Optional[str], Any]:
+    if wire_format == "anthropic":
+        return "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                       "delta": {"type": "text_delta", "text": token}}
+    return None, _chunk(message_id, model, {"content": token})
+
+def _stream_epilogue(wire_format: str, message_id: str, model: str, prompt_usage: Tuple[int, int, int],
+                     completion_tokens: int) -> List[Tuple[Optional[str], Any]]:
+    if wire_format == "anthropic":
+        return [
+            ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+            ("message_delta", {"type": "message_delta",
+                               "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                               "usage": {"output_tokens": completion_tokens}}),
+            ("message_stop", {"type": "message_stop"})
+        ]
+    final = _chunk(message_id, model, {}, "stop")
+    final["usage"] = _usage(wire_format, prompt_usage, completion_tokens)
+    return [(None, final), (None, "[DONE]")]
+
+def _sse(event: Optional[str], data: Any) -> bytes:
+    """Encode one server-sent event."""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n".encode("utf-8")
+
+async def start_fake_provider(config: Optional[FakeProviderConfig] = None, host: str = "127.0.0.1",
+                              port: int = 0) -> Tuple[FakeProvider, web.AppRunner, str]:
+    """
+    Start a fake provider in the running event loop.
+
+    Args:
+        config: Provider behaviour (defaults if None)
+        host: Interface to bind
+        port: Port to bind; 0 picks a free one
+
+    Returns:
+        The provider (for its stats), the runner (call cleanup() to stop it)
+        and the base URL of the server
+    """
+    provider = FakeProvider(config)
+    runner = web.AppRunner(provider.create_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return provider, runner, f"http://{host}:{bound_port}"
+
+def provider_environment(base_url: str) -> Dict[str, str]:
+    """Environment variables pointing the app's LLM calls at a fake provider."""
+    return {
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "OPENROUTER_BASE_URL": f"{base_url}/api/v1",
+        "ANTHROPIC_BASE_URL": base_url
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8100, help="Port to bind")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Mean time to first token")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal",
+                        help="Distribution of the time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Shape of the lognormal distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Generation speed (0 returns the whole response at once)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds of 429 responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Fraction of responses with truncated analysis JSON")
+    parser.add_argument("--malformed-body-rate", type=float, default=0.0,
+                        help="Fraction of non-streaming responses whose body is not JSON")
+    parser.add_argument("--cache-min-tokens", type=int, default=1024,
+                        help="Shortest cached prompt prefix in tokens; 0 disables prompt caching")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the random generator")
+    args = parser.parse_args()
+
+    config = FakeProviderConfig(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        malformed_body_rate=args.malformed_body_rate,
+        cache_min_tokens=args.cache_min_tokens,
+        seed=args.seed
+    )
+    base_url = f"http://{args.host}:{args.port}"
+    print("Fake provider listening; point the app at it with:")
+    for name, value in provider_environment(base_url).items():
+        print(f"  {name}={value}")
+    web.run_app(FakeProvider(config).create_app(), host=args.host, port=args.port, print=None, access_log=None)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
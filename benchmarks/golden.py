@@ -0,0 +1,371 @@
+"""
+Golden-corpus regression check with performance budgets.
+
+benchmarks/golden_corpus.jsonl.gz holds a few thousand varied prompts (rule
+corpus fragments, templated prompts of every shape and size, and edge cases
+such as empty, whitespace-only, unicode and very long prompts) with the
+dimension scores, strengths, weaknesses, overall score and suggestion titles
+recorded from the rule analyzer. The check analyzes every prompt again
+through each scoring path and requires exactly the recorded results:
+
+- analyze_prompt_rules, with the rule-analysis cache cleared, then cached
+- analyze_prompt_rules for a dimension subset (its scores must equal the
+  matching full scores)
+- the batch engine (app.core.batch.score_batch)
+- compare_prompts, which shares analysis work between two versions
+- generate_optimization_suggestions (suggestion titles, in order)
+
+It then times each function per prompt and measures its peak allocation
+with tracemalloc, and checks them against benchmarks/golden_budgets.json.
+
+Exits with status 1 if any result differs or a budget is exceeded.
+
+After an intended change to the rules or suggestions, review the
+differences the check reports (--show sets how many are listed per path) and
+re-record the corpus with --record; after an intended performance change,
+re-record the budgets with --record-budgets.
+
+Usage:
+    python -m benchmarks.golden [--budget-scale 1.0] [--repeat 3] [--show 5]
+    python -m benchmarks.golden --record
+    python -m benchmarks.golden --record-budgets [--headroom 3.0]
+"""
+
+import gc
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.core import analyzer
+from app.core.analyzer import analyze_prompt_rules, calculate_overall_score
+from app.core.batch import score_batch
+from app.core.compare import compare_prompts
+from app.core.optimizer import generate_optimization_suggestions
+from benchmarks.rules_speed import FRAGMENTS, build_corpus
+
+CORPUS_PATH = Path(__file__).with_name("golden_corpus.jsonl.gz")
+BUDGETS_PATH = Path(__file__).with_name("golden_budgets.json")
+
+# Target models the corpus cycles through (the optimizer suggests
+# differently for some of them)
+TARGET_MODELS = ["general", "gpt-4", "gpt-3.5", "claude", "llama",
+                 "openrouter:meta-llama/llama-3.3-8b-instruct:free"]
+
+# Dimension subset checked against the full scores
+SUBSET = ["task_definition", "constraints", "specificity"]
+
+# Prompts scored per score_batch call
+BATCH_SIZE = 256
+
+# Headroom of recorded memory budgets (allocation is deterministic, so it
+# needs less than latency)
+MEMORY_HEADROOM = 1.5
+
+# Line appended to make the revised version passed to compare_prompts
+REVISION = "\nThink step by step and answer in JSON format."
+
+ROLES = ["", "You are a helpful assistant. ", "Act as an experienced editor. ",
+         "Imagine you are a senior data scientist with expertise in finance. ",
+         "Take the role of a teacher who specializes in law. "]
+TASKS = ["Summarize the quarterly sales report", "Write an email to our customer about the delay",
+         "Explain how transformers work", "Compare Python and Rust for a CLI tool",
+         "Design a marketing plan for the team", "List the risks of the project",
+         "Analyze the users' feedback", "Generate 5 names for a coffee shop", "do something with the data",
+         "help me", "Translate this paragraph into French", "Review the following code"]
+CONTEXTS = ["", "Background: the team missed two deadlines last quarter. ",
+            "Given that the audience is technical, ", "Currently we use a monolith; previously we used services. ",
+            "In this scenario the budget is fixed. "]
+FORMATS = ["", " Output in JSON format.", " Use a table with 3 columns.", " Write no more than 300 words.",
+           " Answer in 5 paragraphs in a formal tone.", " Use markdown with **bold** headings."]
+CONSTRAINTS = ["", " You must cite sources.", " Do not mention competitors.", " Avoid jargon.",
+               " Only use the data provided, by friday.", " Use at least 2 examples and no more than 3 bullets."]
+REASONING = ["", " Think step by step.", " Consider all aspects, pros and cons, before answering.",
+             " Show your work and break down the problem."]
+EXAMPLES = ["", " For example: \"Q3 revenue rose 4%\".", " e.g. `make build`.",
+            "\n\nExample:\n```\n{\"name\": \"Ada\"}\n```"]
+FILLER = ["basically", "actually", "really", "very", "just", "literally", "quite", "so", "maybe", "perhaps"]
+
+EDGE_CASES = [
+    "", " ", "\n", "\n\n\n", "\t \t", "?", "...", "a", "A.", "42", "```", "``````", "**", "* * *", "- ",
+    "1.", "1. 2. 3.", "•", "**bold", "_", "__init__", "\"\"", "''", "🙂", "🙂🙂🙂 please 🙂",
+    "Écris un résumé du rapport trimestriel en français.", "日本語で要約してください。",
+    "Объясни, как работает трансформер, шаг за шагом.", "مرحبا، اشرح لي النموذج",
+    "Ünïcödé wörds wïth dïäcrïtïcs: ñ, ç, ø, ß.", "ＦＵＬＬＷＩＤＴＨ　ｔｅｘｔ", "zero\u200bwidth\u200bspace",
+    "line\r\nendings\r\nwindows", "tabs\tbetween\twords", "a\x00b", "UPPERCASE ONLY PROMPT",
+    "what? why? how? when? where? who? which?", "very very very very very very very very",
+    "the the the the the the the the the the", "You are You are You are", "Act as", "role",
+    "# Heading\n## Subheading\n### Third", "| a | b |\n|---|---|\n| 1 | 2 |", "<context>x</context>",
+    "{\"json\": true}", "[1, 2, 3]", "http://example.com/path?query=1", "name@example.com",
+    "Section:\nSection:\nSection:", "IMPORTANT NOTE: " * 10, "- a\n- b\n- c\n* d\n• e",
+    "word " * 2000, "x" * 5000, "Explain. " * 500, "Act as an expert. Think step by step. " * 200,
+]
+
+def _structured_prompt(rng: random.Random) -> str:
+    """A prompt assembled from template parts, with optional filler and lists."""
+    parts = [rng.choice(ROLES), rng.choice(CONTEXTS), rng.choice(TASKS), rng.choice([".", "", "?", ":"]),
+             rng.choice(FORMATS), rng.choice(CONSTRAINTS), rng.choice(REASONING), rng.choice(EXAMPLES)]
+    text = "".join(parts)
+    if rng.random() < 0.3:
+        words = text.split(" ")
+        for _ in range(rng.randint(1, 8)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(FILLER))
+        text = " ".join(words)
+    if rng.random() < 0.25:
+        marker = rng.choice(["1.", "-", "*", "•"])
+        items = [f"{marker if marker != '1.' else f'{n}.'} {rng.choice(FRAGMENTS)}" for n in range(1, rng.randint(2, 7))]
+        text += "\n\n" + "\n".join(items)
+    if rng.random() < 0.05:
+        text = text.upper()
+    return text
+
+def _long_prompt(rng: random.Random, size: int) -> str:
+    """A prompt of about size characters of structured paragraphs."""
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraph = _structured_prompt(rng)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+def build_prompts(seed: int = 11) -> List[Tuple[str, str]]:
+    """Build the deterministic (prompt, target model) pairs of the corpus."""
+    rng = random.Random(seed)
+    prompts = list(build_corpus(1500, seed=seed))
+    prompts += [_structured_prompt(rng) for _ in range(1400)]
+    prompts += [_long_prompt(rng, size) for size in (1000, 2000, 5000, 10000, 20000, 50000) for _ in range(2)]
+    prompts += EDGE_CASES
+
+    pairs = []
+    seen = set()
+    for index, prompt_text in enumerate(prompts):
+        pair = (prompt_text, TARGET_MODELS[index % len(TARGET_MODELS)])
+        if pair not in seen:
+            seen.add(pair)
+            pairs.append(pair)
+    return pairs
+
+def expected_entry(index: int, prompt_text: str, target_model: str) -> Dict[str, Any]:
+    """Analyze a prompt for the corpus, with the cache cleared."""
+    analyzer._rule_cache.clear()
+    analysis = analyze_prompt_rules(prompt_text, target_model)
+    return {
+        "id": index,
+        "prompt": prompt_text,
+        "target_model": target_model,
+        "dimension_scores": analysis["dimension_scores"],
+        "strengths": analysis["strengths"],
+        "weaknesses": analysis["weaknesses"],
+        "overall_score": calculate_overall_score(analysis["dimension_scores"]),
+        "suggestions": [suggestion["title"] for suggestion in
+                        generate_optimization_suggestions(prompt_text, analysis, target_model)]
+    }
+
+def load_corpus(path: Path = CORPUS_PATH) -> List[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as source:
+        return [json.loads(line) for line in source if line.strip()]
+
+def record_corpus(path: Path = CORPUS_PATH) -> List[Dict[str, Any]]:
+    entries = [expected_entry(index, prompt_text, target_model)
+               for index, (prompt_text, target_model) in enumerate(build_prompts())]
+    # mtime=0 keeps the file byte-identical when nothing changed
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as compressed:
+        for entry in entries:
+            compressed.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+    return entries
+
+def check_corpus(entries: List[Dict[str, Any]]) -> Dict[str, List[Tuple[int, str]]]:
+    """
+    Analyze every entry through each scoring path.
+
+    Returns:
+        The differing entries of each path, as (id, description) pairs
+    """
+    failures: Dict[str, List[Tuple[int, str]]] = {}
+
+    def expect(path: str, entry: Dict[str, Any], field: str, actual: Any, expected: Any):
+        if actual != expected:
+            failures.setdefault(path, []).append(
+                (entry["id"], f"{field}: expected {expected!r}, got {actual!r}")
+            )
+
+    def expect_analysis(path: str, entry: Dict[str, Any], analysis: Dict[str, Any]):
+        for field in ("dimension_scores", "strengths", "weaknesses"):
+            expect(path, entry, field, analysis[field], entry[field])
+
+    analyzer._rule_cache.clear()
+    for entry in entries:
+        prompt_text, target_model = entry["prompt"], entry["target_model"]
+        analysis = analyze_prompt_rules(prompt_text, target_model)
+        expect_analysis("analyze_prompt_rules", entry, analysis)
+        expect("analyze_prompt_rules", entry, "overall_score",
+               calculate_overall_score(analysis["dimension_scores"]), entry["overall_score"])
+        expect_analysis("analyze_prompt_rules (cached)", entry, analyze_prompt_rules(prompt_text, target_model))
+
+        subset = analyze_prompt_rules(prompt_text, target_model, SUBSET)["dimension_scores"]
+        expect("analyze_prompt_rules (subset)", entry, "dimension_scores", subset,
+               {name: entry["dimension_scores"][name] for name in SUBSET})
+
+        titles = [suggestion["title"] for suggestion in
+                  generate_optimization_suggestions(prompt_text, analysis, target_model)]
+        expect("generate_optimization_suggestions", entry, "suggestions", titles, entry["suggestions"])
+
+        compared = compare_prompts(prompt_text, prompt_text + REVISION)
+        expect("compare_prompts", entry, "dimension_scores", compared["before"]["scores"], entry["dimension_scores"])
+    analyzer._rule_cache.clear()
+
+    for start in range(0, len(entries), BATCH_SIZE):
+        chunk = entries[start:start + BATCH_SIZE]
+        for entry, analysis in zip(chunk, score_batch([entry["prompt"] for entry in chunk]).analyses()):
+            expect_analysis("score_batch", entry, analysis)
+
+    return failures
+
+def _uncached(prompt_text: str, target_model: str):
+    analyzer._rule_cache.clear()
+    return analyze_prompt_rules(prompt_text, target_model)
+
+def _suggestions(prompt_text: str, target_model: str, analysis: Dict[str, Any]):
+    return generate_optimization_suggestions(prompt_text, analysis, target_model)
+
+def _compare(prompt_text: str, target_model: str):
+    return compare_prompts(prompt_text, prompt_text + REVISION)
+
+def _measure(function: Callable, calls: List[tuple], repeat: int, per_call: List[int]) -> Dict[str, float]:
+    """
+    Time calls of function (best of repeat per call) and measure the peak
+    allocation of the largest call.
+
+    per_call gives the number of prompts of each call, so times are reported
+    per prompt.
+    """
+    best = [float("inf")] * len(calls)
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for index, args in enumerate(calls):
+                start = time.perf_counter()
+                function(*args)
+                best[index] = min(best[index], time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    times = sorted(seconds / count for seconds, count in zip(best, per_call))
+    peak = 0
+    tracemalloc.start()
+    try:
+        for args in calls:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            function(*args)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "mean_us": sum(times) / len(times) * 1e6,
+        "p99_us": times[min(len(times) - 1, int(len(times) * 0.99))] * 1e6,
+        "peak_kib": peak / 1024
+    }
+
+def measure(entries: List[Dict[str, Any]], repeat: int) -> Dict[str, Dict[str, float]]:
+    """Latency per prompt and peak allocation of each budgeted function."""
+    pairs = [(entry["prompt"], entry["target_model"]) for entry in entries]
+    analyses = [_uncached(*pair) for pair in pairs]
+    batches = [([prompt_text for prompt_text, _ in pairs[start:start + BATCH_SIZE]],)
+               for start in range(0, len(pairs), BATCH_SIZE)]
+
+    results = {
+        "analyze_prompt_rules": _measure(_uncached, pairs, repeat, [1] * len(pairs)),
+        "generate_optimization_suggestions": _measure(
+            _suggestions, [pair + (analysis,) for pair, analysis in zip(pairs, analyses)], repeat, [1] * len(pairs)
+        ),
+        "compare_prompts": _measure(_compare, pairs, repeat, [1] * len(pairs)),
+        "score_batch": _measure(score_batch, batches, repeat, [len(batch[0]) for batch in batches])
+    }
+
+    # Cache hits, with the cache made large enough to hold the corpus
+    cache_size = analyzer.RULE_CACHE_SIZE
+    analyzer.RULE_CACHE_SIZE = max(cache_size, len(pairs))
+    try:
+        for pair in pairs:
+            analyze_prompt_rules(*pair)
+        results["analyze_prompt_rules (cached)"] = _measure(analyze_prompt_rules, pairs, repeat, [1] * len(pairs))
+    finally:
+        analyzer.RULE_CACHE_SIZE = cache_size
+        analyzer._rule_cache.clear()
+    return results
+
+def check_budgets(measured: Dict[str, Dict[str, float]], budgets: Dict[str, Dict[str, float]],
+                  scale: float) -> List[str]:
+    """Budget overruns, as descriptions."""
+    overruns = []
+    for name, limits in budgets.items():
+        if name not in measured:
+            continue
+        for metric, limit in limits.items():
+            # Latency budgets scale with the machine, memory budgets do not
+            allowed = limit * scale if metric.endswith("_us") else limit
+            if measured[name][metric] > allowed:
+                overruns.append(f"{name} {metric}: {measured[name][metric]:.1f} > budget {allowed:.1f}")
+    return overruns
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="Re-record the corpus from the current analyzer")
+    parser.add_argument("--record-budgets", action="store_true",
+                        help="Re-record the budgets as the measured values times --headroom")
+    parser.add_argument("--headroom", type=float, default=3.0, help="Latency budget headroom for --record-budgets")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiply latency budgets (for slower machines)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per call (best is used)")
+    parser.add_argument("--show", type=int, default=5, help="Differences shown per scoring path")
+    args = parser.parse_args()
+
+    if args.record:
+        entries = record_corpus()
+        print(f"recorded {len(entries)} prompts to {CORPUS_PATH}")
+        return 0
+
+    entries = load_corpus()
+    failures = check_corpus(entries)
+    print(f"{len(entries)} golden prompts, {sum(len(entry['prompt']) for entry in entries)} characters")
+    for path, differences in failures.items():
+        print(f"{path}: {len(differences)} differences")
+        for entry_id, description in differences[:args.show]:
+            print(f"  #{entry_id} {description}")
+
+    measured = measure(entries, args.repeat)
+    if args.record_budgets:
+        budgets = {
+            name: {metric: round(value * (args.headroom if metric.endswith("_us") else MEMORY_HEADROOM), 1)
+                   for metric, value in values.items()}
+            for name, values in measured.items()
+        }
+        BUDGETS_PATH.write_text(json.dumps(budgets, indent=2) + "\n")
+        print(f"recorded budgets to {BUDGETS_PATH}")
+    budgets = json.loads(BUDGETS_PATH.read_text())
+
+    print(f"{'':<36} {'mean (us)':>10} {'p99 (us)':>10} {'peak (KiB)':>11}")
+    for name, values in measured.items():
+        limits = budgets.get(name, {})
+        print(f"{name:<36} {values['mean_us']:>10.1f} {values['p99_us']:>10.1f} {values['peak_kib']:>11.1f}")
+        print(f"{'  budget':<36} {limits.get('mean_us', 0) * args.budget_scale:>10.1f} "
+              f"{limits.get('p99_us', 0) * args.budget_scale:>10.1f} {limits.get('peak_kib', 0):>11.1f}")
+
+    overruns = check_budgets(measured, budgets, args.budget_scale)
+    for overrun in overruns:
+        print(f"over budget: {overrun}")
+    mismatches = sum(len(differences) for differences in failures.values())
+    print(f"mismatches: {mismatches}, budget overruns: {len(overruns)}")
+
+    return 1 if mismatches or overruns else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
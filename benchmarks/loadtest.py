@@ -0,0 +1,387 @@
+"""
+Load test for the HTTP API.
+
+Drives POST /api/analyze with a configurable mix of prompt sizes and
+detailed-analysis requests, and reports throughput, latency percentiles,
+the 429 rate, the time requests spent in the rate limiter's queue (from the
+X-Queue-Wait-Ms response header) and the time large prompts waited for the
+analysis pool (X-Analysis-Queue-Ms).
+
+Targets:
+
+- in-process (default): the app is called through httpx's ASGI transport,
+  in this process
+- --spawn: a single uvicorn worker is started in a child process
+- --url: an already running server
+
+The in-process and spawned servers run fully offline: their history database
+lives in a temporary directory and LLM provider calls are replaced by a stub
+that sleeps for --llm-latency-ms and returns a fixed analysis. A server given
+with --url calls whatever providers it is configured with.
+
+Arrival models:
+
+- closed loop (default): --concurrency clients each send their next request
+  as soon as the previous one completes
+- open loop (--rate): requests arrive as a Poisson process at the given rate
+  regardless of completions; latency is measured from the scheduled arrival,
+  so a slow server cannot hide its backlog
+
+Rate limiter settings of in-process and spawned servers are taken from
+--rate-limit and --queue-size (MAX_REQUESTS_PER_MINUTE / MAX_QUEUE_SIZE).
+
+Exits with status 1 if a budget (--max-p99-ms, --max-429-rate) is exceeded.
+
+Usage:
+    python -m benchmarks.loadtest [--duration 30] [--concurrency 20 | --rate 50]
+        [--sizes small=0.6,medium=0.3,large=0.1] [--detailed-ratio 0.1]
+        [--rate-limit 600] [--queue-size 100] [--spawn | --url http://127.0.0.1:8000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.rules_speed import FRAGMENTS
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Number of fragments per prompt of each size
+PROMPT_SIZES = {"small": 8, "medium": 60, "large": 400, "huge": 20000}
+
+# Analysis returned by the stubbed LLM provider
+STUB_ANALYSIS = {
+    "dimension_scores": {"clarity": 0.8, "specificity": 0.7},
+    "strengths": ["Stubbed strength"],
+    "weaknesses": ["Stubbed weakness"],
+    "suggestions": [{"title": "Stubbed suggestion", "description": "Returned by the load test stub."}],
+    "improved_prompt": "Stubbed improved prompt."
+}
+
+def install_llm_stub(latency_ms: float):
+    """Replace the LLM provider call with a stub that only sleeps."""
+    import app.core.llm_analyzer as llm_analyzer
+
+    async def analyze_prompt_with_llm(prompt_text: str, target_model: str = "general",
+                                      api_key: Optional[str] = None) -> Dict[str, Any]:
+        # Exponentially distributed around the mean, like real provider latency tails
+        await asyncio.sleep(random.expovariate(1000.0 / latency_ms) if latency_ms > 0 else 0)
+        return json.loads(json.dumps(STUB_ANALYSIS))
+
+    llm_analyzer.analyze_prompt_with_llm = analyze_prompt_with_llm
+
+def server_environment(tmpdir: str, rate_limit: int, queue_size: int) -> Dict[str, str]:
+    """Environment for in-process and spawned servers."""
+    env = dict(os.environ)
+    env["HISTORY_ENABLED"] = "True"
+    env["HISTORY_DB_PATH"] = os.path.join(tmpdir, "history.db")
+    env["MAX_REQUESTS_PER_MINUTE"] = str(rate_limit)
+    env["MAX_QUEUE_SIZE"] = str(queue_size)
+    # Generated prompts are similar enough to hit the near-duplicate index,
+    # which would turn detailed analyses into cache hits
+    env["NEAR_DUPLICATE_ENABLED"] = "False"
+    return env
+
+def parse_sizes(spec: str) -> Dict[str, float]:
+    """Parse a size mix such as "small=0.6,medium=0.3,large=0.1"."""
+    sizes = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in PROMPT_SIZES:
+            raise argparse.ArgumentTypeError(f"Unknown prompt size {name!r} (choose from {', '.join(PROMPT_SIZES)})")
+        sizes[name] = float(weight or 1)
+    return sizes
+
+def build_prompt(rng: random.Random, size: str) -> str:
+    """Build a prompt of the given size from rule indicator fragments."""
+    words = [rng.choice(FRAGMENTS) for _ in range(PROMPT_SIZES[size])]
+    return " ".join(words)
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Count, p50, p90, p99 and max of a list of milliseconds."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": max(values)
+    }
+
+class LoadGenerator:
+    """Sends analyze requests and collects one result per request."""
+
+    def __init__(self, client: httpx.AsyncClient, sizes: Dict[str, float], detailed_ratio: float,
+                 target_model: str, seed: int):
+        self.client = client
+        self.sizes = sizes
+        self.detailed_ratio = detailed_ratio
+        self.target_model = target_model
+        self.rng = random.Random(seed)
+        self.results: List[Dict[str, Any]] = []
+        self.sent = 0
+
+    async def send(self, scheduled: Optional[float] = None):
+        """Send one request; latency counts from its scheduled start if given."""
+        size = self.rng.choices(list(self.sizes), weights=list(self.sizes.values()))[0]
+        detailed = self.rng.random() < self.detailed_ratio
+        body = {
+            "prompt_text": build_prompt(self.rng, size),
+            "target_model": self.target_model,
+            "detailed_analysis": detailed
+        }
+        if detailed:
+            body["api_key"] = "loadtest"
+
+        start = scheduled if scheduled is not None else time.perf_counter()
+        self.sent += 1
+        result = {"size": size, "kind": "detailed" if detailed else "rule"}
+        try:
+            response = await self.client.post("/api/analyze", json=body)
+            result["status"] = response.status_code
+            queue_wait = response.headers.get("x-queue-wait-ms")
+            if queue_wait is not None:
+                result["queue_wait_ms"] = float(queue_wait)
+            pool_wait = response.headers.get("x-analysis-queue-ms")
+            if pool_wait is not None:
+                result["pool_wait_ms"] = float(pool_wait)
+        except httpx.HTTPError as e:
+            result["status"] = None
+            result["error"] = type(e).__name__
+        result["latency_ms"] = (time.perf_counter() - start) * 1000
+        self.results.append(result)
+
+    async def closed_loop(self, concurrency: int, duration: float):
+        """Run concurrency clients that each wait for their previous response."""
+        deadline = time.perf_counter() + duration
+
+        async def client_loop():
+            while time.perf_counter() < deadline:
+                await self.send()
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float, duration: float, drain_timeout: float):
+        """Start requests as a Poisson process, then wait for stragglers."""
+        tasks = set()
+        start = time.perf_counter()
+        next_arrival = start
+        while next_arrival < start + duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(self.send(scheduled=next_arrival))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_arrival += self.rng.expovariate(rate)
+
+        # Requests still in flight when the drain timeout expires count as unfinished
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=drain_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+def build_report(results: List[Dict[str, Any]], sent: int, elapsed: float) -> Dict[str, Any]:
+    """Aggregate per-request results."""
+    statuses: Dict[str, int] = {}
+    for result in results:
+        key = str(result["status"]) if result["status"] is not None else result["error"]
+        statuses[key] = statuses.get(key, 0) + 1
+
+    ok = [result for result in results if result["status"] == 200]
+    rejected = statuses.get("429", 0)
+    return {
+        "elapsed_s": elapsed,
+        "sent": sent,
+        "completed": len(results),
+        "unfinished": sent - len(results),
+        "statuses": statuses,
+        "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+        "ok_rps": len(ok) / elapsed if elapsed else 0.0,
+        "rate_429": rejected / len(results) if results else 0.0,
+        "latency_ms": {
+            "all": summarize([result["latency_ms"] for result in ok]),
+            "rule": summarize([result["latency_ms"] for result in ok if result["kind"] == "rule"]),
+            "detailed": summarize([result["latency_ms"] for result in ok if result["kind"] == "detailed"]),
+            **{
+                size: summarize([result["latency_ms"] for result in ok if result["size"] == size])
+                for size in PROMPT_SIZES
+            }
+        },
+        "queue_wait_ms": summarize([result["queue_wait_ms"] for result in ok if "queue_wait_ms" in result]),
+        "pool_wait_ms": summarize([result["pool_wait_ms"] for result in ok if "pool_wait_ms" in result])
+    }
+
+def print_report(report: Dict[str, Any]):
+    """Print a report as a table."""
+    statuses = ", ".join(f"{status}: {count}" for status, count in sorted(report["statuses"].items()))
+    print(f"Elapsed:      {report['elapsed_s']:.1f} s")
+    print(f"Requests:     {report['sent']} sent, {report['completed']} completed, {report['unfinished']} unfinished")
+    print(f"Statuses:     {statuses or 'none'}")
+    print(f"Throughput:   {report['throughput_rps']:.1f} req/s ({report['ok_rps']:.1f} req/s successful)")
+    print(f"429 rate:     {report['rate_429'] * 100:.1f}%")
+    print(f"{'':18}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    rows = [(f"latency {name}", summary) for name, summary in report["latency_ms"].items()]
+    rows.append(("queue wait", report["queue_wait_ms"]))
+    rows.append(("pool wait", report["pool_wait_ms"]))
+    for name, summary in rows:
+        if summary["count"]:
+            print(f"{name:18}{summary['count']:>8}" + "".join(
+                f"{summary[key]:>10.1f}" for key in ("p50", "p90", "p99", "max")
+            ))
+        else:
+            print(f"{name:18}{0:>8}")
+    print("(milliseconds; latencies of 200 responses, queue and pool wait of requests that waited)")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve(port: int, llm_latency_ms: float):
+    """Run one uvicorn worker with the stubbed LLM provider (used by --spawn)."""
+    import uvicorn
+
+    install_llm_stub(llm_latency_ms)
+    uvicorn.run("app.main:app", host="127.0.0.1", port=port, log_level="warning")
+
+def spawn_server(env: Dict[str, str], llm_latency_ms: float, timeout: float = 30.0):
+    """Start a server in a child process and return it with its base URL."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.loadtest", "--serve", str(port),
+         "--llm-latency-ms", str(llm_latency_ms)],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    while True:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return server, base_url
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None or time.perf_counter() - start > timeout:
+            server.kill()
+            raise RuntimeError("Server did not start")
+        time.sleep(0.05)
+
+async def run_load(client: httpx.AsyncClient, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the configured load against a client and build the report."""
+    generator = LoadGenerator(client, args.sizes, args.detailed_ratio, args.target_model, args.seed)
+    start = time.perf_counter()
+    if args.rate:
+        await generator.open_loop(args.rate, args.duration, args.drain_timeout)
+    else:
+        await generator.closed_loop(args.concurrency, args.duration)
+    return build_report(generator.results, generator.sent, time.perf_counter() - start)
+
+async def run_in_process(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the load against the app in this process through the ASGI transport."""
+    import logging
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+    install_llm_stub(args.llm_latency_ms)
+    from app.main import app
+    from app.api.prompt_analysis import history_store
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+        report = await run_load(client, args)
+    if history_store is not None:
+        await history_store.close()
+    return report
+
+async def run_over_http(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the load against a server over HTTP."""
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        return await run_load(client, args)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--spawn", action="store_true", help="Start a uvicorn worker in a child process")
+    target.add_argument("--url", help="Base URL of a running server")
+    target.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for")
+    parser.add_argument("--concurrency", type=int, default=20, help="Clients in the closed-loop model")
+    parser.add_argument("--rate", type=float, help="Arrivals per second (open-loop model)")
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes("small=0.6,medium=0.3,large=0.1"),
+                        help="Prompt size mix, e.g. small=0.6,medium=0.3,large=0.1")
+    parser.add_argument("--detailed-ratio", type=float, default=0.0,
+                        help="Fraction of requests asking for detailed (LLM) analysis")
+    parser.add_argument("--target-model", default="general", help="Target model sent with every request")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0,
+                        help="Mean latency of the stubbed LLM provider")
+    parser.add_argument("--rate-limit", type=int, default=int(os.getenv("MAX_REQUESTS_PER_MINUTE", 10)),
+                        help="Requests per minute allowed by the server's rate limiter")
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv("MAX_QUEUE_SIZE", 100)),
+                        help="Size of the server's rate limiter queue")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--drain-timeout", type=float, default=10.0,
+                        help="Seconds to wait for in-flight open-loop requests after the run")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the request mix")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if the p99 latency exceeds this")
+    parser.add_argument("--max-429-rate", type=float, help="Fail if the 429 rate (0-1) exceeds this")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.llm_latency_ms)
+        return 0
+
+    if args.url:
+        report = asyncio.run(run_over_http(args.url.rstrip("/"), args))
+    else:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = server_environment(tmpdir, args.rate_limit, args.queue_size)
+            if args.spawn:
+                server, base_url = spawn_server(env, args.llm_latency_ms)
+                try:
+                    report = asyncio.run(run_over_http(base_url, args))
+                finally:
+                    server.terminate()
+                    server.wait(timeout=10)
+            else:
+                # The app reads its configuration from the environment on import
+                os.environ.update(env)
+                report = asyncio.run(run_in_process(args))
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    failures = []
+    p99 = report["latency_ms"]["all"].get("p99")
+    if args.max_p99_ms is not None and (p99 is None or p99 > args.max_p99_ms):
+        failures.append(f"p99 latency {p99} ms over budget")
+    if args.max_429_rate is not None and report["rate_429"] > args.max_429_rate:
+        failures.append(f"429 rate {report['rate_429']:.3f} over budget")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Worst-case timing check for every regex run on untrusted text.
+
+Prompts and LLM responses are untrusted, and Python's re module backtracks,
+so a pattern such as [A-Z][A-Z\\s]+: takes time quadratic in the length of
+a run of capitals. This check collects every pattern applied to prompt or
+response text: the regex rules and sentence splitters of the rule pack, the
+JSON cleanups of LLM responses and the tokenizers. For each pattern it:
+
+1. Generates pathological inputs: every one- and two-character motif over
+   the characters the pattern's classes distinguish, the pattern's literal
+   words and random motifs, repeated to --screen-size characters and ended
+   with a character that may defeat the match.
+2. Times each input and keeps the slowest few.
+3. Times those at --size / 16 and --size characters and estimates the
+   growth exponent (1 for linear time, 2 for quadratic).
+
+It then analyzes the slowest inputs of the rule pack patterns with the full
+analyzer, estimates the growth of the slowest one the same way, and checks
+at --screen-size characters that the results equal those of the original
+analyzer functions (benchmarks.legacy_rules).
+
+Exits with status 1 if a pattern or the analyzer grows faster than
+--max-exponent or exceeds its time budget per KB, or if an analysis differs.
+
+Usage:
+    python -m benchmarks.redos [--size 131072] [--max-exponent 1.3] [--max-us-per-kb 500]
+    python -m benchmarks.redos --rules my_rules.json
+    python -m benchmarks.redos --pattern "[A-Z][A-Z\\s]+:"
+"""
+
+import gc
+import re
+import sys
+import math
+import time
+import random
+import argparse
+from typing import Callable, List, Tuple
+
+from app.core import diff, llm_analyzer, near_duplicate, packing, repetition
+from app.core.rules import CompiledRuleSet, get_rule_set, load_rule_pack
+from benchmarks.legacy_rules import legacy_analyze_prompt_rules
+
+# Representatives of the character classes patterns tell apart
+CLASS_CHARACTERS = "aA1 \n\t_*-•.:,;{}[]'\"`!?# é"
+
+# Characters that end a repeated motif (one of them usually defeats the match)
+TAILS = ("", "x", "!", "\u0000")
+
+# Slowest screened inputs of each pattern timed at growing sizes
+CANDIDATES = 3
+
+# Random motifs generated per pattern, on top of the exhaustive short ones
+RANDOM_MOTIFS = 150
+
+Check = Tuple[str, re.Pattern, str]
+
+def collect_patterns(rule_set: CompiledRuleSet) -> List[Check]:
+    """
+    Every pattern applied to untrusted text, with how it is applied.
+
+    Returns:
+        (name, compiled pattern, "search" | "findall") triples; patterns used
+        with sub or split are timed with findall, which visits the same
+        matches
+    """
+    checks = []
+    for rule in rule_set.rules:
+        if rule.type == "regex":
+            for index, pattern in enumerate(rule.spec.get("patterns", [])):
+                checks.append((f"{rule.dimension}/{rule.id}[{index}]", re.compile(pattern["pattern"]), "search"))
+        elif rule.type == "feature" and rule.spec.get("feature") == "indicator_sentence_length":
+            checks.append((f"{rule.dimension}/{rule.id} split", re.compile(rule.spec.get("split", r"[.!?]")), "findall"))
+
+    for module, names in ((llm_analyzer, ("_UNQUOTED_KEY", "_SINGLE_QUOTED_VALUE", "_TRAILING_COMMA",
+                                          "_DIMENSION_SCORES", "_SCORE_PAIR")),
+                          (packing, ("_OUTER_FENCE",)), (diff, ("_WORD_TOKENS",)), (near_duplicate, ("_NON_WORD",)),
+                          (repetition, ("_WORDS",))):
+        for name in names:
+            checks.append((f"{module.__name__.rsplit('.', 1)[-1]}.{name}", getattr(module, name),
+                           "search" if name == "_OUTER_FENCE" else "findall"))
+    return checks
+
+def _motifs(pattern: re.Pattern, rng: random.Random) -> List[str]:
+    """Motifs whose repetition may make the pattern backtrack."""
+    alphabet = sorted(set(CLASS_CHARACTERS) | {
+        character for character in pattern.pattern
+        if not character.isalnum() and character not in "\\()[]{}^$|?+*.<=!" and character.isprintable()
+    })
+    words = sorted(set(re.findall(r"[A-Za-z]{2,}", pattern.pattern)))
+    if pattern.flags & re.IGNORECASE == 0 and any(word.islower() for word in words):
+        words += [word.upper() for word in words if word.islower()]
+
+    motifs = list(alphabet)
+    motifs += [first + second for first in alphabet for second in alphabet]
+    motifs += [word + separator for word in words for separator in (" ", "  ", "\n", "")]
+    pool = alphabet + words
+    motifs += ["".join(rng.choice(pool) for _ in range(rng.randint(2, 5))) for _ in range(RANDOM_MOTIFS)]
+    return list(dict.fromkeys(motifs))
+
+def _build(motif: str, tail: str, size: int) -> str:
+    return motif * max(1, (size - len(tail)) // len(motif)) + tail
+
+def _runner(pattern: re.Pattern, mode: str) -> Callable[[str], object]:
+    return pattern.search if mode == "search" else pattern.findall
+
+def _time(run: Callable[[str], object], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def worst_inputs(pattern: re.Pattern, mode: str, screen_size: int, seed: int = 7) -> List[Tuple[str, str]]:
+    """The (motif, tail) pairs the pattern is slowest on at screen_size characters."""
+    run = _runner(pattern, mode)
+    timed = []
+    for motif in _motifs(pattern, random.Random(seed)):
+        for tail in TAILS:
+            timed.append((_time(run, _build(motif, tail, screen_size), 1), motif, tail))
+    timed.sort(reverse=True)
+    return [(motif, tail) for _, motif, tail in timed[:CANDIDATES]]
+
+def growth(run: Callable[[str], object], motif: str, tail: str, size: int, repeat: int) -> Tuple[float, float]:
+    """
+    Time at size characters and the growth exponent between size / 16 and
+    size (1 for linear time, 2 for quadratic).
+    """
+    small = _time(run, _build(motif, tail, size // 16), repeat)
+    large = _time(run, _build(motif, tail, size), repeat)
+    # Below the timer's resolution the exponent is noise
+    floor = 20e-6
+    return large, math.log(max(large, floor) / max(small, floor / 16), 16)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=131072, help="Largest input, in characters")
+    parser.add_argument("--screen-size", type=int, default=2048, help="Input size when searching for slow inputs")
+    parser.add_argument("--repeat", type=int, default=3, help="Timings per measurement (best is used)")
+    parser.add_argument("--max-exponent", type=float, default=1.3, help="Fail if a pattern grows faster than this")
+    parser.add_argument("--max-us-per-kb", type=float, default=500.0,
+                        help="Fail if a pattern takes longer per KB of its slowest input")
+    parser.add_argument("--max-analysis-us-per-kb", type=float, default=3000.0,
+                        help="Fail if the analyzer takes longer per KB of its slowest input")
+    parser.add_argument("--rules", help="Rule pack to check instead of the active one")
+    parser.add_argument("--pattern", action="append", default=[], help="Also check this pattern (with search)")
+    args = parser.parse_args()
+
+    rule_set = load_rule_pack(args.rules) if args.rules else get_rule_set()
+    checks = collect_patterns(rule_set)
+    checks += [(f"--pattern {index}", re.compile(pattern), "search") for index, pattern in enumerate(args.pattern)]
+
+    failures = []
+    slow_prompts = []
+    kb = args.size / 1024
+    print(f"{len(checks)} patterns, inputs up to {args.size} characters")
+    print(f"{'pattern':<40} {'slowest input':<22} {'ms':>8} {'us/KB':>8} {'growth':>7}")
+    gc.disable()
+    try:
+        for name, pattern, mode in checks:
+            results = []
+            for motif, tail in worst_inputs(pattern, mode, args.screen_size):
+                seconds, exponent = growth(_runner(pattern, mode), motif, tail, args.size, args.repeat)
+                results.append((exponent, seconds, motif, tail))
+                if "/" in name:
+                    slow_prompts.append((motif, tail))
+            exponent, seconds, motif, tail = max(results)
+            label = f"{motif!r}*n+{tail!r}"[:22]
+            print(f"{name:<40} {label:<22} {seconds * 1000:>8.2f} {seconds * 1e6 / kb:>8.1f} {exponent:>7.2f}")
+            if exponent > args.max_exponent or seconds * 1e6 / kb > args.max_us_per_kb:
+                failures.append(name)
+
+        # The whole analyzer on the slowest prompts, and its results
+        # against the original analyzer functions on shorter versions
+        mismatches = 0
+        slowest = (0.0, "", "")
+        for motif, tail in slow_prompts:
+            slowest = max(slowest, (_time(rule_set.analyze, _build(motif, tail, args.size), 1), motif, tail))
+            short = _build(motif, tail, args.screen_size)
+            if not args.rules and rule_set.analyze(short) != legacy_analyze_prompt_rules(short):
+                mismatches += 1
+        _, motif, tail = slowest
+        seconds, exponent = growth(rule_set.analyze, motif, tail, args.size, args.repeat)
+    finally:
+        gc.enable()
+
+    print(f"{'full analysis':<40} {f'{motif!r}*n+{tail!r}'[:22]:<22} {seconds * 1000:>8.2f} "
+          f"{seconds * 1e6 / kb:>8.1f} {exponent:>7.2f}")
+    if exponent > args.max_exponent or seconds * 1e6 / kb > args.max_analysis_us_per_kb:
+        failures.append("full analysis")
+    print(f"over budget: {', '.join(failures) or 'none'}, mismatches: {mismatches}")
+
+    return 1 if failures or mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Speed and equivalence benchmark for the compiled rule packs.
+
+Generates a deterministic corpus that exercises every rule, checks that the
+compiled rule set produces exactly the same scores, strengths and weaknesses
+as the original hand-written analyzer functions (benchmarks.legacy_rules),
+and compares their throughput. The rule-analysis cache is bypassed so only
+the matchers are timed.
+
+Exits with status 1 if any result differs or if the compiled rules are
+slower than the legacy functions by more than --max-ratio.
+
+Usage:
+    python -m benchmarks.rules_speed [--count 2000] [--repeat 5] [--max-ratio 1.0]
+"""
+
+import sys
+import random
+import argparse
+import time
+from typing import Callable, List
+
+from app.core.rules import get_rule_set
+from benchmarks.legacy_rules import legacy_analyze_prompt_rules
+
+FRAGMENTS = [
+    "Explain", "describe", "analyze", "compare", "summarize", "list", "create", "generate",
+    "what", "how", "why", "when", "where", "who", "which", "maybe", "perhaps", "kind of",
+    "etc", "and so on", "42", "several", "many", "minutes", "weeks", "years",
+    "Background:", "the context is", "previously", "currently", "in this scenario",
+    "given that", "assuming", "The task is", "My goal is", "please", "I need", "output",
+    "result", "produce", "write", "design", "step by step", "Steps:", "in order to",
+    "so that", "purpose", "do something", "help me", "I'm not sure", "whatever you think",
+    "1. first", "2. second", "- bullet", "* star", "• dot", "Section:", "IMPORTANT NOTE:",
+    "\n\n", "**bold**", "_italic_", "for example", "e.g.", "such as", "for instance",
+    "an illustration", "in this case", "```code block```", "`inline`", "\"quoted\"",
+    "'single'", "before", "after", "input", "basically", "actually", "literally", "very",
+    "really", "just", "so", "quite", "in JSON format", "markdown", "a table", "in a formal tone",
+    "technical", "for a general audience", "the reader", "our customer", "300 words",
+    "5 paragraphs", "Act as an experienced editor", "You are a helpful assistant",
+    "take the role of a teacher", "imagine you are the captain", "an expert", "a specialist",
+    "with expertise in finance", "who specializes in law", "trained in medicine",
+    "think through", "show your work", "break down", "think carefully", "before answering",
+    "consider all aspects", "pros and cons", "SWOT", "constraint", "limitation", "you must",
+    "should", "need to", "have to", "required", "don't", "do not use", "avoid", "exclude",
+    "no more than 3", "at least 2", "only use", "do not mention", "within 2 days",
+    "by friday", "deadline", "time limit", "the", "a", "data", "report", "model", "users",
+    "quarterly", "sales", "figures", "team", "project", "plan", "marketing", "email"
+]
+
+def build_corpus(count: int, seed: int = 7) -> List[str]:
+    """Build count deterministic prompts mixing rule indicators with filler text."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        length = rng.choice([3, 8, 20, 60, 150])
+        words = [rng.choice(FRAGMENTS) for _ in range(length)]
+        separator = rng.choice([" ", ". ", ", ", "\n"])
+        corpus.append(separator.join(words))
+    return corpus
+
+def best_time(analyze: Callable[[str], object], corpus: List[str], repeat: int) -> float:
+    """Return the best wall time of analyzing the corpus repeat times."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for prompt_text in corpus:
+            analyze(prompt_text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000, help="Number of generated prompts")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    parser.add_argument("--max-ratio", type=float, default=1.0,
+                        help="Fail if compiled time / legacy time exceeds this ratio")
+    args = parser.parse_args()
+
+    rule_set = get_rule_set()
+    corpus = build_corpus(args.count)
+
+    # Check equivalence first; a fast but different matcher is a failure
+    mismatches = 0
+    for prompt_text in corpus:
+        if rule_set.analyze(prompt_text) != legacy_analyze_prompt_rules(prompt_text):
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"Mismatch for prompt: {prompt_text[:80]!r}", file=sys.stderr)
+
+    legacy = best_time(legacy_analyze_prompt_rules, corpus, args.repeat)
+    compiled = best_time(rule_set.analyze, corpus, args.repeat)
+    ratio = compiled / legacy
+
+    print(f"Rule pack version {rule_set.version}, {len(corpus)} prompts, best of {args.repeat}")
+    print(f"{'':<10} {'total (s)':>10} {'per prompt (us)':>16}")
+    for name, elapsed in (("legacy", legacy), ("compiled", compiled)):
+        print(f"{name:<10} {elapsed:>10.4f} {elapsed / len(corpus) * 1e6:>16.1f}")
+    print(f"compiled/legacy time ratio: {ratio:.2f}, mismatches: {mismatches}")
+
+    if mismatches:
+        return 1
+    if ratio > args.max_ratio:
+        print(f"Compiled rules slower than allowed ratio {args.max_ratio}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
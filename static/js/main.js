@@ -14,6 +14,10 @@ document.addEventListener('DOMContentLoaded', function() {
     const backButton = document.getElementById('back-button');
     const errorBackButton = document.getElementById('error-back-button');
     const copyButton = document.getElementById('copy-button');
+    const liveAnalysis = document.getElementById('live-analysis');
+    const livePreview = document.getElementById('live-preview');
+    const liveScoreValue = document.getElementById('live-score-value');
+    const liveStatus = document.getElementById('live-status');
     
     const inputSection = document.getElementById('input-section');
     const resultsSection = document.getElementById('results-section');
@@ -31,6 +35,17 @@ document.addEventListener('DOMContentLoaded', function() {
     // Chart instance
     let radarChart = null;
     
+    // Live analysis settings: wait for a pause in typing, skip very short prompts
+    const LIVE_DEBOUNCE_MS = 800;
+    const LIVE_MIN_LENGTH = 20;
+    let liveTimer = null;
+    
+    // Controller of the in-flight analysis request; a newer request aborts it
+    let activeController = null;
+    
+    // Cache of analysis results (up to 200 entries, kept for a day)
+    const resultCache = createResultCache('prompt-inspector', 'analyses', 200, 24 * 60 * 60 * 1000);
+    
     // Event Listeners
     promptForm.addEventListener('submit', handleFormSubmit);
     backButton.addEventListener('click', showInputSection);
@@ -39,6 +54,9 @@ document.addEventListener('DOMContentLoaded', function() {
     detailedAnalysis.addEventListener('change', toggleApiKeyField);
     toggleApiKey.addEventListener('click', toggleApiKeyVisibility);
     modelSelect.addEventListener('change', handleModelChange);
+    liveAnalysis.addEventListener('change', toggleLiveAnalysis);
+    promptInput.addEventListener('input', scheduleLiveAnalysis);
+    modelSelect.addEventListener('change', scheduleLiveAnalysis);
     
     // Toggle API key field visibility based on detailed analysis checkbox
     function toggleApiKeyField() {
@@ -60,6 +78,61 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Show the live preview and analyze right away when live mode is turned on
+    function toggleLiveAnalysis() {
+        clearTimeout(liveTimer);
+        if (liveAnalysis.checked) {
+            livePreview.classList.remove('hidden');
+            runLiveAnalysis();
+        } else {
+            livePreview.classList.add('hidden');
+            if (activeController) {
+                activeController.abort();
+            }
+        }
+    }
+    
+    // Restart the debounce timer on every edit
+    function scheduleLiveAnalysis() {
+        if (!liveAnalysis.checked) {
+            return;
+        }
+        clearTimeout(liveTimer);
+        liveTimer = setTimeout(runLiveAnalysis, LIVE_DEBOUNCE_MS);
+    }
+    
+    // Run a rule-based analysis of the current prompt for the live preview
+    async function runLiveAnalysis() {
+        const promptText = promptInput.value.trim();
+        const selectedModel = modelSelect.value;
+        if (promptText.length < LIVE_MIN_LENGTH || !selectedModel) {
+            liveScoreValue.textContent = '-';
+            liveStatus.textContent = 'Keep typing to see a live score...';
+            return;
+        }
+        
+        liveStatus.textContent = 'Analyzing...';
+        try {
+            // Live mode never requests detailed analysis, so typing does not spend the API key
+            const result = await analyzePrompt(promptText, selectedModel, false, '');
+            
+            // Ignore results for text that has changed since the request was made
+            if (promptInput.value.trim() !== promptText || modelSelect.value !== selectedModel) {
+                return;
+            }
+            liveScoreValue.textContent = (Math.round(result.overall_score * 10) / 10).toFixed(1);
+            liveStatus.textContent = result.weaknesses.length
+                ? result.weaknesses.join(' · ')
+                : 'No major weaknesses found';
+        } catch (error) {
+            if (error.name === 'AbortError') {
+                return; // Superseded by a newer request
+            }
+            console.error('Live analysis failed:', error);
+            liveStatus.textContent = error.message || 'Live analysis failed';
+        }
+    }
+    
     // Handle model selection change
     function handleModelChange() {
         const selectedModel = modelSelect.value;
@@ -111,6 +184,7 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
+        clearTimeout(liveTimer);
         showLoadingSection();
         
         try {
@@ -124,26 +198,50 @@ document.addEventListener('DOMContentLoaded', function() {
             displayResults(response, promptText);
             showResultsSection();
         } catch (error) {
+            if (error.name === 'AbortError') {
+                return; // Superseded by a newer request
+            }
             console.error('Error analyzing prompt:', error);
             errorMessage.textContent = error.message || 'An error occurred while analyzing your prompt. Please try again.';
             showErrorSection();
         }
     }
     
-    // API call to analyze prompt
+    // API call to analyze prompt (answered from the result cache when possible)
     async function analyzePrompt(promptText, targetModel, detailedAnalysis, apiKey) {
-        const response = await fetch('/api/analyze', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                prompt_text: promptText,
-                target_model: targetModel,
-                detailed_analysis: detailedAnalysis,
-                api_key: apiKey // Send API key with the request
-            })
-        });
+        const key = await cacheKey(promptText, targetModel, detailedAnalysis);
+        const cached = await resultCache.get(key);
+        if (cached) {
+            return cached;
+        }
+        
+        // Cancel the previous request; only the latest analysis is shown
+        if (activeController) {
+            activeController.abort();
+        }
+        const controller = new AbortController();
+        activeController = controller;
+        
+        let response;
+        try {
+            response = await fetch('/api/analyze', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    prompt_text: promptText,
+                    target_model: targetModel,
+                    detailed_analysis: detailedAnalysis,
+                    api_key: apiKey // Send API key with the request
+                }),
+                signal: controller.signal
+            });
+        } finally {
+            if (activeController === controller) {
+                activeController = null;
+            }
+        }
         
         if (!response.ok) {
             const errorData = await response.json();
@@ -152,6 +250,15 @@ document.addEventListener('DOMContentLoaded', function() {
         
         const result = await response.json();
         
+        // Only cache what a later request would get too: not a rule-only
+        // fallback under load, nor a detailed analysis the LLM did not make
+        // (it failed, or a near-duplicate's analysis was reused)
+        const fellBack = response.headers.get('X-Degraded') ||
+            (detailedAnalysis && response.headers.get('X-LLM-Used') !== 'true');
+        if (!fellBack) {
+            resultCache.set(key, result).catch(error => console.warn('Could not cache analysis result:', error));
+        }
+        
         // If detailed analysis was requested, show a notification
         if (detailedAnalysis) {
             // Add a notification to the UI
@@ -173,6 +280,122 @@ document.addEventListener('DOMContentLoaded', function() {
         return result;
     }
     
+    // Cache key: SHA-256 of prompt, model and analysis type (the API key is not part of it)
+    async function cacheKey(promptText, targetModel, detailedAnalysis) {
+        const keyText = JSON.stringify([promptText, targetModel, detailedAnalysis]);
+        if (!window.crypto || !window.crypto.subtle) {
+            return keyText; // subtle crypto is only available on secure origins
+        }
+        const digest = await window.crypto.subtle.digest('SHA-256', new TextEncoder().encode(keyText));
+        return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+    }
+    
+    // Size-bounded result cache: an in-memory map in front of IndexedDB, so
+    // re-displays within a page are instant and results survive reloads.
+    // Entries are evicted least recently used first and expire after maxAgeMs.
+    function createResultCache(databaseName, storeName, maxEntries, maxAgeMs) {
+        const memory = new Map();
+        let databasePromise = null;
+        
+        function openDatabase() {
+            if (!databasePromise) {
+                databasePromise = new Promise(resolve => {
+                    if (!window.indexedDB) {
+                        resolve(null);
+                        return;
+                    }
+                    const request = window.indexedDB.open(databaseName, 1);
+                    request.onupgradeneeded = () => {
+                        const store = request.result.createObjectStore(storeName, { keyPath: 'key' });
+                        store.createIndex('lastUsed', 'lastUsed');
+                    };
+                    request.onsuccess = () => resolve(request.result);
+                    // Storage can be unavailable (e.g. private browsing): fall back to memory only
+                    request.onerror = () => resolve(null);
+                });
+            }
+            return databasePromise;
+        }
+        
+        // Run one operation in a transaction; resolves with its result, or undefined on failure
+        async function withStore(mode, operation) {
+            const database = await openDatabase();
+            if (!database) {
+                return undefined;
+            }
+            return new Promise(resolve => {
+                try {
+                    const transaction = database.transaction(storeName, mode);
+                    const request = operation(transaction.objectStore(storeName));
+                    transaction.oncomplete = () => resolve(request ? request.result : undefined);
+                    transaction.onerror = () => resolve(undefined);
+                    transaction.onabort = () => resolve(undefined);
+                } catch (error) {
+                    // E.g. the database was closed by another tab upgrading it
+                    console.warn('Result cache unavailable:', error);
+                    resolve(undefined);
+                }
+            });
+        }
+        
+        function remember(entry) {
+            memory.delete(entry.key);
+            memory.set(entry.key, entry);
+            while (memory.size > maxEntries) {
+                memory.delete(memory.keys().next().value);
+            }
+        }
+        
+        // Delete the least recently used entries beyond maxEntries
+        function evict() {
+            return withStore('readwrite', store => {
+                const countRequest = store.count();
+                countRequest.onsuccess = () => {
+                    let excess = countRequest.result - maxEntries;
+                    if (excess <= 0) {
+                        return;
+                    }
+                    store.index('lastUsed').openCursor().onsuccess = event => {
+                        const cursor = event.target.result;
+                        if (cursor && excess > 0) {
+                            cursor.delete();
+                            excess -= 1;
+                            cursor.continue();
+                        }
+                    };
+                };
+                return countRequest;
+            });
+        }
+        
+        async function get(key) {
+            const entry = memory.get(key) || await withStore('readonly', store => store.get(key));
+            if (!entry) {
+                return null;
+            }
+            const now = Date.now();
+            if (now - entry.storedAt > maxAgeMs) {
+                memory.delete(key);
+                withStore('readwrite', store => store.delete(key));
+                return null;
+            }
+            entry.lastUsed = now;
+            remember(entry);
+            withStore('readwrite', store => store.put(entry));
+            return entry.result;
+        }
+        
+        async function set(key, result) {
+            const now = Date.now();
+            const entry = { key: key, result: result, storedAt: now, lastUsed: now };
+            remember(entry);
+            await withStore('readwrite', store => store.put(entry));
+            await evict();
+        }
+        
+        return { get: get, set: set };
+    }
+    
     // Display analysis results
     function displayResults(results, originalPrompt) {
         // Display overall score (already scaled to 0-5 in backend)